@@ -1,23 +1,78 @@
 from shiny import App, reactive, render, ui
-import json
-import base64
-import requests
+import asyncio
+import logging
 import os
+import sys
+import time
 from datetime import datetime, timezone
 
+from change_journal import BROWSER_ID_SCRIPT, ChangeJournal, apply_change, journal_path
+from connectivity import ConnectivityMonitor
+from github_client import MAX_COMMIT_ATTEMPTS, CommitBuilder, FileResult, GitHubClient, RequestException, blob_sha, run_io
+from list_registry import DEFAULT_LIST_NAMES, ListRegistry, merge_registries
+from local_cache import BROWSER_CACHE_SCRIPT, BrowserCache, DirectoryCache, cache_key
+from merge import merge_task_lists
+from metrics import METRICS, STARTUP_TIMING_SCRIPT, Metrics, metrics_route
+from rate_limit import BACKGROUND, LOAD, SAVE, RateLimited
+from save_scheduler import SaveScheduler
+from search_index import SearchIndex
+from shared_cache import SharedCache
+from sharded_lists import SHARD_DIR, ShardedBase, ShardedResult, fetch_lists, parse_list_file, parse_lists, push_lists
+from task_selection import TaskSelection, matching_tasks, selection_delta
+from task_store import TaskStore, now_timestamp
+from task_view import TASK_VIEW_SCRIPT, WINDOW_ROWS, diff_tasks, task_items, task_window, window_start
+from todo_format import TaskListSerializer, parse_task_lists
 
-# Define the list names
-LIST_NAMES = {
-    "list1": "List 1",
-    "list2": "List 2",
-    "list3": "List 3",
-    "list4": "List 4",
-    "list5": "List 5",
-    "list6": "List 6",
-    "list7": "List 7",
-    "list8": "List 8",
-    "list9": "List 9",
-    "list10": "List 10"
+# Skipped lines and save conflicts are logged here and counted in the metrics
+logger = logging.getLogger(__name__)
+
+# Autosave waits for this many seconds without edits before writing, but never
+# holds unsaved changes for longer than the max delay
+AUTOSAVE_QUIET_SECONDS = 2.0
+AUTOSAVE_MAX_DELAY_SECONDS = 10.0
+# Close to GitHub's rate limits (see rate_limit.py) autosave waits longer and
+# folds more changes into each commit
+RATE_LIMITED_QUIET_SECONDS = 30.0
+RATE_LIMITED_MAX_DELAY_SECONDS = 120.0
+
+# One connectivity monitor for the whole process, fed by every session's API
+# calls; sessions re-read it this often without making any request
+github_connectivity = ConnectivityMonitor()
+ONLINE_POLL_SECONDS = 5
+
+# Decoded GitHub files and parsed lists shared by every session in the
+# process, and GETs coalesced per token (see shared_cache.py). Capped at
+# TODO_SHARED_CACHE_MB megabytes; set it to an empty string or 0 to share
+# nothing. Off under shinylive, which only ever has one session.
+SHARED_CACHE_MB = 0 if sys.platform == "emscripten" else float(os.environ.get("TODO_SHARED_CACHE_MB", "64") or 0)
+shared_cache = SharedCache(max_bytes=int(SHARED_CACHE_MB * 2**20)) if SHARED_CACHE_MB else None
+
+# Upper bound on journalled offline operations before falling back to
+# pushing the full state
+OFFLINE_JOURNAL_MAX_OPS = 500
+# Set TODO_JOURNAL_DIR to keep the journal on disk so unsaved changes survive
+# a restart; they are replayed onto the next load from GitHub in the same
+# browser, with the same repository and token
+OFFLINE_JOURNAL_DIR = os.environ.get("TODO_JOURNAL_DIR")
+
+# Where the server keeps its local copy of the GitHub files (set
+# TODO_CACHE_DIR to an empty string to disable); shinylive uses browser storage
+LOCAL_CACHE_DIR = os.environ.get(
+    "TODO_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "todo-app")
+)
+
+# Prometheus text for the whole process is served here on server
+# deployments (set TODO_METRICS_PATH to an empty string to turn it off); the
+# settings panel shows the same numbers for one session, refreshed this often
+METRICS_PATH = os.environ.get("TODO_METRICS_PATH", "/metrics")
+METRICS_REFRESH_SECONDS = 5
+
+# Status messages per save source: (success, error prefix)
+SAVE_STATUS = {
+    "auto": ("✓ Changes saved automatically", "❌ Error auto-saving"),
+    "quick": ("Successfully saved to GitHub!", "Error saving to GitHub"),
+    "manual": ("Successfully saved to GitHub!", "Error saving to GitHub"),
+    "merge": ("✓ Merged with the GitHub version and saved", "Error saving merged lists"),
 }
 
 app_ui = ui.page_fillable(
@@ -64,6 +119,21 @@ app_ui = ui.page_fillable(
             gap: 10px;
             padding: 5px;
         }
+        .task-items {
+            max-height: 75vh;
+            overflow-y: auto;
+        }
+        .task-window > [data-task-id] {
+            cursor: pointer;
+        }
+        .task-window > .selected {
+            background-color: rgba(13, 110, 253, 0.15);
+            box-shadow: inset 3px 0 0 #0d6efd;
+        }
+        .search-result {
+            display: block;
+            padding: 2px 0;
+        }
         .move-controls {
             display: flex;
             align-items: center;
@@ -71,6 +141,13 @@ app_ui = ui.page_fillable(
             gap: 15px;
         }
     """),
+    # List view client code, loaded once rather than with every render
+    ui.tags.script(TASK_VIEW_SCRIPT),
+    # shinylive keeps its local cache in browser storage
+    ui.tags.script(BROWSER_CACHE_SCRIPT) if sys.platform == "emscripten" else None,
+    # Time to interactive, as the browser saw it
+    ui.tags.script(STARTUP_TIMING_SCRIPT),
+    ui.tags.script(BROWSER_ID_SCRIPT) if OFFLINE_JOURNAL_DIR else None,
     ui.layout_sidebar(
         ui.sidebar(
             ui.accordion(
@@ -79,6 +156,16 @@ app_ui = ui.page_fillable(
                     ui.output_text("online_status"),
                     ui.input_dark_mode(id=None, mode="dark"),
                     ui.input_switch("autosave_enabled", "Enable GitHub Auto-save", value=True),
+                    ui.input_switch("sharded_storage", "Store each list in its own file", value=False),
+                    ui.input_numeric(
+                        "autosave_delay",
+                        "Auto-save delay (seconds)",
+                        value=AUTOSAVE_QUIET_SECONDS,
+                        min=0,
+                        step=0.5
+                    ),
+                    ui.input_switch("show_metrics", "Show timing dashboard", value=False),
+                    ui.output_ui("metrics_panel"),
                 ),
                 id="settings_accordion",
                 open=False
@@ -89,7 +176,16 @@ app_ui = ui.page_fillable(
             ui.input_action_button("add", "Add Task", class_="btn-primary"),
             ui.output_text("unsaved_changes_alert"),
             ui.output_ui("manual_save_button"),
-            ui.output_ui("task_selector"),
+            ui.div(
+                {"class": "selection-controls"},
+                ui.output_text("selection_summary"),
+                ui.input_text("selection_filter", "Select tasks matching", placeholder="Text in title or description"),
+                ui.div(
+                    {"class": "button-container"},
+                    ui.input_action_button("select_matching", "Select Matching", class_="btn-secondary btn-sm"),
+                    ui.input_action_button("clear_selection", "Clear Selection", class_="btn-secondary btn-sm")
+                )
+            ),
             
             ui.input_action_button("load_github", "Load from GitHub", class_="btn-info"),
             ui.input_text(
@@ -105,7 +201,7 @@ app_ui = ui.page_fillable(
             ),
             ui.output_text("github_status_output"),
             
-            ui.input_action_button("edit_list_names", "Edit List Names", class_="btn-secondary"),
+            ui.input_action_button("edit_list_names", "Manage Lists", class_="btn-secondary"),
             ui.output_ui("list_name_controls"),
             width=350
         ),
@@ -117,13 +213,32 @@ app_ui = ui.page_fillable(
                 ui.input_radio_buttons(
                     "active_list",
                     "",
-                    LIST_NAMES,
+                    DEFAULT_LIST_NAMES,
                     inline=True
                 ),
+                ui.div(
+                    {"class": "move-controls"},
+                    ui.input_select(
+                        "sort_key",
+                        "Sort by",
+                        {"title": "Title", "created": "Date added", "updated": "Last edited"}
+                    ),
+                    ui.input_checkbox("sort_descending", "Descending"),
+                    ui.input_action_button("sort_list", "Sort Working List", class_="btn-secondary")
+                ),
             ),
             open=True,
             id="working_list_accordion",
         ),
+        ui.accordion(
+            ui.accordion_panel(
+                "Search Tasks",
+                ui.input_text("search_query", "", placeholder="Search all lists (titles and descriptions)"),
+                ui.output_ui("search_results"),
+            ),
+            open=True,
+            id="search_accordion",
+        ),
         
         ui.div(
         {"style": "display: flex; flex-direction: column; gap: 10px; height: 100%;"},
@@ -142,7 +257,7 @@ app_ui = ui.page_fillable(
                         ui.input_checkbox_group(
                             "display_lists",
                             "",
-                            LIST_NAMES,
+                            DEFAULT_LIST_NAMES,
                             selected=["list1"],
                             inline=True
                         )
@@ -160,20 +275,119 @@ app_ui = ui.page_fillable(
 )
 
 def server(input, output, session):
-    # Create a dictionary to store tasks and descriptions for each list
-    lists_data = reactive.value({
-        list_id: {"tasks": [], "descriptions": []}
-        for list_id in LIST_NAMES.keys()
-    })
+    # Timings and counters for this session, also added to the process-wide
+    # totals (see metrics.py)
+    session_metrics = Metrics(parent=METRICS)
+
+    def timed_effect(fn):
+        return session_metrics.timed("effect_seconds", effect=fn.__name__)(fn)
+
+    # This session's lists and their names (see list_registry.py); never
+    # shared with other sessions
+    list_registry = ListRegistry(DEFAULT_LIST_NAMES)
+    # Task records for every list, indexed by task ID (see task_store.py).
+    # Every version of the store shares its unchanged lists with the one
+    # before, and each list that is on display is also published as its own
+    # reactive value, so views of one list only recompute when that list
+    # changes.
+    initial_store = TaskStore(list_registry)
+    lists_data = reactive.value(initial_store)
+    list_values = {}  # created the first time a list is displayed
+    # Bumped when lists are added, renamed, archived or deleted, for views
+    # that show them
+    list_names_version = reactive.value(0)
+    # Word index over every task (see search_index.py), updated per change
+    search_index = SearchIndex()
+
+    def set_lists(store, change=None):
+        # `change` is the change tuple that produced `store`; without one the
+        # lists were replaced wholesale and the search index is rebuilt lazily
+        lists_data.set(store)
+        for list_id, value in list_values.items():
+            value.set(store.lists.get(list_id, ()))  # no-op for the same list object
+        if change is None:
+            search_index.stale = True
+        else:
+            search_index.apply(change)
+
+    def get_list(list_id):
+        value = list_values.get(list_id)
+        if value is None:
+            with reactive.isolate():
+                tasks = lists_data.get().lists.get(list_id, ())
+            value = list_values[list_id] = reactive.value(tasks)
+        return value.get()
+
+    def lists_changed():
+        # The set of lists or their names changed: refresh everything that
+        # offers a choice of lists
+        list_names_version.set(list_names_version.get() + 1)
+        active = list_registry.active()
+        with reactive.isolate():
+            current = input.active_list()
+            displayed = [list_id for list_id in (input.display_lists() or ()) if list_id in active]
+        ui.update_radio_buttons(
+            "active_list",
+            choices=active,
+            selected=current if current in active else next(iter(active), None)
+        )
+        ui.update_checkbox_group(
+            "display_lists",
+            choices=active,
+            selected=displayed
+        )
     
     changes_unsaved = reactive.value(False)
     editing = reactive.value(False)
+    # Selected tasks by ID (see task_selection.py); kept here rather than in
+    # an input, so it survives any re-render of the lists
+    selection = reactive.value(TaskSelection())
         # Add these near the start of the server function with other reactive values
     is_online = reactive.value(True)  # Track online status
-    pending_changes = reactive.value([])  # Queue of changes made while offline
-    loaded_file_timestamp = reactive.value("")
+    # Changes since the last successful save, kept as compact operations
+    # rather than full snapshots; optionally persisted so they survive restarts
+    change_journal = ChangeJournal(max_ops=OFFLINE_JOURNAL_MAX_OPS)
+    # The GitHub version our local edits are based on. A plain dict rather
+    # than a reactive.value because the I/O workers read and advance it off
+    # the event loop; saves run one at a time, so a queued save always sees
+    # the SHA written by the one before it. "commit" and "tree" are the commit
+    # our last write made, while nobody else is known to have committed since.
+    github_base = {"sha": None, "timestamp": "", "content": "", "commit": None, "tree": None}
+    # The same for the one-file-per-list layout (see sharded_lists.py)
+    sharded_base = ShardedBase()
+    # ToDoListNames.txt as last loaded or saved; list changes are written
+    # with the next save of the tasks, in the same commit
+    saved_names = {"text": list_registry.format()}
     showing_conflict_dialog = reactive.value(False)
+    # (MergeResult, GitHub base, merged list registry, GitHub's names file)
+    # awaiting the user's choices
+    merge_state = reactive.value(None)
 
+    # One pooled GitHub client per session, rebuilt when the credentials change
+    github_clients = {}
+
+    def get_github_client():
+        repo = input.github_repo()
+        token = input.github_token()
+        client = github_clients.get("current")
+        if client is None or client.repo != repo or client.token != token:
+            if client is not None:
+                client.close()
+            client = GitHubClient(repo, token, monitor=github_connectivity, metrics=session_metrics,
+                                  shared=shared_cache)
+            github_clients["current"] = client
+        if OFFLINE_JOURNAL_DIR:
+            # Not kept on disk until the browser has said who it is
+            with reactive.isolate():
+                browser_id = input.browser_id() if "browser_id" in input else None
+            change_journal.path = journal_path(OFFLINE_JOURNAL_DIR, repo, token, browser_id) if browser_id else None
+        return client
+
+    @session.on_ended
+    def close_github_client():
+        client = github_clients.pop("current", None)
+        if client is not None:
+            client.close()
    
     def format_metadata(timestamp):
         return f"--- METADATA ---\nLast updated: {timestamp}\n--- END METADATA ---\n\n"
@@ -188,64 +402,367 @@ def server(input, output, session):
         except:
             return ""  # Return empty string on any error
     
-    def check_for_conflicts():
-        if not input.github_token() or not input.github_repo():
-            return False
-        
+    def read_task_lists(content, errors=None, names=None):
+        # Malformed lines are skipped (and collected in `errors`) rather than
+        # failing the whole load. List headers are matched against `names`
+        # (default: this session's lists).
+        errors = [] if errors is None else errors
+        names = list_registry.names if names is None else names
+        with session_metrics.span("parse_seconds", layout="single"):
+            if shared_cache is None:
+                new_data = parse_task_lists(content, names, errors)
+            else:
+                # Parsed once per process for each version of the file and
+                # set of lists; every session gets its own copy-on-write view
+                key = ("tasks", "ToDoList.txt", blob_sha(content), tuple(names.items()))
+                new_data = shared_cache.parsed(
+                    key, lambda text, parse_errors: parse_task_lists(text, names, parse_errors), content, errors
+                )
+        for error in errors:
+            logger.warning("Skipped unreadable line in ToDoList.txt, %s", error)
+        if errors:
+            session_metrics.count("parse_errors_total", len(errors), layout="single")
+        return new_data
+
+    def parse_list_file_shared(list_id, text, errors=None):
+        # Task records never change once parsed, so a list file's tasks can
+        # be shared by every session that reads the same version of it
+        key = ("list", list_id, blob_sha(text))
+        return shared_cache.parsed(key, lambda text, parse_errors: parse_list_file(list_id, text, parse_errors),
+                                   text, errors)
+
+    def read_list_files(texts, errors=None, names=None):
+        # The same for the one-file-per-list layout: {list_id: file text}
+        errors = [] if errors is None else errors
+        names = list_registry.names if names is None else names
+        with session_metrics.span("parse_seconds", layout="sharded"):
+            if shared_cache is None:
+                new_data = parse_lists(texts, names, errors)
+            else:
+                new_data = parse_lists(texts, names, errors, parse_file=parse_list_file_shared)
+        for error in errors:
+            logger.warning("Skipped unreadable line in a list file, %s", error)
+        if errors:
+            session_metrics.count("parse_errors_total", len(errors), layout="sharded")
+        return new_data
+
+    # Serialized blocks of unchanged lists are reused from the last save
+    task_serializer = TaskListSerializer()
+
+    def format_task_lists(data):
+        return task_serializer.format(data, list_registry.names)
+
+    def push_task_lists(client, body, message, force=False, names=None, removed=()):
+        # Single round-trip save, run on the I/O pool (no reactive reads or
+        # writes in here). The base SHA is sent as the PUT precondition, so
+        # GitHub itself rejects the write (409/422) if the file changed
+        # underneath us. We only read first when there is no base SHA yet,
+        # or when overwriting and we need the remote SHA.
+        if names is not None:
+            return push_tasks_and_names(client, body, message, force, names)
+        path = "ToDoList.txt"
+        sha = github_base["sha"]
+
+        if force or not sha:
+            response = client.get_file(path)
+            if response.ok:
+                github_timestamp = extract_metadata(response.content)
+                stored_timestamp = github_base["timestamp"]
+                if not force and github_timestamp != stored_timestamp:
+                    logger.info("Save conflict: ToDoList.txt updated %s on GitHub, ours is from %s",
+                                github_timestamp, stored_timestamp)
+                    client.metrics.count("save_conflicts_total", layout="single")
+                    return FileResult(409)
+                sha = response.sha
+            elif response.status_code != 404:
+                return response
+
+        current_timestamp = datetime.now(timezone.utc).isoformat()
+        content = format_metadata(current_timestamp) + body
+        response = client.put_file(path, content, message, sha=sha)
+
+        if response.status_code in [200, 201]:
+            github_base["sha"] = response.sha
+            github_base["timestamp"] = str(current_timestamp)
+            github_base["content"] = content
+            github_base["commit"], github_base["tree"] = response.commit, response.tree
+        elif response.conflict:
+            logger.info("Save conflict: GitHub rejected our base SHA for ToDoList.txt")
+            client.metrics.count("save_conflicts_total", layout="single")
+        return response
+
+    def push_tasks_and_names(client, body, message, force, names):
+        # The lists and their names in one commit (see CommitBuilder), so
+        # GitHub never has one without the other. Straight after our own
+        # write the branch can only move from our commit, which the ref update
+        # checks; otherwise we look up the head and compare the tasks file's
+        # SHA with our base first. The names file is last-writer-wins.
+        parent, tree = github_base["commit"], github_base["tree"]
+        check = force or parent is None
+        for _ in range(MAX_COMMIT_ATTEMPTS):
+            if check:
+                head = client.get_head()
+                files = client.get_tree(head.tree) if head.ok else None
+                if files is None:
+                    return head if not head.ok else FileResult(500)
+                if not force and files.get("ToDoList.txt") != github_base["sha"]:
+                    logger.info("Save conflict: ToDoList.txt changed on GitHub")
+                    client.metrics.count("save_conflicts_total", layout="single")
+                    return FileResult(409)
+                parent, tree = head.commit, head.tree
+
+            current_timestamp = datetime.now(timezone.utc).isoformat()
+            content = format_metadata(current_timestamp) + body
+            commit = CommitBuilder(client, parent, tree)
+            commit.write("ToDoList.txt", content)
+            commit.write("ToDoListNames.txt", names)
+            response = commit.commit(message)
+            if response.ok:
+                github_base.update(sha=blob_sha(content), timestamp=str(current_timestamp), content=content,
+                                   commit=response.commit, tree=response.tree)
+                return response
+            if not response.conflict:
+                return response
+            client.metrics.count("github_commit_retries_total")
+            check = True  # someone committed since `parent`
+        return FileResult(409)
+
+    def push_list_files(client, texts, message, force=False, names=None, removed=()):
+        # One-file-per-list layout: a single commit with just the lists that
+        # changed (and the names, if they changed), checked for conflicts list
+        # by list (see sharded_lists.py). Only the files of lists this session
+        # deleted (`removed`) are deleted.
+        extra_files = {"ToDoListNames.txt": names} if names is not None else None
+        response = push_lists(client, sharded_base, texts, message, force, extra_files, removed)
+        if response.conflicts:
+            logger.info("Save conflict in %s", ", ".join(response.conflicts))
+            client.metrics.count("save_conflicts_total", layout="sharded")
+        return response
+
+    @reactive.extended_task
+    async def save_task(job, client, data, body, message, force):
+        push = push_list_files if job["sharded"] else push_task_lists
         try:
-            # GitHub API endpoint
-            repo = input.github_repo()
-            path = "ToDoList.txt"
-            url = f"https://api.github.com/repos/{repo}/contents/{path}"
-    
-            # Headers for authentication
-            headers = {
-                "Authorization": f"token {input.github_token()}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-    
-            # Get the file content
-            response = requests.get(url, headers=headers)
-            
-            if response.status_code == 200:
-                # Decode content from base64
-                content = base64.b64decode(response.json()["content"]).decode()
-                github_timestamp = extract_metadata(content)
-                stored_timestamp = loaded_file_timestamp.get()
-                
-                print(f"Current GitHub timestamp: {github_timestamp}")
-                print(f"Stored local timestamp: {stored_timestamp}")
-                
-                # Only detect conflict if both timestamps exist and are different
-                if github_timestamp and stored_timestamp and github_timestamp != stored_timestamp:
-                    print("Conflict detected!")
-                    return True
-                print("No conflict detected")
-            return False
+            response = await run_io(client.at_priority, SAVE, push, client, body, message, force, job["names"],
+                                    job["removed"])
         except Exception as e:
-            print(f"Error in check_for_conflicts: {str(e)}")
-            return False
-    
+            return job, data, e
+        return job, data, response
+
+    def start_save(kind, message, force=False, folded=1):
+        # Serialize on the event loop, where reactive values can be read and
+        # the lists, their names and the journal checkpoint are taken at the
+        # same moment (task_serializer is not thread-safe either), then hand
+        # the network work to save_task
+        data = lists_data.get()
+        client = get_github_client()
+        sharded = input.sharded_storage()
+        with session_metrics.span("serialize_seconds", layout="sharded" if sharded else "single"):
+            body = task_serializer.blocks(data, list_registry.names) if sharded else format_task_lists(data)
+        # List names that changed since they were last saved go in the same commit
+        names = list_registry.format()
+        # Lists deleted here since the names were last saved; any other list
+        # GitHub has that we don't was created elsewhere and stays
+        removed = [list_id for list_id in ListRegistry.parse(saved_names["text"]) if list_id not in list_registry]
+        job = {"kind": kind, "folded": folded, "journal_seq": change_journal.checkpoint(),
+               "client": client, "sharded": sharded, "started": time.perf_counter(),
+               "names": names if names != saved_names["text"] else None, "removed": removed}
+        github_status.set("⏳ Saving to GitHub...")
+        save_task(job, client, data, body, message, force)
+
+    @reactive.effect
+    @timed_effect
+    def handle_save_result():
+        job, data, response = save_task.result()
+        with reactive.isolate():
+            saved_status, error_status = SAVE_STATUS[job["kind"]]
+            outcome = ("rate_limited" if isinstance(response, RateLimited) else
+                       "error" if isinstance(response, Exception) else
+                       "saved" if response.status_code in (200, 201) else
+                       "conflict" if response.conflict else "failed")
+            session_metrics.count("saves_total", kind=job["kind"], outcome=outcome)
+            session_metrics.observe("save_seconds", time.perf_counter() - job["started"], kind=job["kind"])
+            if isinstance(response, RequestException) and job["kind"] == "auto":
+                github_status.set("⚠️ Changes pending - Network error")
+            elif isinstance(response, RateLimited):
+                # Nothing was sent; autosave tries again once GitHub allows it
+                github_status.set(f"⚠️ Changes pending - {response}")
+                save_scheduler.defer(response.retry_after)
+                autosave_wakeup.set(autosave_wakeup.get() + 1)
+            elif isinstance(response, Exception):
+                github_status.set(f"{error_status}: {str(response)}")
+            elif response.status_code in [200, 201]:
+                # Edits made while the save was in flight are still unsaved
+                change_journal.discard_through(job["journal_seq"])
+                if job["names"] is not None:
+                    saved_names["text"] = job["names"]
+                store_local_cache(job["client"])
+                if lists_data.get() is data:
+                    changes_unsaved.set(False)
+                if job["folded"] > 1:
+                    saved_status += f" ({job['folded']} changes in one commit)"
+                github_status.set(saved_status)
+                if job["sharded"] and response.behind:
+                    # Saved, and someone else changed other lists meanwhile
+                    start_merge()
+            elif response.conflict:
+                # Someone else saved first: merge their version with ours
+                start_merge()
+            else:
+                github_status.set(f"{error_status}: {response.status_code}")
+
     @render.ui
     def conflict_dialog():
         if not showing_conflict_dialog.get():
             return ui.div()
         
+        pending_merge = merge_state.get()
+        if pending_merge is None:
+            return ui.card(
+                ui.h3("Conflict Detected!", style="color: red;"),
+                ui.p("The file on GitHub has been modified since you last loaded it."),
+                ui.p("What would you like to do?"),
+                ui.div(
+                    ui.input_action_button("resolve_conflict_overwrite", "Overwrite GitHub Version", class_="btn-warning"),
+                    ui.input_action_button("resolve_conflict_reload", "Reload from GitHub", class_="btn-info"),
+                    style="display: flex; gap: 10px;"
+                )
+            )
+        
+        # Only the parts both sides changed differently need a decision;
+        # everything else has already been merged
+        result = pending_merge[0]
+        conflict_items = []
+        for i, conflict in enumerate(result.conflicts):
+            conflict_items.append(ui.div(
+                ui.h5(list_registry.name(conflict.list_id)),
+                ui.row(
+                    ui.column(6, ui.strong("Your version"),
+                              *[ui.p(f"• {title}") for _, title, _ in conflict.local] or [ui.p("(removed)")]),
+                    ui.column(6, ui.strong("GitHub version"),
+                              *[ui.p(f"• {title}") for _, title, _ in conflict.remote] or [ui.p("(removed)")])
+                ),
+                ui.input_radio_buttons(
+                    f"merge_choice_{i}",
+                    "",
+                    {"local": "Keep mine", "remote": "Keep GitHub's", "both": "Keep both"},
+                    selected="both",
+                    inline=True
+                )
+            ))
+        
         return ui.card(
-            ui.h3("Conflict Detected!", style="color: red;"),
-            ui.p("The file on GitHub has been modified since you last loaded it."),
-            ui.p("What would you like to do?"),
+            ui.h3("Merge Conflict", style="color: red;"),
+            ui.p(f"Your changes and the GitHub version were merged, except for "
+                 f"{len(result.conflicts)} place(s) both sides changed:"),
+            *conflict_items,
             ui.div(
+                ui.input_action_button("resolve_conflict_merge", "Apply Merge", class_="btn-success"),
                 ui.input_action_button("resolve_conflict_overwrite", "Overwrite GitHub Version", class_="btn-warning"),
                 ui.input_action_button("resolve_conflict_reload", "Reload from GitHub", class_="btn-info"),
                 style="display: flex; gap: 10px;"
             )
         )
     
+    @reactive.extended_task
+    async def merge_task(client, sharded):
+        # GitHub's list names and lists: (names response, lists response)
+        try:
+            # Part of a save, so it goes ahead of loads
+            return await run_io(client.at_priority, SAVE, fetch_from_github, client, sharded)
+        except Exception as e:
+            return e, None
+
+    def start_merge():
+        github_status.set("⏳ The GitHub version has changed, merging...")
+        merge_task(get_github_client(), input.sharded_storage())
+
+    @reactive.effect
+    @timed_effect
+    def handle_merge_fetch():
+        names_response, response = merge_task.result()
+        with reactive.isolate():
+            if (isinstance(names_response, Exception) or response is None or not response.ok
+                    or (isinstance(response, ShardedResult) and response.legacy is not None)):
+                # Without the GitHub copy we can only offer overwrite/reload
+                github_status.set("⚠️ Not saved - the GitHub version has changed")
+                merge_state.set(None)
+                showing_conflict_dialog.set(True)
+                return
+
+            # The lists themselves first: each side's files are read with
+            # that side's names and matched up by list ID
+            saved_registry = ListRegistry.parse(saved_names["text"])
+            remote_registry = ListRegistry.parse(names_response.content) if names_response.ok else saved_registry
+            registry, disagreements = merge_registries(saved_registry, list_registry, remote_registry)
+            if disagreements:
+                # Not something to merge silently: the user overwrites or reloads
+                github_status.set("⚠️ Not saved - lists were also renamed, added or deleted on GitHub: "
+                                  + ", ".join(registry.name(list_id) for list_id in disagreements))
+                merge_state.set(None)
+                showing_conflict_dialog.set(True)
+                return
+            if isinstance(response, ShardedResult):
+                base = read_list_files(sharded_base.texts, names=saved_registry.names)
+                remote = read_list_files(response.base.texts, names=remote_registry.names)
+                remote_base = response.base
+            else:
+                base = read_task_lists(github_base["content"], names=saved_registry.names)
+                remote = read_task_lists(response.content, names=remote_registry.names)
+                remote_base = {
+                    "sha": response.sha,
+                    "timestamp": extract_metadata(response.content),
+                    "content": response.content,
+                    "commit": None,
+                    "tree": None,
+                }
+            for list_id in list(remote.lists):
+                if list_id not in registry:  # deleted here
+                    remote.drop_list(list_id)
+            result = merge_task_lists(base, lists_data.get(), remote)
+            remote_names = remote_registry.format()
+            if result.conflicts:
+                github_status.set(f"⚠️ {len(result.conflicts)} conflict(s) need your decision")
+                merge_state.set((result, remote_base, registry, remote_names))
+                showing_conflict_dialog.set(True)
+            else:
+                commit_merge(result.resolve(), remote_base, registry, remote_names)
+
+    def commit_merge(merged, remote_base, registry, remote_names):
+        # The merge is now based on GitHub's version, names included; write
+        # it in one commit
+        if isinstance(remote_base, ShardedBase):
+            sharded_base.replace_with(remote_base)
+        else:
+            github_base.update(remote_base)
+        saved_names["text"] = remote_names
+        if registry.format() != list_registry.format():
+            list_registry.replace_with(registry)
+            lists_changed()
+        change_journal.mark_unreplayable()
+        merge_state.set(None)
+        showing_conflict_dialog.set(False)
+        set_lists(merged)
+        changes_unsaved.set(True)
+        start_save("merge", "Merge local and GitHub changes")
+
+    @reactive.effect
+    @reactive.event(input.resolve_conflict_merge)
+    @timed_effect
+    def handle_conflict_merge():
+        pending_merge = merge_state.get()
+        if pending_merge is None:
+            return
+        result, remote_base, registry, remote_names = pending_merge
+        choices = [getattr(input, f"merge_choice_{i}")() for i in range(len(result.conflicts))]
+        commit_merge(result.resolve(choices), remote_base, registry, remote_names)
+    
     @reactive.effect
     @reactive.event(input.resolve_conflict_overwrite)
+    @timed_effect
     def handle_conflict_overwrite():
         showing_conflict_dialog.set(False)
+        merge_state.set(None)
         # Force save without checking conflicts
         save_to_github(force=True)
     
@@ -254,47 +771,106 @@ def server(input, output, session):
     
     
     def check_online_status():
-        try:
-            requests.get("https://api.github.com", timeout=2)
-            return True
-        except (requests.ConnectionError, requests.Timeout):
-            return False       
+        # Cached state fed by real API traffic; never touches the network
+        return github_connectivity.online
+
+    @reactive.extended_task
+    async def probe_task():
+        return await run_io(github_connectivity.probe)
 
     def get_current_list():
-        return lists_data.get()[input.active_list()]
+        return get_list(input.active_list())
+
+    def get_selected_tasks():
+        # Selected task records, skipping any that no longer exist
+        return selection.get().tasks(lists_data.get())
+
+    def apply_changes(ops):
+        # Every edit goes through here: apply it to the lists and record it
+        # in the change journal (the delta since the last successful save).
+        # Several changes go in as one batch, applied in a single pass over
+        # each list they touch, so they make one update and one save.
+        ops = list(ops)
+        if not ops:
+            return
+        op = ops[0] if len(ops) == 1 else ("batch", ops)
+        store = lists_data.get().copy()
+        apply_change(store, op, list_registry)
+        change_journal.append(op)
+        set_lists(store, op)
+        changes_unsaved.set(True)
 
     @reactive.effect
     @reactive.event(input.add)
+    @timed_effect
     def add_task():
         if input.task().strip():
-            current_data = lists_data.get().copy()
-            current_list = current_data[input.active_list()]
-            
-            # Changed from append() to insert(0, ...)
-            current_list["tasks"].insert(0, input.task())
-            current_list["descriptions"].insert(0, input.description())
-            
-            lists_data.set(current_data)
-            changes_unsaved.set(True)
+            # New tasks go on top of the list
+            task_id = lists_data.get().unused_id()
+            apply_changes([("add", input.active_list(), 0, task_id, input.task(), input.description(), now_timestamp())])
             ui.update_text("task", value="")
         ui.update_text("description", value="")
     
-    @render.ui
-    def task_selector():
-        current_list = get_current_list()
-        if not current_list["tasks"]:
-            return ui.p("No tasks in this list")
-        
-        options = {str(i): f"{i}. {task}" 
-                  for i, task in enumerate(current_list["tasks"], 1)}
-        
-        return ui.div(
-            ui.input_checkbox_group(
-                "selected_tasks",
-                "Select Tasks to Move/Edit",
-                options
-            )
-        )
+    @reactive.effect
+    @reactive.event(input.select_task)
+    @timed_effect
+    def handle_select_task():
+        # A click on a task row: plain click selects it alone, Ctrl/Cmd-click
+        # adds or removes it, Shift-click selects the range from the last one
+        click = input.select_task()
+        store = lists_data.get()
+        task_id = click.get("id")
+        if task_id not in store:
+            return  # clicked a stale render
+        current = selection.get()
+        if click.get("shift"):
+            selection.set(current.extend_to(store, task_id, keep=bool(click.get("toggle"))))
+        elif click.get("toggle"):
+            selection.set(current.toggle(task_id))
+        else:
+            selection.set(current.only(task_id))
+
+    @reactive.effect
+    @reactive.event(input.select_matching)
+    @timed_effect
+    def select_matching_tasks():
+        matches = matching_tasks(get_current_list(), input.selection_filter())
+        selection.set(selection.get().with_tasks(task.id for task in matches))
+
+    @reactive.effect
+    @reactive.event(input.clear_selection)
+    @timed_effect
+    def clear_selection():
+        selection.set(TaskSelection())
+
+    @reactive.effect
+    @timed_effect
+    def prune_selection():
+        # Deleted tasks drop out of the selection
+        store = lists_data.get()
+        with reactive.isolate():
+            selection.set(selection.get().pruned(store))
+
+    # The selection the page was last told about
+    shown_selection = {"selection": TaskSelection()}
+
+    @reactive.effect
+    @timed_effect
+    async def send_selection():
+        # The page marks selected rows itself (they come and go as lists
+        # scroll and patch), so it only needs the IDs that changed
+        current = selection.get()
+        added, removed = selection_delta(shown_selection["selection"], current)
+        shown_selection["selection"] = current
+        if added or removed:
+            await session.send_custom_message("todo_selection", {"add": added, "remove": removed})
+
+    @render.text
+    def selection_summary():
+        count = len(selection.get())
+        if not count:
+            return "Click tasks to select them (Shift-click for a range, Ctrl/Cmd-click to add or remove)"
+        return f"{count} task{'s' if count != 1 else ''} selected"
 
     @render.text
     def online_status():
@@ -305,149 +881,188 @@ def server(input, output, session):
     
     @render.ui
     def task_lists_display():
+        # Only the layout lives here; each list renders in its own
+        # list_view_<id> output and is then kept up to date with patches
         selected_lists = input.display_lists()
         if not selected_lists:
             return ui.p("Please select lists to display")
         
         col_width = 12 // len(selected_lists)
         col_width = max(3, min(12, col_width))
-        
-        if not input.use_drag_drop():
+        return ui.row(*[
+            ui.column(col_width, ui.output_ui(f"list_view_{list_id}", style="height: 100%;"))
+            for list_id in selected_lists
+        ])
+
+    # The tasks each list view last rendered or patched to, and the first
+    # row of its rendered window (see task_view.py)
+    rendered_lists = {}
+    list_windows = {}
+
+    def render_list_view(list_id, tasks, scroll_to=None):
+        with session_metrics.span("render_seconds", view="list"):
+            return build_list_view(list_id, tasks, scroll_to)
+
+    def build_list_view(list_id, tasks, scroll_to=None):
+        drag_drop = input.use_drag_drop()
+        if not drag_drop:
             # Original markdown view
-            columns = []
-            for list_id in selected_lists:
-                current_list = lists_data.get()[list_id]
-                current_tasks = current_list["tasks"]
-                current_descriptions = current_list["descriptions"]
-                
-                task_items = []
-                task_items.append(ui.h3(LIST_NAMES[list_id]))
-                
-                if not current_tasks:
-                    task_items.append(ui.p("No tasks in this list"))
-                else:
-                    for i, (task, desc) in enumerate(zip(current_tasks, current_descriptions), 1):
-                        desc_paragraphs = [ui.p(p, style="text-indent:50px") for p in desc.split('\n')]
-                        task_html = ui.div(
-                            ui.h5(f"• {task}"),
-                            *desc_paragraphs,
-                            style="margin-bottom: 0;"
-                        )
-                        task_items.append(task_html)
-                
-                column = ui.column(
-                    col_width,
-                    ui.card(
-                        *task_items,
-                        style="height: 100%;"
-                    )
-                )
-                columns.append(column)
-            
-            return ui.row(*columns)
+            return ui.card(
+                ui.h3(list_registry.name(list_id)),
+                task_items(list_id, tasks, drag_drop, list_windows.get(list_id, 0), scroll_to),
+                style="height: 100%;"
+            )
         else:
             # Drag and drop view
-            columns = []
-            for list_id in selected_lists:
-                current_list = lists_data.get()[list_id]
-                current_tasks = current_list["tasks"]
-                current_descriptions = current_list["descriptions"]
-                
-                task_items = []
-                
-                if not current_tasks:
-                    task_items.append(ui.p("No tasks in this list"))
-                else:
-                    for i, (task, desc) in enumerate(zip(current_tasks, current_descriptions)):
-                        task_html = ui.div(
-                            {"draggable": "true",
-                             "data-task-id": f"{list_id}-{i}",
-                             "data-list-id": list_id,
-                             "data-task-index": str(i),
-                             "ondragstart": "handleDragStart(event)",
-                             "ondragover": "handleDragOver(event)",
-                             "ondrop": "handleDrop(event)",
-                             "class": "draggable-task"},
-                            ui.h5(task),
-                            ui.p(desc) if desc else "",
-                            style="cursor: move; padding: 10px; margin: 5px; border: 1px solid #ddd; border-radius: 4px;"
-                        )
-                        task_items.append(task_html)
-                
-                column = ui.column(
-                    col_width,
-                    ui.div(
-                        {"data-list-id": list_id,
-                         "class": "droppable-list",
-                         "ondragover": "handleDragOver(event)",
-                         "ondrop": "handleDrop(event)"},
-                        ui.h3(LIST_NAMES[list_id]),
-                        *task_items,
-                        style="height: 100%; min-height: 100px; padding: 10px; border: 1px dashed #ccc; border-radius: 4px;"
-                    )
-                )
-                columns.append(column)
-            
-            # Add required JavaScript
-            script = """
-            function handleDragStart(event) {
-                event.dataTransfer.setData('text/plain', 
-                    JSON.stringify({
-                        taskId: event.target.dataset.taskId,
-                        listId: event.target.dataset.listId,
-                        taskIndex: event.target.dataset.taskIndex
-                    })
-                );
-            }
-            
-            function handleDragOver(event) {
-                event.preventDefault();
-            }
-            
-            function handleDrop(event) {
-                event.preventDefault();
-                const data = JSON.parse(event.dataTransfer.getData('text/plain'));
-                
-                // Get target list and position
-                let targetElement = event.target;
-                while (targetElement && !targetElement.classList.contains('droppable-list') &&
-                       !targetElement.classList.contains('draggable-task')) {
-                    targetElement = targetElement.parentElement;
-                }
-                
-                if (!targetElement) return;
-                
-                const targetListId = targetElement.dataset.listId;
-                let targetIndex = -1;
-                
-                if (targetElement.classList.contains('draggable-task')) {
-                    targetIndex = parseInt(targetElement.dataset.taskIndex);
-                }
-                
-                // Send move information to Shiny
-                const moveInfo = {
-                    sourceListId: data.listId,
-                    sourceIndex: parseInt(data.taskIndex),
-                    targetListId: targetListId,
-                    targetIndex: targetIndex
-                };
-                
-                Shiny.setInputValue('drag_drop_move', moveInfo);
-            }
-            """
-            
-            return ui.tags.div(
-                ui.tags.script(script),
-                ui.row(*columns)
+            return ui.div(
+                {"data-list-id": list_id,
+                 "class": "droppable-list",
+                 "ondragover": "handleDragOver(event)",
+                 "ondrop": "handleDrop(event)"},
+                ui.h3(list_registry.name(list_id)),
+                task_items(list_id, tasks, drag_drop, list_windows.get(list_id, 0), scroll_to),
+                style="height: 100%; min-height: 100px; padding: 10px; border: 1px dashed #ccc; border-radius: 4px;"
             )
 
+    def register_list_view(list_id):
+        @output(id=f"list_view_{list_id}")
+        @render.ui
+        def list_view():
+            # Full render on layout changes only (the client shows the last
+            # full render again when the layout re-inserts this output)
+            input.display_lists()
+            input.use_drag_drop()
+            list_names_version.get()
+            with reactive.isolate():
+                tasks = get_list(list_id)
+            rendered_lists[list_id] = tasks
+            # A fresh render starts scrolled to the top, unless a search
+            # result in this list was picked before it was on display
+            reveal = pending_reveals.pop(list_id, None)
+            list_windows[list_id] = 0 if reveal is None else window_start(reveal, len(tasks))
+            return render_list_view(list_id, tasks, reveal)
+
+        @reactive.effect
+        @timed_effect
+        async def patch_list_view():
+            # Edits to the list reach the page as keyed patches
+            tasks = get_list(list_id)
+            with reactive.isolate():
+                rendered = rendered_lists.get(list_id)
+                if rendered is None or rendered is tasks or list_id not in (input.display_lists() or ()):
+                    return
+                drag_drop = input.use_drag_drop()
+            # Only the rendered window is compared; if the list shrank past
+            # it, the window moves up and is sent whole
+            start = list_windows.get(list_id, 0)
+            new_start = min(start, max(0, len(tasks) - WINDOW_ROWS))
+            ops = None
+            if new_start == start:
+                ops = diff_tasks(rendered[start:start + WINDOW_ROWS], tasks[start:start + WINDOW_ROWS], drag_drop)
+            rendered_lists[list_id] = tasks
+            list_windows[list_id] = new_start
+            if ops == [] and len(rendered) == len(tasks):
+                return
+            await send_list_patch(list_id, tasks, new_start, drag_drop, ops)
+
+    # Views are set up the first time their list is displayed, so a user
+    # with hundreds of lists only pays for the ones they look at
+    registered_views = set()
+
+    @reactive.effect
+    @timed_effect
+    def register_displayed_views():
+        for list_id in input.display_lists() or ():
+            if list_id not in registered_views:
+                registered_views.add(list_id)
+                register_list_view(list_id)
+
+    async def send_list_patch(list_id, tasks, start, drag_drop, ops=None, scroll_to=None):
+        message = {"list": list_id, "start": start, "total": len(tasks)}
+        if ops is None:
+            with session_metrics.span("render_seconds", view="window"):
+                message["html"] = str(task_window(tasks, start, drag_drop))
+        else:
+            message["ops"] = ops
+        if scroll_to is not None:
+            message["scrollTo"] = scroll_to
+        await session.send_custom_message("todo_list_patch", message)
+
+    @reactive.effect
+    @reactive.event(input.list_window)
+    @timed_effect
+    async def handle_list_window():
+        # The user scrolled a list view: send the rows around the new position
+        request = input.list_window()
+        list_id = request.get("list")
+        if list_id not in rendered_lists or list_id not in (input.display_lists() or ()):
+            return
+        tasks = get_list(list_id)
+        start = window_start(int(request.get("first", 0)), len(tasks))
+        rendered_lists[list_id] = tasks
+        list_windows[list_id] = start
+        await send_list_patch(list_id, tasks, start, input.use_drag_drop())
+
+    # Rows to scroll to in lists that are about to be rendered
+    pending_reveals = {}
+
+    @render.ui
+    def search_results():
+        query = input.search_query()
+        if not query.strip():
+            return ui.div()
+        store = lists_data.get()
+        list_names_version.get()
+        results = [(task, position) for task, position in search_index.search(query, store)
+                   if task.list_id not in list_registry.archived]
+        if not results:
+            return ui.p("No matching tasks")
+        return ui.div(
+            *[
+                ui.tags.a(
+                    {"href": "#",
+                     "class": "search-result",
+                     "data-task-id": task.id,
+                     "onclick": "Shiny.setInputValue('search_pick', this.dataset.taskId, {priority: 'event'}); return false;"},
+                    f"{list_registry.name(task.list_id)} #{position + 1}: {task.title}"
+                )
+                for task, position in results
+            ]
+        )
+
+    @reactive.effect
+    @reactive.event(input.search_pick)
+    @timed_effect
+    async def handle_search_pick():
+        # Select the task and bring it into view in its list
+        store = lists_data.get()
+        task = store.get(input.search_pick())
+        if task is None:
+            return
+        selection.set(TaskSelection().only(task.id))
+        ui.update_radio_buttons("active_list", selected=task.list_id)
+        position = store.position(task)
+        displayed = list(input.display_lists() or ())
+        if task.list_id not in displayed or task.list_id not in rendered_lists:
+            pending_reveals[task.list_id] = position
+            if task.list_id not in displayed:
+                ui.update_checkbox_group("display_lists", selected=displayed + [task.list_id])
+            return
+        tasks = get_list(task.list_id)
+        start = window_start(position, len(tasks))
+        rendered_lists[task.list_id] = tasks
+        list_windows[task.list_id] = start
+        await send_list_patch(task.list_id, tasks, start, input.use_drag_drop(), scroll_to=position)
+
     @render.ui
     def move_controls():
-        if not input.selected_tasks():
+        if not selection.get():
             return ui.div()
             
+        list_names_version.get()
         current_list_id = input.active_list()
-        move_options = {k: v for k, v in LIST_NAMES.items() if k != current_list_id}
+        targets = list_registry.active()
+        default_target = next((k for k in targets if k != current_list_id), None)
         
         return ui.card(
             {"class": "control-panel"},
@@ -456,9 +1071,17 @@ def server(input, output, session):
                 ui.input_radio_buttons(
                     "move_to_list",
                     "Move selected tasks to:",
-                    move_options,
+                    targets,
+                    selected=default_target,
                     inline=True
                 ),
+                ui.input_numeric(
+                    "move_position",
+                    "At position (blank for the end)",
+                    value=None,
+                    min=1,
+                    width="200px"
+                ),
                 ui.input_action_button(
                     "move_tasks", 
                     "Move Tasks", 
@@ -470,61 +1093,36 @@ def server(input, output, session):
     
     @reactive.effect
     @reactive.event(input.drag_drop_move)
+    @timed_effect
     def handle_drag_drop_move():
         move_info = input.drag_drop_move()
-        current_data = lists_data.get().copy()
-        
-        source_list = current_data[move_info["sourceListId"]]
-        source_index = move_info["sourceIndex"]
-        target_list_id = move_info["targetListId"]
-        target_index = move_info["targetIndex"]
-        
-        # Get the task and description to move
-        task = source_list["tasks"][source_index]
-        desc = source_list["descriptions"][source_index]
-        
-        # Remove from source
-        source_list["tasks"].pop(source_index)
-        source_list["descriptions"].pop(source_index)
+        store = lists_data.get()
+        task = store.get(move_info["taskId"])
+        if task is None or move_info["targetListId"] not in store.lists:
+            return  # dropped from a stale render
         
-        # Add to target
-        if target_list_id == move_info["sourceListId"]:
-            # Moving within the same list
-            if target_index >= 0:
-                # Insert at specific position
-                target_index = min(target_index, len(source_list["tasks"]))
-                source_list["tasks"].insert(target_index, task)
-                source_list["descriptions"].insert(target_index, desc)
-            else:
-                # Append to end
-                source_list["tasks"].append(task)
-                source_list["descriptions"].append(desc)
-        else:
-            # Moving to different list
-            target_list = current_data[target_list_id]
-            if target_index >= 0:
-                # Insert at specific position
-                target_index = min(target_index, len(target_list["tasks"]))
-                target_list["tasks"].insert(target_index, task)
-                target_list["descriptions"].insert(target_index, desc)
-            else:
-                # Append to end
-                target_list["tasks"].append(task)
-                target_list["descriptions"].append(desc)
-        
-        lists_data.set(current_data)
-        changes_unsaved.set(True)
+        # Dropped on a task: take its place; dropped on rows outside the
+        # rendered window: take that row's index; dropped on the list: append
+        target_index = -1
+        target_task = store.get(move_info.get("targetTaskId"))
+        if target_task is not None and target_task.list_id == move_info["targetListId"]:
+            target_index = store.position(target_task)
+        elif move_info.get("targetIndex") is not None:
+            target_index = int(move_info["targetIndex"])
+        apply_changes([("move", task.id, move_info["targetListId"], target_index)])
 
 
     @render.ui
     def edit_controls():
-        if not input.selected_tasks():
+        if not selection.get():
             return ui.div()
         
-        if len(input.selected_tasks()) == 1:
+        if len(selection.get()) == 1:
             if editing.get():
-                task_idx = int(input.selected_tasks()[0]) - 1
-                current_list = get_current_list()
+                selected = get_selected_tasks()
+                if not selected:
+                    return ui.div()
+                task = selected[0]
                 
                 return ui.card(
                     {"class": "control-panel"},
@@ -532,12 +1130,12 @@ def server(input, output, session):
                     ui.input_text(
                         "edit_task",
                         "Task",
-                        value=current_list["tasks"][task_idx]
+                        value=task.title
                     ),
                     ui.input_text_area(
                         "edit_description",
                         "Description",
-                        value=current_list["descriptions"][task_idx],
+                        value=task.description,
                         height="100px"
                     ),
                     ui.div(
@@ -573,151 +1171,153 @@ def server(input, output, session):
 
     @reactive.effect
     @reactive.event(input.move_tasks)
+    @timed_effect
     def move_selected_tasks():
-        if not input.selected_tasks():
+        if not selection.get():
             return
             
-        selected_indices = [int(idx) - 1 for idx in input.selected_tasks()]
-        source_list_id = input.active_list()
         target_list_id = input.move_to_list()
+        position = input.move_position()
+        index = int(position) - 1 if position else -1
         
-        current_data = lists_data.get().copy()
-        source_list = current_data[source_list_id]
-        target_list = current_data[target_list_id]
-        
-        # Get tasks and descriptions to move
-        tasks_to_move = [source_list["tasks"][i] for i in selected_indices]
-        descriptions_to_move = [source_list["descriptions"][i] for i in selected_indices]
-        
-        # Add to target list
-        target_list["tasks"].extend(tasks_to_move)
-        target_list["descriptions"].extend(descriptions_to_move)
-        
-        # Remove from source list (in reverse order to maintain indices)
-        for i in sorted(selected_indices, reverse=True):
-            source_list["tasks"].pop(i)
-            source_list["descriptions"].pop(i)
-        
-        lists_data.set(current_data)
-        changes_unsaved.set(True)  # Add this line
+        # One batch: the selected tasks land together at the position (or
+        # the end of the list) in selection order
+        apply_changes([("move", task.id, target_list_id, index) for task in get_selected_tasks()])
+
+    @reactive.effect
+    @reactive.event(input.sort_list)
+    @timed_effect
+    def sort_working_list():
+        apply_changes([("sort", input.active_list(), input.sort_key(), input.sort_descending())])
 
     @reactive.effect
     @reactive.event(input.start_edit)
+    @timed_effect
     def start_editing():
         editing.set(True)
 
     @reactive.effect
     @reactive.event(input.cancel_edit)
+    @timed_effect
     def cancel_editing():
         editing.set(False)
 
     @reactive.effect
     @reactive.event(input.save_edit)
+    @timed_effect
     def save_edit():
-        if not input.selected_tasks():
+        if not selection.get():
             return
             
-        task_idx = int(input.selected_tasks()[0]) - 1
-        current_data = lists_data.get().copy()
-        current_list = current_data[input.active_list()]
-        
-        current_list["tasks"][task_idx] = input.edit_task()
-        current_list["descriptions"][task_idx] = input.edit_description()
-        
-        lists_data.set(current_data)
-        changes_unsaved.set(True)  # Add this line
+        selected = get_selected_tasks()
+        if selected:
+            apply_changes([("edit", selected[0].id, input.edit_task(), input.edit_description(), now_timestamp())])
         editing.set(False)
 
     # Add a reactive value for GitHub save status
     github_status = reactive.value("")
 
+    # Autosave is debounced: mutations mark the scheduler dirty and
+    # flush_auto_save writes once the edits settle
+    save_scheduler = SaveScheduler(AUTOSAVE_QUIET_SECONDS, AUTOSAVE_MAX_DELAY_SECONDS)
+    autosave_wakeup = reactive.value(0)
+
   
     @render.text
     def github_status_output():
         return github_status.get()
 
+    def metric_label(name, labels):
+        # "effect add_task" for effect_seconds{effect="add_task"}
+        name = name.removesuffix("_seconds").removesuffix("_total")
+        return " ".join([name, *(value for _, value in labels)])
+
+    @render.ui
+    def metrics_panel():
+        # Where this session's time went (slowest first) and what it sent
+        # to GitHub, while the dashboard switch is on
+        if not input.show_metrics():
+            return ui.div()
+        reactive.invalidate_later(METRICS_REFRESH_SECONDS)
+        counters, histograms = session_metrics.snapshot()
+        histograms.sort(key=lambda item: -item[1].sum)
+        cell = ui.tags.td
+        span_rows = [
+            ui.tags.tr(cell(metric_label(*key)), cell(h.count), cell(f"{h.sum / h.count * 1000:.1f}"),
+                       cell(f"{h.quantile(0.95) * 1000:.1f}"), cell(f"{h.max * 1000:.1f}"))
+            for key, h in histograms
+        ]
+        counter_rows = [ui.tags.tr(cell(metric_label(*key)), cell(value)) for key, value in counters]
+        return ui.div(
+            ui.tags.table(
+                {"class": "table table-sm"},
+                ui.tags.tr(*[ui.tags.th(title) for title in ("Span", "n", "avg ms", "p95 ms", "max ms")]),
+                *span_rows,
+            ),
+            ui.tags.table({"class": "table table-sm"}, *counter_rows),
+            style="font-size: 0.75rem; max-height: 40vh; overflow-y: auto;",
+        )
+
+    @reactive.effect
+    @reactive.event(input.startup_timing)
+    @timed_effect
+    def record_startup_timing():
+        # How long the page took to connect and to become usable, as
+        # measured in the browser (see metrics.py)
+        for phase, seconds in input.startup_timing().items():
+            if isinstance(seconds, (int, float)):
+                session_metrics.observe("startup_seconds", seconds, phase=phase)
+
     @reactive.effect
     @reactive.event(input.move_up)
+    @timed_effect
     def move_task_up():
-        if not input.selected_tasks() or len(input.selected_tasks()) != 1:
+        if len(selection.get()) != 1:
             return
             
-        task_idx = int(input.selected_tasks()[0]) - 1
+        selected = get_selected_tasks()
+        if not selected:
+            return
+        task = selected[0]
+        task_idx = lists_data.get().position(task)
         if task_idx <= 0:  # Can't move up if already at top
             return
             
-        current_data = lists_data.get().copy()
-        current_list = current_data[input.active_list()]
-        
-        # Swap tasks
-        current_list["tasks"][task_idx], current_list["tasks"][task_idx-1] = \
-            current_list["tasks"][task_idx-1], current_list["tasks"][task_idx]
-        
-        # Swap descriptions
-        current_list["descriptions"][task_idx], current_list["descriptions"][task_idx-1] = \
-            current_list["descriptions"][task_idx-1], current_list["descriptions"][task_idx]
-        
-        lists_data.set(current_data)
-        changes_unsaved.set(True)  # Add this line
-        
-        # Update the selection to follow the moved task
-        ui.update_checkbox_group(
-            "selected_tasks",
-            selected=[str(task_idx)]  # Index is 0-based, but UI is 1-based
-        )
+        # The selection is by ID, so it follows the moved task
+        apply_changes([("move", task.id, task.list_id, task_idx - 1)])
 
     @reactive.effect
     @reactive.event(input.move_down)
+    @timed_effect
     def move_task_down():
-        if not input.selected_tasks() or len(input.selected_tasks()) != 1:
+        if len(selection.get()) != 1:
             return
             
-        task_idx = int(input.selected_tasks()[0]) - 1
-        current_data = lists_data.get().copy()
-        current_list = current_data[input.active_list()]
+        selected = get_selected_tasks()
+        if not selected:
+            return
+        task = selected[0]
+        task_idx = lists_data.get().position(task)
         
-        if task_idx >= len(current_list["tasks"]) - 1:  # Can't move down if already at bottom
+        if task_idx >= len(lists_data.get().tasks(task.list_id)) - 1:  # Can't move down if already at bottom
             return
             
-        # Swap tasks
-        current_list["tasks"][task_idx], current_list["tasks"][task_idx+1] = \
-            current_list["tasks"][task_idx+1], current_list["tasks"][task_idx]
-        
-        # Swap descriptions
-        current_list["descriptions"][task_idx], current_list["descriptions"][task_idx+1] = \
-            current_list["descriptions"][task_idx+1], current_list["descriptions"][task_idx]
-        
-        lists_data.set(current_data)
-        changes_unsaved.set(True)  # Add this line
-        
-        # Update the selection to follow the moved task
-        ui.update_checkbox_group(
-            "selected_tasks",
-            selected=[str(task_idx + 2)]  # Index is 0-based, but UI is 1-based
-        )    
+        apply_changes([("move", task.id, task.list_id, task_idx + 1)])
     
     @reactive.effect
     @reactive.event(input.delete_task)
+    @timed_effect
     def delete_task():
-        if not input.selected_tasks():
+        if not selection.get():
             return
             
-        selected_indices = [int(idx) - 1 for idx in input.selected_tasks()]
-        current_data = lists_data.get().copy()
-        current_list = current_data[input.active_list()]
-        
-        # Remove tasks and descriptions in reverse order to maintain correct indices
-        for idx in sorted(selected_indices, reverse=True):
-            current_list["tasks"].pop(idx)
-            current_list["descriptions"].pop(idx)
-        
-        lists_data.set(current_data)
-        changes_unsaved.set(True)    
+        apply_changes([("delete", task.id) for task in get_selected_tasks()])
    
     @reactive.effect
     @reactive.event(lists_data, input.autosave_enabled)
+    @timed_effect
     def auto_save():
-        # Check online status first
+        # Check online status first (cached, no request)
         is_online.set(check_online_status())
         
         # If autosave was just disabled but there are no actual changes,
@@ -737,284 +1337,94 @@ def server(input, output, session):
             github_status.set("Please fill in GitHub credentials to enable auto-save")
             return
     
-        # If we're offline, queue the changes
+        # If we're offline, the journal already holds the changes
         if not is_online.get():
             if changes_unsaved.get():
-                github_status.set("⚠️ Changes pending - Currently offline")
-                # Store the current state
-                pending_changes.set(pending_changes.get() + [lists_data.get()])
+                pending = f"{len(change_journal)} change(s)" if not change_journal.overflowed else "Changes"
+                github_status.set(f"⚠️ {pending} pending - Currently offline")
             return
     
-        # Check for conflicts first, before creating new timestamp
-        path = "ToDoList.txt"
-        try:
-            # GitHub API endpoint
-            repo = input.github_repo()
-            url = f"https://api.github.com/repos/{repo}/contents/{path}"
-            headers = {
-                "Authorization": f"token {input.github_token()}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-            
-            # Get current GitHub content
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                content = base64.b64decode(response.json()["content"]).decode()
-                github_timestamp = extract_metadata(content)
-                stored_timestamp = loaded_file_timestamp.get()
-                
-                print(f"Auto-save - GitHub timestamp: {github_timestamp}")
-                print(f"Auto-save - Local timestamp: {stored_timestamp}")
-                
-                if github_timestamp != stored_timestamp:
-                    print("Auto-save - Conflict detected!")
-                    showing_conflict_dialog.set(True)
-                    return
-        except Exception as e:
-            print(f"Auto-save - Error checking conflicts: {str(e)}")
+        # Fold this mutation into the next scheduled save instead of writing
+        # now, and into fewer, later saves when the rate limit is close
+        delay = input.autosave_delay()
+        save_scheduler.quiet_seconds = max(0.0, float(delay)) if delay is not None else AUTOSAVE_QUIET_SECONDS
+        save_scheduler.max_delay_seconds = AUTOSAVE_MAX_DELAY_SECONDS
+        saving = "saving shortly"
+        if get_github_client().budget.pressure():
+            save_scheduler.quiet_seconds = max(save_scheduler.quiet_seconds, RATE_LIMITED_QUIET_SECONDS)
+            save_scheduler.max_delay_seconds = RATE_LIMITED_MAX_DELAY_SECONDS
+            saving = "saving less often near GitHub's rate limit"
+        save_scheduler.mark_dirty()
+        github_status.set(f"⏳ {save_scheduler.pending} unsaved change(s) - {saving}")
+        autosave_wakeup.set(autosave_wakeup.get() + 1)
+
+    @reactive.effect
+    @timed_effect
+    def flush_auto_save():
+        # Wakes up whenever a mutation is scheduled and again when the quiet
+        # window (or the max delay) runs out, then writes only the latest state
+        autosave_wakeup.get()
+        wait = save_scheduler.seconds_until_due()
+        if wait is None:
             return
-    
-        try:
-            # Now proceed with save
-            data = lists_data.get()
-            current_timestamp = datetime.now(timezone.utc).isoformat()
-            formatted_data = format_metadata(current_timestamp)
-            
-            for list_id, list_name in LIST_NAMES.items():
-                formatted_data += f"=== {list_name} ===\n"
-                list_content = data[list_id]
-                for task, desc in zip(list_content["tasks"], list_content["descriptions"]):
-                    formatted_data += f"- {task}\n"
-                    if desc.strip():
-                        formatted_data += f"  |{desc}\n"
-                formatted_data += "\n"
-    
-            # Check if file exists and get its SHA
-            try:
-                response = requests.get(url, headers=headers)
-                sha = response.json()["sha"] if response.status_code == 200 else None
-            except:
-                sha = None
-    
-            # Prepare the content
-            content = base64.b64encode(formatted_data.encode()).decode()
-    
-            # Prepare the data for the API request
-            data = {
-                "message": "Auto-update task lists",
-                "content": content,
-            }
-            if sha:
-                data["sha"] = sha
-    
-            # Make the API request
-            response = requests.put(url, headers=headers, json=data)
-    
-            if response.status_code in [200, 201]:
-                github_status.set("✓ Changes saved automatically")
-                changes_unsaved.set(False)
-                loaded_file_timestamp.set(str(current_timestamp))
-            else:
-                github_status.set(f"❌ Error auto-saving: {response.status_code}")
-    
-        except requests.RequestException as e:
-            github_status.set("⚠️ Changes pending - Network error")
-        except Exception as e:
-            github_status.set(f"❌ Error auto-saving: {str(e)}")
+        if wait > 0:
+            reactive.invalidate_later(wait)
+            return
+        with reactive.isolate():
+            write_auto_save()
+
+    def write_auto_save():
+        folded = save_scheduler.take()
+        if not input.autosave_enabled() or not changes_unsaved.get():
+            return
+        start_save("auto", "Auto-update task lists", folded=folded)
 
 
     @reactive.effect
+    @timed_effect
     def handle_online_status():
-        # Periodically check online status
+        # Re-read the shared monitor every few seconds (no network). GitHub is
+        # only probed when the cached state is stale or the offline backoff
+        # has run out, and the probe runs off the event loop.
+        reactive.invalidate_later(ONLINE_POLL_SECONDS)
+        probe_task.status()
+        with reactive.isolate():
+            if github_connectivity.needs_probe() and probe_task.status() != "running":
+                probe_task()
         current_online_status = check_online_status()
+        with reactive.isolate():
+            came_back_online = current_online_status and not is_online.get()
         is_online.set(current_online_status)
         
         # If we just came back online and have pending changes
-        if current_online_status and pending_changes.get():
+        if came_back_online and change_journal:
             try:
                 # Process pending changes
-                if input.autosave_enabled():
-                    # Trigger a save with the latest state
-                    lists_data.set(pending_changes.get()[-1])  # Use most recent change
-                    pending_changes.set([])  # Clear the queue
+                if input.autosave_enabled() and changes_unsaved.get():
+                    # Schedule one save of the latest state
+                    save_scheduler.mark_dirty()
+                    autosave_wakeup.set(autosave_wakeup.get() + 1)
                     github_status.set("✓ Syncing changes after coming back online...")
             except Exception as e:
                 github_status.set(f"❌ Error syncing changes: {str(e)}")
     
     @reactive.effect
     @reactive.event(input.quick_save)
+    @timed_effect
     def handle_quick_save():
         if not input.github_token() or not input.github_repo():
             github_status.set("Please fill in GitHub credentials in the sidebar first")
             return
     
-        # Check for conflicts first, before creating new timestamp
-        path = "ToDoList.txt"
-        try:
-            # GitHub API endpoint
-            repo = input.github_repo()
-            url = f"https://api.github.com/repos/{repo}/contents/{path}"
-            headers = {
-                "Authorization": f"token {input.github_token()}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-            
-            # Get current GitHub content
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                content = base64.b64decode(response.json()["content"]).decode()
-                github_timestamp = extract_metadata(content)
-                stored_timestamp = loaded_file_timestamp.get()
-                
-                print(f"Quick save - GitHub timestamp: {github_timestamp}")
-                print(f"Quick save - Local timestamp: {stored_timestamp}")
-                
-                if github_timestamp != stored_timestamp:
-                    print("Quick save - Conflict detected!")
-                    showing_conflict_dialog.set(True)
-                    return
-        except Exception as e:
-            print(f"Quick save - Error checking conflicts: {str(e)}")
-            return
-    
-        try:
-            # Now proceed with save
-            data = lists_data.get()
-            current_timestamp = datetime.now(timezone.utc).isoformat()
-            formatted_data = format_metadata(current_timestamp)
-            
-            for list_id, list_name in LIST_NAMES.items():
-                formatted_data += f"=== {list_name} ===\n"
-                list_content = data[list_id]
-                for task, desc in zip(list_content["tasks"], list_content["descriptions"]):
-                    formatted_data += f"- {task}\n"
-                    if desc.strip():
-                        formatted_data += f"  |{desc}\n"
-                formatted_data += "\n"
-    
-            # Check if file exists and get its SHA
-            try:
-                response = requests.get(url, headers=headers)
-                sha = response.json()["sha"] if response.status_code == 200 else None
-            except:
-                sha = None
-    
-            # Prepare the content
-            content = base64.b64encode(formatted_data.encode()).decode()
-    
-            # Prepare the data for the API request
-            data = {
-                "message": "Quick update task lists",
-                "content": content,
-            }
-            if sha:
-                data["sha"] = sha
-    
-            # Make the API request
-            response = requests.put(url, headers=headers, json=data)
-    
-            if response.status_code in [200, 201]:
-                github_status.set("Successfully saved to GitHub!")
-                changes_unsaved.set(False)
-                loaded_file_timestamp.set(str(current_timestamp))
-            else:
-                github_status.set(f"Error saving to GitHub: {response.status_code}")
-    
-        except Exception as e:
-            github_status.set(f"Error: {str(e)}")
+        start_save("quick", "Quick update task lists")
 
     
     def save_to_github(force=False):
-        path = "ToDoList.txt"
         if not input.github_token() or not input.github_repo():
             github_status.set("Please fill in all GitHub fields")
             return
     
-        # Check for conflicts first, before creating new timestamp
-        if not force:
-            try:
-                # GitHub API endpoint
-                repo = input.github_repo()
-                url = f"https://api.github.com/repos/{repo}/contents/{path}"
-                headers = {
-                    "Authorization": f"token {input.github_token()}",
-                    "Accept": "application/vnd.github.v3+json"
-                }
-                
-                # Get current GitHub content
-                response = requests.get(url, headers=headers)
-                if response.status_code == 200:
-                    content = base64.b64decode(response.json()["content"]).decode()
-                    github_timestamp = extract_metadata(content)
-                    stored_timestamp = loaded_file_timestamp.get()
-                    
-                    print(f"GitHub timestamp: {github_timestamp}")
-                    print(f"Local timestamp: {stored_timestamp}")
-                    
-                    if github_timestamp != stored_timestamp:
-                        print("Conflict detected!")
-                        showing_conflict_dialog.set(True)
-                        return
-            except Exception as e:
-                print(f"Error checking conflicts: {str(e)}")
-                return
-    
-        try:
-            # Now proceed with save
-            data = lists_data.get()
-            current_timestamp = datetime.now(timezone.utc).isoformat()
-            formatted_data = format_metadata(current_timestamp)
-            
-            for list_id, list_name in LIST_NAMES.items():
-                formatted_data += f"=== {list_name} ===\n"
-                list_content = data[list_id]
-                for task, desc in zip(list_content["tasks"], list_content["descriptions"]):
-                    formatted_data += f"- {task}\n"
-                    if desc.strip():
-                        formatted_data += f"  |{desc}\n"
-                formatted_data += "\n"
-    
-            # GitHub API endpoint
-            repo = input.github_repo()
-            url = f"https://api.github.com/repos/{repo}/contents/{path}"
-    
-            # Headers for authentication
-            headers = {
-                "Authorization": f"token {input.github_token()}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-    
-            # Check if file exists and get its SHA
-            try:
-                response = requests.get(url, headers=headers)
-                sha = response.json()["sha"] if response.status_code == 200 else None
-            except:
-                sha = None
-    
-            # Prepare the content
-            content = base64.b64encode(formatted_data.encode()).decode()
-    
-            # Prepare the data for the API request
-            data = {
-                "message": "Update task lists",
-                "content": content,
-            }
-            if sha:
-                data["sha"] = sha
-    
-            # Make the API request
-            response = requests.put(url, headers=headers, json=data)
-    
-            if response.status_code in [200, 201]:
-                github_status.set("Successfully saved to GitHub!")
-                changes_unsaved.set(False)
-                # Store the timestamp as string
-                loaded_file_timestamp.set(str(current_timestamp))
-            else:
-                github_status.set(f"Error saving to GitHub: {response.status_code}")
-    
-        except Exception as e:
-            github_status.set(f"Error: {str(e)}")
+        start_save("manual", "Update task lists", force=force)
     
     
     
@@ -1025,51 +1435,48 @@ def server(input, output, session):
 
 
     
-    def load_list_names_from_github():
-        if not input.github_token() or not input.github_repo():
-            github_status.set("Please fill in GitHub credentials to load list names")
-            return False
-    
+    def fetch_from_github(client, sharded=False):
+        # Runs on the I/O pool: read the list names, then the lists themselves
+        names_response = client.get_file("ToDoListNames.txt")
+        if not names_response.ok and names_response.status_code != 404:
+            return names_response, None
+        if not sharded:
+            return names_response, client.get_file("ToDoList.txt")
+        response = fetch_lists(client, sharded_base)
+        if response.status_code == 404 and response.base is not None:
+            # No list files yet: start from ToDoList.txt, and the next save
+            # writes every list
+            response.legacy = client.get_file("ToDoList.txt")
+        return names_response, response
+
+    @reactive.extended_task
+    async def load_task(client, source="github", sharded=False):
         try:
-            # GitHub API endpoint
-            repo = input.github_repo()
-            path = "ToDoListNames.txt"
-            url = f"https://api.github.com/repos/{repo}/contents/{path}"
-    
-            # Headers for authentication
-            headers = {
-                "Authorization": f"token {input.github_token()}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-    
-            # Get the file content
-            response = requests.get(url, headers=headers)
+            # The background check after showing the cached copy yields to saves
+            priority = BACKGROUND if source == "revalidate" else LOAD
+            names_response, response = await run_io(client.at_priority, priority, fetch_from_github, client, sharded)
+        except Exception as e:
+            return e, None, source
+        return names_response, response, source
+
+    def apply_list_names(response):
+        try:
+            if isinstance(response, Exception):
+                raise response
             
             if response.status_code == 404:
                 # File doesn't exist yet, this is okay
+                saved_names["text"] = list_registry.format()
                 github_status.set("No saved list names found, using defaults")
                 return True
-            elif response.status_code == 200:
-                # Decode content from base64
-                content = base64.b64decode(response.json()["content"]).decode()
-                
-                # Parse the content and update LIST_NAMES
-                for line in content.strip().split('\n'):
-                    if ':' in line:
-                        list_id, name = line.split(':', 1)
-                        if list_id in LIST_NAMES:
-                            LIST_NAMES[list_id] = name
-    
-                # Update UI elements
-                ui.update_radio_buttons(
-                    "active_list",
-                    choices=LIST_NAMES
-                )
-                ui.update_checkbox_group(
-                    "display_lists",
-                    choices=LIST_NAMES,
-                    selected=input.display_lists()
-                )
+            elif response.ok:
+                # This session's lists become the saved ones (if the file
+                # has any)
+                loaded = ListRegistry.parse(response.content)
+                if loaded:
+                    list_registry.replace_with(loaded)
+                saved_names["text"] = list_registry.format()
+                lists_changed()
                 
                 github_status.set("Successfully loaded list names from GitHub!")
                 return True
@@ -1082,84 +1489,175 @@ def server(input, output, session):
             return False    
 
     def perform_load_from_github():        
-        # First load the list names
-        if not load_list_names_from_github():
-            return
-                
-        path = "ToDoList.txt"
         if not input.github_token() or not input.github_repo():
             github_status.set("Please fill in all GitHub fields")
             return
     
-        try:
-            # GitHub API endpoint
-            repo = input.github_repo()
-            url = f"https://api.github.com/repos/{repo}/contents/{path}"
-    
-            # Headers for authentication
-            headers = {
-                "Authorization": f"token {input.github_token()}",
-                "Accept": "application/vnd.github.v3+json"
-            }
+        github_status.set("⏳ Loading from GitHub...")
+        load_task(get_github_client(), "github", input.sharded_storage())
+
+    journal_restore = {"pending": True}
+
+    def restore_offline_changes(new_data):
+        # Returns the lists with the replayed operations applied, and those
+        # operations (empty if there was nothing to do)
+        if not journal_restore["pending"] or not change_journal.path:
+            return new_data, []
+        journal_restore["pending"] = False
+        saved = ChangeJournal(path=change_journal.path)
+        if not saved.restore():
+            return new_data, []
+        replayed = saved.replay(new_data, list_registry)
+        if replayed is None:
+            return new_data, []
+        return replayed, saved.ops()
+
+    @reactive.effect
+    @timed_effect
+    def handle_load_result():
+        names_response, response, source = load_task.result()
+        with reactive.isolate():
+            apply_loaded_lists(names_response, response, source)
+
+    # Local copy of the last known GitHub files (see local_cache.py)
+    if sys.platform == "emscripten":
+        def send_to_browser_cache(key, text):
+            asyncio.ensure_future(
+                session.send_custom_message("todo_cache_store", {"key": key, "value": text})
+            )
+        local_cache = BrowserCache(send_to_browser_cache)
+    elif LOCAL_CACHE_DIR:
+        local_cache = DirectoryCache(LOCAL_CACHE_DIR)
+    else:
+        local_cache = None
+    initial_load = {"done": False}
+
+    def store_local_cache(client):
+        if local_cache is None:
+            return
+        entry = {}
+        for path in ("ToDoList.txt", "ToDoListNames.txt"):
+            cached = client.cached(path)
+            if cached is not None and cached.content is not None:
+                entry[path] = {"content": cached.content, "sha": cached.sha, "etag": cached.etag}
+        if sharded_base.commit:
+            entry[SHARD_DIR] = sharded_base.to_json()
+        if entry:
+            local_cache.write(cache_key(client.repo, client.token), entry)
+
+    @reactive.effect
+    @timed_effect
+    def load_from_local_cache():
+        # Render the cached copy as soon as the credentials match one, then
+        # revalidate in the background (seeded ETags make that two 304s)
+        repo = input.github_repo()
+        token = input.github_token()
+        if local_cache is None or initial_load["done"] or not repo or not token:
+            return
+        if isinstance(local_cache, BrowserCache):
+            local_cache.entries.update(input.browser_cache() or {})
+        entry = local_cache.read(cache_key(repo, token))
+        with reactive.isolate():
+            sharded = input.sharded_storage()
+        if not entry or (SHARD_DIR if sharded else "ToDoList.txt") not in entry:
+            return
+
+        with reactive.isolate():
+            client = get_github_client()
+            for path, cached in entry.items():
+                if path != SHARD_DIR:
+                    client.seed(path, cached["content"], cached["sha"], cached.get("etag"))
+            names_entry = entry.get("ToDoListNames.txt")
+            names_response = (FileResult(200, names_entry["content"], names_entry["sha"])
+                              if names_entry else FileResult(404))
+            if sharded:
+                response = ShardedResult(200, ShardedBase.from_json(entry[SHARD_DIR]))
+            else:
+                lists_entry = entry["ToDoList.txt"]
+                response = FileResult(200, lists_entry["content"], lists_entry["sha"])
+            apply_loaded_lists(names_response, response, source="cache")
+            if sys.platform == "emscripten":
+                # GitHub calls block Python under shinylive, so the check
+                # waits until the cached copy has been sent to the page
+                session.on_flushed(lambda: load_task(client, "revalidate", sharded), once=True)
+            else:
+                load_task(client, "revalidate", sharded)
+
+    def apply_loaded_lists(names_response, response, source="github"):
+        # `source` is "github" for an explicit load, "cache" when rendering the
+        # local copy and "revalidate" for the background check that follows
+        if source == "revalidate" and isinstance(names_response, RateLimited):
+            github_status.set("Showing saved copy - GitHub rate limit reached, not checked for updates")
+            return
+        if source == "revalidate" and not isinstance(names_response, Exception) \
+                and response is not None and response.not_modified \
+                and names_response.status_code in (304, 404):
+            github_status.set("✓ Up to date with GitHub")
+            return
+
+        # First apply the list names
+        if not apply_list_names(names_response):
+            return
     
-            # Get the file content
-            response = requests.get(url, headers=headers)
-            
-            if response.status_code == 200:
-                # Decode content from base64
-                content = base64.b64decode(response.json()["content"]).decode()
-                
-                # Extract and store timestamp
-                timestamp = extract_metadata(content)
-                print(f"Loading file with timestamp: {timestamp}")
-                loaded_file_timestamp.set(str(timestamp))  # Ensure it's stored as string
-                
-                # Remove metadata section before parsing
-                if "--- END METADATA ---" in content:
-                    content = content.split("--- END METADATA ---")[1].strip()
-                
-                # Parse the content
-                current_list_id = None
-                new_data = {list_id: {"tasks": [], "descriptions": []} 
-                        for list_id in LIST_NAMES.keys()}
-                
-                lines = [line.rstrip() for line in content.split('\n')]
-                i = 0
-                while i < len(lines):
-                    line = lines[i]
-                    if not line:
-                        i += 1
-                        continue
-                        
-                    # Check if this is a list header
-                    if line.startswith('===') and line.endswith('==='):
-                        list_name = line.strip('= ')
-                        # Find the list_id for this list_name
-                        current_list_id = next(
-                            (k for k, v in LIST_NAMES.items() if v == list_name),
-                            None
-                        )
-                    # Check if this is a task
-                    elif line.startswith('- ') and current_list_id:
-                        task = line[2:]  # Remove the '- ' prefix
-                        new_data[current_list_id]["tasks"].append(task)
-                        
-                        # Look ahead for description
-                        desc = ""
-                        if i + 1 < len(lines):
-                            next_line = lines[i + 1]
-                            if next_line.startswith('  |'):
-                                desc = next_line[3:].strip()  # Remove '  |' prefix
-                                i += 1  # Skip the description line
-                        new_data[current_list_id]["descriptions"].append(desc)
-                    
-                    i += 1
+        try:
+            if isinstance(response, ShardedResult) and response.legacy is not None:
+                # One file per list, but none written yet: ToDoList.txt it is
+                sharded_base.replace_with(response.base)
+                response = response.legacy
+
+            if response.ok:
+                initial_load["done"] = True
+                parse_errors = []
+                if isinstance(response, ShardedResult):
+                    sharded_base.replace_with(response.base)
+                    logger.debug("Loading list files with timestamp %s", response.base.timestamp)
+                    new_data = read_list_files(response.base.texts, parse_errors)
+                else:
+                    content = response.content
+
+                    # Extract and store timestamp
+                    timestamp = extract_metadata(content)
+                    logger.debug("Loading ToDoList.txt with timestamp %s", timestamp)
+                    github_base["timestamp"] = str(timestamp)  # Ensure it's stored as string
+                    github_base["sha"] = response.sha
+                    github_base["commit"] = github_base["tree"] = None
+
+                    github_base["content"] = content
+                    new_data = read_task_lists(content, parse_errors)
     
-                # Update the lists_data
-                lists_data.set(new_data)
-                changes_unsaved.set(False)  # Reset unsaved changes flag
+                if source != "cache":
+                    store_local_cache(get_github_client())
+
+                # GitHub moved on while we showed the cached copy: keep any edits
+                # made since by replaying the journal on top of the new version
+                if source == "revalidate" and change_journal:
+                    replayed = change_journal.replay(new_data, list_registry)
+                    if replayed is None:
+                        showing_conflict_dialog.set(True)
+                        github_status.set("⚠️ GitHub has changed since the cached copy")
+                        return
+                    set_lists(replayed)
+                    github_status.set(f"Updated from GitHub, {len(change_journal)} local change(s) kept")
+                    return
+
+                # Update the lists_data. On the first load of a session, replay
+                # any offline changes a previous session left in the journal.
+                new_data, restored_ops = restore_offline_changes(new_data)
+                change_journal.clear()
+                for op in restored_ops:
+                    change_journal.append(op)
+                set_lists(new_data)
+                changes_unsaved.set(bool(restored_ops))  # Reset unsaved changes flag
                 showing_conflict_dialog.set(False)  # Hide conflict dialog if it was showing
-                github_status.set("Successfully loaded from GitHub!")
+                if restored_ops:
+                    github_status.set(f"Restored {len(restored_ops)} offline change(s) from the last session")
+                elif source == "cache":
+                    github_status.set("Showing saved copy, checking GitHub for updates...")
+                elif parse_errors:
+                    github_status.set(f"Loaded from GitHub, skipped {len(parse_errors)} unreadable "
+                                      f"line(s) ({parse_errors[0]})")
+                else:
+                    github_status.set("Successfully loaded from GitHub!")
             else:
                 github_status.set(f"Error loading from GitHub: {response.status_code}")
     
@@ -1168,13 +1666,16 @@ def server(input, output, session):
     
     @reactive.effect
     @reactive.event(input.load_github)      
+    @timed_effect
     def load_from_github():
         perform_load_from_github()
     
     @reactive.effect
     @reactive.event(input.resolve_conflict_reload)
+    @timed_effect
     def handle_conflict_reload():
         showing_conflict_dialog.set(False)
+        merge_state.set(None)
         perform_load_from_github()
 
     
@@ -1184,124 +1685,116 @@ def server(input, output, session):
     
     @render.ui
     def list_name_controls():
+        # One list at a time, so this stays small however many lists there are
         if not editing_names.get():
             return ui.div()
-            
-        inputs = []
-        for list_id, current_name in LIST_NAMES.items():
-            inputs.extend([
-                ui.input_text(
-                    f"name_{list_id}",
-                    f"Name for {list_id}:",
-                    value=current_name
-                ),
-                ui.br()
-            ])
-        
+        list_names_version.get()
+        choices = {
+            list_id: f"{name} (archived)" if list_id in list_registry.archived else name
+            for list_id, name in list_registry.names.items()
+        }
+        with reactive.isolate():
+            current = input.manage_list() if "manage_list" in input else None
+        if current not in choices:
+            current = next(iter(choices), None)
+
         return ui.div(
             ui.card(
-                *inputs,
+                ui.input_select("manage_list", "List", choices, selected=current),
+                ui.input_text("manage_list_name", "Name", value=list_registry.name(current) if current else ""),
                 ui.div(
+                    {"class": "button-container"},
+                    ui.input_action_button("rename_list", "Rename", class_="btn-success"),
                     ui.input_action_button(
-                        "save_list_names", 
-                        "Save Names", 
-                        class_="btn-success"
-                    ),
-                    ui.input_action_button(
-                        "cancel_list_names", 
-                        "Cancel", 
-                        class_="btn-secondary"
+                        "archive_list",
+                        "Restore" if current in list_registry.archived else "Archive",
+                        class_="btn-warning"
                     ),
-                    style="display: flex; gap: 10px;"
+                    ui.input_action_button("delete_list", "Delete Archived List", class_="btn-danger"),
+                ),
+                ui.hr(),
+                ui.input_text("new_list_name", "New list"),
+                ui.div(
+                    {"class": "button-container"},
+                    ui.input_action_button("create_list", "Create List", class_="btn-primary"),
+                    ui.input_action_button("cancel_list_names", "Close", class_="btn-secondary"),
                 )
             )
         )
 
     @reactive.effect
     @reactive.event(input.edit_list_names)
+    @timed_effect
     def start_editing_names():
         editing_names.set(True)
 
     @reactive.effect
     @reactive.event(input.cancel_list_names)
+    @timed_effect
     def cancel_editing_names():
         editing_names.set(False)
 
     @reactive.effect
-    @reactive.event(input.save_list_names)
-    def save_list_names():
-        # Update the LIST_NAMES dictionary with new values
-        for list_id in LIST_NAMES.keys():
-            LIST_NAMES[list_id] = getattr(input, f"name_{list_id}")()
-        
-        # Update any UI elements that depend on list names
-        ui.update_radio_buttons(
-            "active_list",
-            choices=LIST_NAMES
-        )
-        ui.update_checkbox_group(
-            "display_lists",
-            choices=LIST_NAMES,
-            selected=input.display_lists()
-        )
-        
-        # Save to GitHub if credentials are available
-        save_list_names_to_github()
-        
-        editing_names.set(False)
-        changes_unsaved.set(True)
+    @reactive.event(input.manage_list)
+    @timed_effect
+    def show_managed_list():
+        list_id = input.manage_list()
+        if list_id in list_registry:
+            ui.update_text("manage_list_name", value=list_registry.name(list_id))
+            ui.update_action_button(
+                "archive_list",
+                label="Restore" if list_id in list_registry.archived else "Archive"
+            )
 
-    def save_list_names_to_github():
-        if not input.github_token() or not input.github_repo():
-            github_status.set("Please fill in GitHub credentials to save list names")
+    def change_lists(op):
+        # Apply a change to the set of lists; the names are saved with the
+        # tasks, in one commit
+        try:
+            apply_changes([op])
+        except (KeyError, ValueError) as e:
+            github_status.set(f"Could not change the lists: {e.args[0] if e.args else e}")
             return False
+        lists_changed()
+        return True
 
-        try:
-            # GitHub API endpoint
-            repo = input.github_repo()
-            path = "ToDoListNames.txt"
-            url = f"https://api.github.com/repos/{repo}/contents/{path}"
-
-            # Headers for authentication
-            headers = {
-                "Authorization": f"token {input.github_token()}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-
-            # Format the list names data
-            formatted_data = "\n".join([f"{list_id}:{name}" for list_id, name in LIST_NAMES.items()])
-            content = base64.b64encode(formatted_data.encode()).decode()
-
-            # Check if file exists
-            try:
-                response = requests.get(url, headers=headers)
-                sha = response.json()["sha"] if response.status_code == 200 else None
-            except:
-                sha = None
-
-            # Prepare the data for the API request
-            data = {
-                "message": "Update list names",
-                "content": content,
-            }
-            if sha:
-                data["sha"] = sha
-
-            # Make the API request
-            response = requests.put(url, headers=headers, json=data)
-
-            if response.status_code in [200, 201]:
-                github_status.set("Successfully saved list names to GitHub!")
-                return True
-            else:
-                github_status.set(f"Error saving list names to GitHub: {response.status_code}")
-                return False
+    @reactive.effect
+    @reactive.event(input.create_list)
+    @timed_effect
+    def create_list():
+        name = input.new_list_name()
+        if change_lists(("create_list", list_registry.unused_id(), name)):
+            ui.update_text("new_list_name", value="")
+            ui.update_select("manage_list", selected=list_registry.id_for(name.strip()))
 
-        except Exception as e:
-            github_status.set(f"Error saving list names: {str(e)}")
-            return False
+    @reactive.effect
+    @reactive.event(input.rename_list)
+    @timed_effect
+    def rename_list():
+        list_id = input.manage_list()
+        if list_id in list_registry and input.manage_list_name() != list_registry.name(list_id):
+            change_lists(("rename", list_id, input.manage_list_name()))
+
+    @reactive.effect
+    @reactive.event(input.archive_list)
+    @timed_effect
+    def archive_list():
+        list_id = input.manage_list()
+        if list_id in list_registry:
+            change_lists(("archive_list", list_id, list_id not in list_registry.archived))
+
+    @reactive.effect
+    @reactive.event(input.delete_list)
+    @timed_effect
+    def delete_list():
+        # Only archived lists can be deleted, so deleting is always a second step
+        list_id = input.manage_list()
+        if list_id not in list_registry:
+            return
+        if list_id not in list_registry.archived:
+            github_status.set("Archive a list before deleting it")
+            return
+        change_lists(("delete_list", list_id))
 
-   
     @render.ui
     def manual_save_button():
         if not input.autosave_enabled() and changes_unsaved.get():
@@ -1320,4 +1813,7 @@ def server(input, output, session):
         return ""
     
     
-app = App(app_ui, server)
\ No newline at end of file
+app = App(app_ui, server)
+if METRICS_PATH and sys.platform != "emscripten":
+    # Ahead of shiny's catch-all route for static files
+    app.starlette_app.router.routes.insert(0, metrics_route(METRICS_PATH))
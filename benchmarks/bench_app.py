@@ -0,0 +1,350 @@
+# End-to-end latency of the app's server logic, driven headlessly through
+# shiny.testserver against the local GitHub stand-in in fake_github.py:
+# loading and parsing, rendering the list views, adding and moving tasks
+# (by selection and by drag and drop), saving, autosave bursts and saves that
+# run into someone else's edit.
+#
+#   python benchmarks/bench_app.py [task_count ...] [--latency S] [--jitter S]
+#       [--error-rate P] [--conflict-rate P] [--rate-limit N] [--rate-window S]
+#       [--seed N] [--runs N] [--sharded] [--label NAME] [--compare results/OTHER.json]
+#
+# Defaults to 10k and 100k tasks with no network latency. Each scenario is
+# timed over --runs runs, then run once more under tracemalloc for its peak
+# memory and the memory blocks it leaves allocated. The results, with the
+# settings and environment they came from, are written to
+# benchmarks/results/<label>.json (the label defaults to the git commit);
+# --compare prints each scenario's median against an earlier results file
+# and exits with status 1 if any got more than --threshold slower.
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_todo_format import LIST_NAMES, make_lists  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+WAIT_TIMEOUT = 300
+# Tasks moved per batch move, and adds per autosave burst
+MOVE_COUNT = 50
+BURST_SIZE = 20
+# Medians this much slower than the baseline (and at least this many ms) are
+# reported as regressions
+REGRESSION_THRESHOLD = 0.2
+REGRESSION_FLOOR_MS = 1.0
+
+
+def repo_files(store, sharded):
+    # The files a repo holding `store` has in either layout
+    from sharded_lists import format_manifest, list_path
+    from todo_format import TaskListSerializer
+
+    names = "\n".join(f"{list_id}:{name}" for list_id, name in LIST_NAMES.items())
+    metadata = "--- METADATA ---\nLast updated: 2024-01-01T00:00:00+00:00\n--- END METADATA ---\n\n"
+    if not sharded:
+        return {"ToDoList.txt": metadata + TaskListSerializer().format(store, LIST_NAMES),
+                "ToDoListNames.txt": names}
+    from github_client import blob_sha
+    blocks = TaskListSerializer().blocks(store, LIST_NAMES)
+    files = {list_path(list_id): text for list_id, text in blocks.items()}
+    shas = {list_id: blob_sha(text) for list_id, text in blocks.items()}
+    files["ToDoLists/manifest.txt"] = format_manifest("2024-01-01T00:00:00+00:00", shas)
+    files["ToDoListNames.txt"] = names
+    return files
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class AppBench:
+    # One app session against one fake repo. Scenarios are timed from the
+    # input that starts them until the app is idle again: for the reactive
+    # work that is when set_inputs() returns, for GitHub work when the status
+    # line stops showing "⏳".
+
+    def __init__(self, ts, server, runs):
+        self.ts = ts
+        self.server = server
+        self.runs = runs
+        self.clicks = 0
+        self.results = {}
+
+    def click(self, button, **inputs):
+        self.clicks += 1
+        self.ts.set_inputs(**inputs, **{button: self.clicks})
+
+    def status(self):
+        return self.ts.get_output("github_status_output").value or ""
+
+    def busy(self):
+        return self.status().startswith("⏳")
+
+    def wait_idle(self):
+        deadline = time.perf_counter() + WAIT_TIMEOUT
+        while True:
+            self.ts.flush()
+            if not self.busy():
+                return
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"still busy after {WAIT_TIMEOUT} s: {self.status()}")
+            time.sleep(0.001)
+
+    def task_ids(self, list_id):
+        # IDs of the rows in the list view's last full render
+        html = self.ts.get_output(f"list_view_{list_id}").value["html"]
+        return [part.split('"', 1)[0] for part in html.split('data-task-id="')[1:]]
+
+    def measure(self, name, action, setup=None, network=False, items=None, ok=None):
+        # Time `action(run)` --runs times (after an untimed `setup(run)`),
+        # then once more under tracemalloc
+        timings, requests = [], []
+        failures = 0
+        stats = {}
+        for run in range(self.runs + 1):
+            if setup is not None:
+                setup(run)
+                if network:
+                    self.wait_idle()
+            self.server.reset_stats()
+            traced = run == self.runs
+            if traced:
+                tracemalloc.start()
+                blocks = sys.getallocatedblocks()
+            start = time.perf_counter()
+            action(run)
+            if network:
+                self.wait_idle()
+            elapsed = time.perf_counter() - start
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                retained = sys.getallocatedblocks() - blocks
+            run_stats = self.server.reset_stats()
+            if ok is not None and not ok(self.status()):
+                failures += 1
+            if not traced:
+                timings.append(elapsed)
+                requests.append(run_stats["requests"])
+                for key, value in run_stats.items():
+                    stats[key] = stats.get(key, 0) + value
+
+        median = percentile(timings, 0.5)
+        result = {
+            "runs": len(timings),
+            "median_ms": round(median * 1000, 3),
+            "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+            "min_ms": round(min(timings) * 1000, 3),
+            "max_ms": round(max(timings) * 1000, 3),
+            "peak_kib": round(peak / 1024, 1),
+            "retained_blocks": retained,
+            "failures": failures,
+        }
+        if items:
+            result["items_per_s"] = round(items / median, 1) if median else None
+        if network:
+            result["requests_per_run"] = percentile(requests, 0.5)
+            result["api"] = dict(sorted(stats.items()))
+        self.results[name] = result
+        return result
+
+    def run_all(self, task_count, base_inputs):
+        saved = lambda status: "✓" in status or "Successfully" in status
+        loaded = lambda status: "loaded" in status.lower() or "up to date" in status.lower()
+        ts = self.ts
+        all_lists = list(LIST_NAMES)
+
+        # Load and parse: a new client each time (nothing cached), then the
+        # same client again (conditional GETs answered 304)
+        self.measure("load", lambda run: self.click("load_github", github_token=f"cold-{run}"),
+                     network=True, items=task_count, ok=loaded)
+        self.measure("load unchanged", lambda run: self.click("load_github"),
+                     network=True, items=task_count, ok=loaded)
+
+        # Rendering: show every list, and switch every view to drag and drop
+        # and back (each is a full render of task_lists_display and of every
+        # list view)
+        self.measure("render all lists", lambda run: ts.set_inputs(display_lists=all_lists),
+                     setup=lambda run: ts.set_inputs(display_lists=["list1"]))
+        self.measure("toggle drag and drop", lambda run: ts.set_inputs(use_drag_drop=run % 2 == 0))
+        ts.set_inputs(use_drag_drop=False)
+
+        # Editing, with autosave off
+        self.measure("add task", lambda run: self.click("add", task=f"Benchmark task {run}",
+                                                        description="Added by bench_app.py"))
+
+        # Moves take at most MOVE_COUNT tasks and leave one to drag, so small
+        # lists move fewer (and a list of one skips both)
+        ids = self.task_ids("list1")
+        move_count = min(MOVE_COUNT, len(ids) - 1)
+        if move_count < 1:
+            print(f"{task_count} tasks: list1 has {len(ids)}, skipping the move and drag scenarios", file=sys.stderr)
+        else:
+            moved = ids[:move_count]
+
+            def select_moved(run):
+                ts.set_inputs(select_task={"id": moved[0], "shift": False, "toggle": False})
+                ts.set_inputs(select_task={"id": moved[-1], "shift": True, "toggle": False})
+                ts.set_inputs(move_to_list="list2" if run % 2 == 0 else "list1", move_position=1)
+
+            self.measure(f"move {move_count} tasks", lambda run: self.click("move_tasks"), setup=select_moved)
+            ts.set_inputs(select_task={"id": moved[0], "shift": False, "toggle": False})
+            ts.set_inputs(select_task={"id": moved[0], "shift": False, "toggle": False})  # deselect
+
+            dragged = ids[move_count]
+            self.measure("drag and drop", lambda run: ts.set_inputs(drag_drop_move={
+                "taskId": dragged, "targetListId": "list2" if run % 2 == 0 else "list1",
+                "targetIndex": task_count // len(all_lists) // 2}))
+
+        # Saving: serialize and write, one edit each time
+        def edit(run):
+            self.click("add", task=f"Saved task {run}", description="")
+
+        self.measure("save", lambda run: self.click("quick_save"), setup=edit,
+                     network=True, items=task_count, ok=saved)
+
+        # Someone else edited the same list first: the save fails, the app
+        # fetches their version, merges and saves again
+        def edit_and_conflict(run):
+            edit(run)
+            self.server.force_conflicts(1)
+
+        self.measure("save after remote edit", lambda run: self.click("quick_save"),
+                     setup=edit_and_conflict, network=True, items=task_count,
+                     ok=lambda status: "Merged" in status)
+
+        # Autosave: a burst of adds folded into as few writes as possible
+        ts.set_inputs(autosave_enabled=True)
+
+        def burst(run):
+            for n in range(BURST_SIZE):
+                self.click("add", task=f"Burst {run}.{n}", description="")
+
+        self.measure(f"autosave {BURST_SIZE} adds", burst, network=True, ok=saved)
+        ts.set_inputs(autosave_enabled=False)
+        ts.set_inputs(**base_inputs)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(task_count, results):
+    print(f"{task_count:>9,} tasks")
+    for name, result in results.items():
+        line = (f"  {name:<24} {result['median_ms']:9.1f} ms  p95 {result['p95_ms']:9.1f} ms"
+                f"  peak {result['peak_kib']:9.0f} KiB")
+        if "requests_per_run" in result:
+            line += f"  {result['requests_per_run']:3} calls"
+        if result["failures"]:
+            line += f"  ({result['failures']} failed)"
+        print(line)
+
+
+def compare(report, baseline, threshold):
+    # Print median changes against `baseline`; the number of regressions
+    regressions = 0
+    print(f"compared with {baseline['label']}:")
+    for size, results in report["results"].items():
+        for name, result in results.items():
+            before = baseline["results"].get(size, {}).get(name)
+            if before is None:
+                continue
+            old, new = before["median_ms"], result["median_ms"]
+            ratio = new / old if old else float("inf")
+            slower = ratio > 1 + threshold and new - old > REGRESSION_FLOOR_MS
+            regressions += slower
+            print(f"  {int(size):>9,} {name:<24} {old:9.1f} -> {new:9.1f} ms  {ratio:5.2f}x"
+                  + ("  REGRESSION" if slower else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("task_counts", nargs="*", type=int, default=[10_000, 100_000])
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per API response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 502")
+    parser.add_argument("--conflict-rate", type=float, default=0.0,
+                        help="share of writes that find the file edited elsewhere")
+    parser.add_argument("--rate-limit", type=int, help="calls allowed per --rate-window")
+    parser.add_argument("--rate-window", type=float, default=3600.0, help="seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--sharded", action="store_true", help="one file per list")
+    parser.add_argument("--label")
+    parser.add_argument("--compare", help="results file to compare with")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    server = FakeGitHub(args.latency, args.jitter, args.error_rate, args.conflict_rate, args.seed,
+                        args.rate_limit, args.rate_window).start()
+    # The app reads these when it is imported
+    os.environ["TODO_GITHUB_API_URL"] = server.url
+    os.environ["TODO_CACHE_DIR"] = ""
+    os.environ.pop("TODO_JOURNAL_DIR", None)
+    import app
+    from shiny.testserver import test_server
+    import shiny
+
+    commit = git_commit()
+    report = {
+        "label": args.label or commit or "unlabelled",
+        "created": datetime.now(timezone.utc).isoformat(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("label", "compare")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "shiny": shiny.__version__, "commit": commit},
+        "results": {},
+    }
+
+    base_inputs = {"autosave_enabled": False, "autosave_delay": 0.05, "active_list": "list1",
+                   "display_lists": ["list1"], "use_drag_drop": False, "sharded_storage": args.sharded,
+                   "task": "", "description": "", "search_query": ""}
+    # The test server has no browser to report which outputs are visible
+    visible = {f".clientdata_output_list_view_{list_id}_hidden": False for list_id in LIST_NAMES}
+
+    # One session for every size (a process can only drive one test server)
+    with test_server(app.app) as ts:
+        ts.set_inputs(**visible, **base_inputs)
+        for task_count in args.task_counts:
+            repo = f"bench/todo-{task_count}"
+            server.add_repo(repo, repo_files(make_lists(task_count), args.sharded))
+            ts.set_inputs(github_repo=repo, github_token="warm")
+            bench = AppBench(ts, server, args.runs)
+            with contextlib.redirect_stdout(io.StringIO()):  # the app's own logging
+                bench.run_all(task_count, base_inputs)
+            report["results"][str(task_count)] = bench.results
+            print_results(task_count, bench.results)
+    server.stop()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{report['label']}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"{regressions} regression(s)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
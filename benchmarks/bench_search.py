@@ -0,0 +1,45 @@
+# Latency of the task search index: building it, answering queries as they
+# are typed, and following single edits.
+#
+#   python benchmarks/bench_search.py [task_count ...]
+#
+# Uses the same generated lists as bench_todo_format.py.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_todo_format import best_of, make_lists  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+
+# Typed a keystroke at a time; a mix of rare and common words, prefixes and typos
+QUERIES = ["number 4242", "task numbr", "details 99", "short note 1234", "secnd line"]
+
+
+def main(task_counts):
+    for task_count in task_counts:
+        data = make_lists(task_count)
+        index = SearchIndex()
+        build_time, _ = best_of(1, lambda: index.rebuild(data))
+
+        latencies = []
+        for query in QUERIES:
+            for end in range(1, len(query) + 1):
+                latency, _ = best_of(3, lambda: index.search(query[:end], data))
+                latencies.append(latency)
+        latencies.sort()
+
+        task = data.tasks("list1")[len(data.tasks("list1")) // 2]
+        edit_time, _ = best_of(3, lambda: index.apply(("edit", task.id, "Renamed task", "", 0)))
+
+        print(f"{task_count:>9,} tasks, {len(index.vocabulary):,} distinct words")
+        print(f"  build                   {build_time * 1000:8.1f} ms")
+        print(f"  query median            {latencies[len(latencies) // 2] * 1000:8.2f} ms")
+        print(f"  query worst             {latencies[-1] * 1000:8.2f} ms  "
+              f"({len(latencies)} keystrokes)")
+        print(f"  edit one task           {edit_time * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,85 @@
+# Throughput of the ToDoList.txt parser and serializer on large files.
+#
+#   python benchmarks/bench_todo_format.py [task_count ...]
+#
+# Defaults to 100k and 250k tasks spread over ten lists, a third of them with
+# a description and some of those spanning several lines.
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_store import TaskStore  # noqa: E402
+from todo_format import TaskListSerializer, parse_task_lists  # noqa: E402
+
+LIST_NAMES = {f"list{i}": f"List {i}" for i in range(1, 11)}
+
+
+def make_lists(task_count):
+    store = TaskStore(LIST_NAMES)
+    list_ids = list(LIST_NAMES)
+    for i in range(task_count):
+        if i % 9 == 0:
+            desc = f"Details for {i}\nsecond line\nthird line"
+        elif i % 3 == 0:
+            desc = f"Short note for task {i}"
+        else:
+            desc = ""
+        store.add(list_ids[i % len(list_ids)], -1, f"Task number {i} with a few words", desc,
+                  now=1700000000 + i)
+    return store
+
+
+def rows(store):
+    return {list_id: [(task.id, task.title, task.description, task.created, task.updated)
+                      for task in tasks]
+            for list_id, tasks in store.lists.items()}
+
+
+def best_of(runs, fn):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(task_counts):
+    for task_count in task_counts:
+        data = make_lists(task_count)
+        format_time, text = best_of(3, lambda: TaskListSerializer().format(data, LIST_NAMES))
+        raw = text.encode("utf-8")
+
+        parse_time, parsed = best_of(3, lambda: parse_task_lists(text, LIST_NAMES))
+        stream_time, _ = best_of(3, lambda: parse_task_lists(io.BytesIO(raw), LIST_NAMES))
+        assert rows(parsed) == rows(data), "round trip changed the lists"
+
+        serializer = TaskListSerializer()
+        serializer.format(data, LIST_NAMES)
+        data = data.copy()
+        data.update(data.tasks("list1")[0].id, "Edited", "")
+        reformat_time, _ = best_of(1, lambda: serializer.format(data, LIST_NAMES))
+
+        megabytes = len(raw) / 1e6
+        print(f"{task_count:>9,} tasks, {megabytes:.1f} MB")
+        print(f"  format (all lists)      {format_time * 1000:8.1f} ms")
+        print(f"  format (one list dirty) {reformat_time * 1000:8.1f} ms")
+        print(f"  parse str               {parse_time * 1000:8.1f} ms  "
+              f"{task_count / parse_time:12,.0f} tasks/s  {megabytes / parse_time:6.1f} MB/s")
+        print(f"  parse byte stream       {stream_time * 1000:8.1f} ms  "
+              f"{task_count / stream_time:12,.0f} tasks/s  {megabytes / stream_time:6.1f} MB/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("task_counts", nargs="*", type=int, default=[100_000, 250_000],
+                        help="sizes to measure, at least 1 task (default: 100000 250000)")
+    args = parser.parse_args()
+    if min(args.task_counts) < 1:
+        parser.error("task counts must be at least 1")
+    main(args.task_counts)
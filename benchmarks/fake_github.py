@@ -0,0 +1,386 @@
+# A local stand-in for the parts of the GitHub REST API the app uses, for
+# benchmarks: the Contents API (GET with ETags and 304s, PUT with the sha
+# precondition) and the Git Data API calls behind one-commit saves (branch
+# ref, commits, trees, blobs, compare-and-swap ref updates). Point the app at
+# it with TODO_GITHUB_API_URL before importing it.
+#
+#   server = FakeGitHub(latency=0.05, error_rate=0.01, conflict_rate=0.1, seed=1)
+#   server.start()
+#   repo = server.add_repo("bench/todo", {"ToDoList.txt": text})
+#
+# Every response waits `latency` seconds plus up to `jitter` more. A request
+# fails with a 502 at `error_rate`, and a write finds that someone else has
+# just edited the file(s) it is writing at `conflict_rate` (see
+# FakeRepo.edit_elsewhere), so it gets the conflict a real concurrent edit
+# would cause. All the randomness comes from `seed`, so runs with the same
+# settings see the same failures in the same places. With `rate_limit` set,
+# every response carries X-RateLimit-* headers and calls past the limit get
+# GitHub's 403 until the window resets.
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+BRANCH = "main"
+MANIFEST_PATH = "ToDoLists/manifest.txt"
+
+
+def blob_sha(text):
+    data = text.encode()
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FakeRepo:
+    # A linear commit history of flat {path: text} snapshots. Trees are
+    # stored as {path: blob SHA}, so a tree or commit SHA names the same
+    # content for as long as the repo lives.
+
+    def __init__(self, files=None):
+        self.blobs = {}  # blob SHA -> text
+        self.trees = {}  # tree SHA -> {path: blob SHA}
+        self.commits = {}  # commit SHA -> (tree SHA, parent SHA)
+        self.foreign_edits = 0
+        self.head = self.commit(self.store_tree({}), None)
+        if files:
+            self.write(files)
+
+    def store_blob(self, text):
+        sha = blob_sha(text)
+        self.blobs[sha] = text
+        return sha
+
+    def store_tree(self, entries):
+        sha = hashlib.sha1(json.dumps(sorted(entries.items())).encode()).hexdigest()
+        self.trees[sha] = dict(entries)
+        return sha
+
+    def commit(self, tree, parent):
+        sha = hashlib.sha1(f"{tree} {parent} {len(self.commits)}".encode()).hexdigest()
+        self.commits[sha] = (tree, parent)
+        return sha
+
+    def tree_of(self, commit):
+        return self.commits[commit][0]
+
+    def files(self, commit=None):
+        # {path: text} at `commit` (default the head)
+        entries = self.trees[self.tree_of(commit or self.head)]
+        return {path: self.blobs[sha] for path, sha in entries.items()}
+
+    def write(self, files):
+        # Commit {path: text or None to delete} on top of the head
+        entries = dict(self.trees[self.tree_of(self.head)])
+        for path, text in files.items():
+            if text is None:
+                entries.pop(path, None)
+            else:
+                entries[path] = self.store_blob(text)
+        self.head = self.commit(self.store_tree(entries), self.head)
+        return self.head
+
+    def edit_elsewhere(self, paths):
+        # Someone else commits an edit to one of `paths`: a new task at the
+        # end of the file's first list, keeping the sharded manifest in step.
+        # Paths that are not task lists are left alone.
+        current = self.files()
+        paths = [path for path in paths
+                 if path in current and path != MANIFEST_PATH and path != "ToDoListNames.txt"]
+        header = re.search(r"^=== .* ===\n", current[paths[0]], re.M) if paths else None
+        if header is None:
+            return False
+        path, text = paths[0], current[paths[0]]
+        self.foreign_edits += 1
+        end = text.find("\n\n", header.end() - 1)
+        end = len(text) if end == -1 else end + 1
+        text = text[:end] + f"- Edited elsewhere {self.foreign_edits}\n" + text[end:]
+        files = {path: text}
+        if path.startswith("ToDoLists/") and MANIFEST_PATH in current:
+            list_id = path[len("ToDoLists/"):-len(".txt")]
+            files[MANIFEST_PATH] = re.sub(rf"^{re.escape(list_id)} [0-9a-f]{{40}}$",
+                                          f"{list_id} {blob_sha(text)}", current[MANIFEST_PATH],
+                                          flags=re.M)
+        self.write(files)
+        return True
+
+
+class FakeGitHub:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, conflict_rate=0.0, seed=0,
+                 rate_limit=None, rate_window=3600.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.conflict_rate = conflict_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.window_start = time.time()
+        self.used = 0
+        self.random = random.Random(seed)
+        self.forced_conflicts = 0  # writes that conflict regardless of the rate
+        self.repos = {}  # "owner/name" -> FakeRepo
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_repo(self, name, files=None):
+        repo = self.repos[name] = FakeRepo(files)
+        return repo
+
+    def force_conflicts(self, count=1):
+        with self.lock:
+            self.forced_conflicts += count
+
+    def take_forced_conflict(self):
+        # Called with the lock held, once per write
+        if self.forced_conflicts:
+            self.forced_conflicts -= 1
+            return True
+        return False
+
+    def reset_stats(self):
+        # Counts since the last reset: requests per route and status, bytes
+        # sent and received by the app, 304s, conflicts and injected faults
+        with self.lock:
+            stats = Counter(self.stats)
+            self.stats.clear()
+        return stats
+
+    def start(self):
+        fake = self
+
+        class Handler(FakeGitHubHandler):
+            github = fake
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-github", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def draw(self):
+        # (delay, fail, conflict) for the next request, from the seeded RNG
+        with self.lock:
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate > 0 and self.random.random() < self.error_rate
+            conflict = self.conflict_rate > 0 and self.random.random() < self.conflict_rate
+        return delay, fail, conflict
+
+    def spend(self):
+        # X-RateLimit-* headers for a call, and whether it is over the limit
+        with self.lock:
+            now = time.time()
+            if now >= self.window_start + self.rate_window:
+                self.window_start, self.used = now, 0
+            over = self.used >= self.rate_limit
+            if not over:
+                self.used += 1
+            else:
+                self.stats["rate_limited"] += 1
+            return {"X-RateLimit-Limit": str(self.rate_limit),
+                    "X-RateLimit-Remaining": str(self.rate_limit - self.used),
+                    "X-RateLimit-Reset": str(int(self.window_start + self.rate_window) + 1)}, over
+
+    def handle(self, method, path, query, headers, body):
+        # (status, JSON body or None, extra headers) for one request
+        if self.rate_limit is None:
+            return self.respond(method, path, query, headers, body)
+        limit_headers, over = self.spend()
+        if over:
+            return 403, {"message": "API rate limit exceeded"}, limit_headers
+        status, payload, extra = self.respond(method, path, query, headers, body)
+        return status, payload, {**extra, **limit_headers}
+
+    def respond(self, method, path, query, headers, body):
+        delay, fail, conflict = self.draw()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self.count("errors_injected")
+            return 502, {"message": "Server Error"}, {}
+        if path in ("", "/"):
+            return 200, {"current_user_url": f"{self.url}/user"}, {}
+
+        match = re.match(r"^/repos/([^/]+/[^/]+)(/.*)?$", path)
+        repo = self.repos.get(match.group(1)) if match else None
+        if repo is None:
+            return 404, {"message": "Not Found"}, {}
+        route = match.group(2) or ""
+        with self.lock:
+            if route == "":
+                return 200, {"default_branch": BRANCH}, {}
+            if route.startswith("/contents/"):
+                file_path = unquote(route[len("/contents/"):])
+                if method == "GET":
+                    return self.get_contents(repo, file_path, query.get("ref"), headers)
+                if method == "PUT":
+                    return self.put_contents(repo, file_path, body, conflict)
+            if route.startswith("/git/"):
+                return self.git(repo, method, route[len("/git/"):], body, conflict)
+        return 404, {"message": "Not Found"}, {}
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    # Contents API
+
+    def get_contents(self, repo, path, ref, headers):
+        if ref is not None and ref not in repo.commits:
+            return 404, {"message": "No commit found for the ref"}, {}
+        sha = repo.trees[repo.tree_of(ref or repo.head)].get(path)
+        if sha is None:
+            return 404, {"message": "Not Found"}, {}
+        etag = f'"{sha}"'
+        if ref is None and headers.get("If-None-Match") == etag:
+            self.stats["not_modified"] += 1
+            return 304, None, {"ETag": etag}
+        content = base64.b64encode(repo.blobs[sha].encode()).decode()
+        return 200, {"path": path, "sha": sha, "encoding": "base64", "content": content}, {"ETag": etag}
+
+    def put_contents(self, repo, path, body, conflict):
+        conflict = self.take_forced_conflict() or conflict
+        if conflict and repo.edit_elsewhere([path]):
+            self.stats["conflicts_injected"] += 1
+        current = repo.trees[repo.tree_of(repo.head)].get(path)
+        if current is not None and body.get("sha") != current:
+            self.stats["conflicts"] += 1
+            if body.get("sha"):
+                return 409, {"message": f"{path} does not match {body['sha']}"}, {}
+            return 422, {"message": "Invalid request. \"sha\" wasn't supplied."}, {}
+        text = base64.b64decode(body["content"]).decode()
+        commit = repo.write({path: text})
+        return (201 if current is None else 200), {
+            "content": {"path": path, "sha": blob_sha(text)},
+            "commit": {"sha": commit, "tree": {"sha": repo.tree_of(commit)}},
+        }, {}
+
+    # Git Data API
+
+    def git(self, repo, method, route, body, conflict):
+        kind, _, name = route.partition("/")
+        if method == "GET":
+            if route == f"ref/heads/{BRANCH}":
+                return 200, {"ref": f"refs/heads/{BRANCH}", "object": {"type": "commit", "sha": repo.head}}, {}
+            if kind == "commits" and name in repo.commits:
+                return 200, {"sha": name, "tree": {"sha": repo.tree_of(name)}}, {}
+            if kind == "blobs" and name in repo.blobs:
+                content = base64.b64encode(repo.blobs[name].encode()).decode()
+                return 200, {"sha": name, "encoding": "base64", "content": content}, {}
+            if kind == "trees" and name in repo.trees:
+                return 200, {"sha": name, "tree": self.tree_listing(repo.trees[name])}, {}
+            return 404, {"message": "Not Found"}, {}
+
+        if method == "POST" and route == "trees":
+            if body.get("base_tree") not in repo.trees:
+                return 422, {"message": "Invalid tree"}, {}
+            entries = dict(repo.trees[body["base_tree"]])
+            for entry in body["tree"]:
+                if entry.get("content") is not None:
+                    entries[entry["path"]] = repo.store_blob(entry["content"])
+                elif entry.get("sha") is None:
+                    if entry["path"] not in entries:
+                        return 422, {"message": f"{entry['path']} is not in the base tree"}, {}
+                    del entries[entry["path"]]
+                elif entry["sha"] in repo.blobs:
+                    entries[entry["path"]] = entry["sha"]
+                else:
+                    return 422, {"message": "Invalid blob"}, {}
+            return 201, {"sha": repo.store_tree(entries)}, {}
+
+        if method == "POST" and route == "commits":
+            parents = body.get("parents") or [None]
+            if body.get("tree") not in repo.trees or (parents[0] and parents[0] not in repo.commits):
+                return 422, {"message": "Invalid tree or parent"}, {}
+            return 201, {"sha": repo.commit(body["tree"], parents[0])}, {}
+
+        if method == "PATCH" and route == f"refs/heads/{BRANCH}":
+            commit = body.get("sha")
+            if commit not in repo.commits:
+                return 422, {"message": "Object does not exist"}, {}
+            tree, parent = repo.commits[commit]
+            conflict = self.take_forced_conflict() or conflict
+            if conflict:
+                # Someone else commits to one of the files this commit changes
+                before = repo.trees[repo.tree_of(parent)] if parent in repo.commits else {}
+                changed = [path for path, sha in repo.trees[tree].items() if before.get(path) != sha]
+                if repo.edit_elsewhere(changed):
+                    self.stats["conflicts_injected"] += 1
+            if parent != repo.head and not body.get("force"):
+                self.stats["conflicts"] += 1
+                return 422, {"message": "Update is not a fast forward"}, {}
+            repo.head = commit
+            return 200, {"ref": f"refs/heads/{BRANCH}", "object": {"type": "commit", "sha": commit}}, {}
+
+        return 404, {"message": "Not Found"}, {}
+
+    @staticmethod
+    def tree_listing(entries):
+        # Top level only, as GitHub lists a tree without ?recursive
+        listing = [{"path": path, "mode": "100644", "type": "blob", "sha": sha}
+                   for path, sha in entries.items() if "/" not in path]
+        for directory in sorted({path.split("/", 1)[0] for path in entries if "/" in path}):
+            listing.append({"path": directory, "mode": "040000", "type": "tree", "sha": "0" * 40})
+        return listing
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the app's pooled session
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    github = None
+
+    def do_request(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        body = json.loads(raw) if raw else {}
+        status, payload, headers = self.github.handle(self.command, url.path.rstrip("/"), query,
+                                                      self.headers, body)
+        data = json.dumps(payload).encode() if payload is not None else b""
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+        route = re.sub(r"^/repos/[^/]+/[^/]+", "", url.path) or "/"
+        route = re.sub(r"/(contents|blobs|trees|commits)/.*", r"/\1", route)
+        with self.github.lock:
+            stats = self.github.stats
+            stats["requests"] += 1
+            stats[f"{self.command} {route}"] += 1
+            stats[f"status {status}"] += 1
+            stats["bytes_sent"] += length
+            stats["bytes_received"] += len(data)
+
+    do_GET = do_PUT = do_POST = do_PATCH = do_request
+
+    def log_message(self, format, *args):
+        pass
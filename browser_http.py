@@ -0,0 +1,119 @@
+from json import dumps, loads
+from urllib.parse import urlencode
+
+import js
+from pyodide.ffi import JsException
+
+
+# The little of requests that GitHubClient and the connectivity probe use,
+# on top of the browser's own HTTP stack, for shinylive. Pyodide has no
+# sockets, so requests cannot work there without extra wheels (urllib3,
+# charset_normalizer, certifi) that would all be downloaded before the
+# first render. Calls are synchronous XMLHttpRequests rather than fetch(),
+# whose promises the blocking client code could not wait on; the browser
+# allows them because shinylive runs Python in a web worker, and they block
+# only that worker, as requests blocks its thread on a server.
+#
+# Only the response headers GitHub exposes to scripts through CORS are
+# visible, which include ETag, Retry-After and the X-RateLimit-* family.
+
+
+class RequestException(OSError):
+    pass
+
+
+class ConnectionError(RequestException):
+    pass
+
+
+class Timeout(RequestException):
+    pass
+
+
+class Headers(dict):
+    # Header names compare case-insensitively, as in requests
+
+    def __init__(self, items=()):
+        super().__init__()
+        self.update(items)
+
+    def __setitem__(self, name, value):
+        super().__setitem__(name.lower(), value)
+
+    def __getitem__(self, name):
+        return super().__getitem__(name.lower())
+
+    def __contains__(self, name):
+        return super().__contains__(name.lower())
+
+    def get(self, name, default=None):
+        return super().get(name.lower(), default)
+
+    def update(self, items=(), **kwargs):
+        for name, value in dict(items, **kwargs).items():
+            self[name] = value
+
+
+class PreparedRequest:
+    def __init__(self, method, url, body=None):
+        self.method = method
+        self.url = url
+        self.body = body
+
+
+class Response:
+    def __init__(self, request, status_code, headers, text):
+        self.request = request
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        self.content = text.encode()
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return loads(self.text)
+
+
+def _parse_headers(raw):
+    headers = Headers()
+    for line in raw.split("\r\n"):
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip()] = value.strip()
+    return headers
+
+
+class Session:
+    def __init__(self):
+        self.headers = Headers()
+
+    def request(self, method, url, params=None, headers=None, json=None, timeout=None):
+        if params:
+            url += ("&" if "?" in url else "?") + urlencode(params)
+        request = PreparedRequest(method, url)
+        xhr = js.XMLHttpRequest.new()
+        xhr.open(method, url, False)
+        for name, value in {**self.headers, **Headers(headers or {})}.items():
+            xhr.setRequestHeader(name, value)
+        if json is not None:
+            request.body = dumps(json).encode()
+            xhr.setRequestHeader("Content-Type", "application/json")
+        if timeout:
+            xhr.timeout = int(timeout * 1000)
+        try:
+            xhr.send(request.body.decode() if request.body else None)
+        except JsException as e:
+            # A DOMException: "TimeoutError", or "NetworkError" for anything
+            # from no connection to a refused CORS preflight
+            raise (Timeout if "TimeoutError" in str(e) else ConnectionError)(str(e)) from None
+        return Response(request, xhr.status, _parse_headers(xhr.getAllResponseHeaders()), xhr.responseText or "")
+
+    def close(self):
+        pass
+
+
+def get(url, **kwargs):
+    return Session().request("GET", url, **kwargs)
@@ -0,0 +1,196 @@
+import argparse
+import ast
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+# Builds the shinylive site in docs/ for GitHub Pages.
+#
+#   python build_docs.py          startup-optimized (the default)
+#   python build_docs.py --full   plain `shinylive export`, editor included
+#
+# A plain export of the repo root ships every file in it (benchmarks and
+# all), the code editor with its 8 MB type checker, and every wheel the
+# lock file lists as a dependency of shiny, whether or not anything imports
+# it. The startup-optimized build
+#   - exports only app.py and the modules it imports,
+#   - drops the editor (docs/edit, Editor.js, pyright/), which the app view
+#     never loads,
+#   - and keeps only the wheels some kept code imports at module level:
+#     the app's own imports, then, transitively, the import-time imports of
+#     each kept package. Imports inside functions are lazy, so a package only
+#     imported there (shiny's markdown support, for one) is dropped from the
+#     lock file's dependencies and from the site, and is never downloaded
+#     before the first render. A code path that does reach such an import
+#     then fails with ModuleNotFoundError: name the package with --keep.
+#     Packages the app only imports when not running under shinylive are
+#     listed in PRUNED_PACKAGES (or named with --prune) and are left out
+#     along with whatever only they import.
+#
+# Requires the shinylive package (pip install shinylive). The app reports its
+# time to interactive in the browser console and on the timing dashboard.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+EDITOR_FILES = ("edit", "shinylive/Editor.js", "shinylive/Editor.css", "shinylive/pyright")
+# Imported by shinylive's own startup code
+RUNTIME_PACKAGES = ("micropip",)
+# Imported by the app only outside shinylive: github_client.py talks to
+# GitHub through browser_http.py there
+PRUNED_PACKAGES = ("requests",)
+
+
+def load_time_imports(tree):
+    # Top-level names of the absolute imports that run when the module is
+    # imported: everything outside function bodies
+    names = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            continue
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+            names.add(node.module.split(".")[0])
+        stack.extend(ast.iter_child_nodes(node))
+    return names
+
+
+def app_sources(root=ROOT):
+    # app.py and the modules next to it that it imports, directly or not
+    sources = []
+    pending = ["app"]
+    while pending:
+        name = pending.pop()
+        path = os.path.join(root, f"{name}.py")
+        if path in sources or not os.path.exists(path):
+            continue
+        sources.append(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                pending.append(node.module.split(".")[0])
+    return sources
+
+
+def export(app_dir, dest):
+    shinylive = shutil.which("shinylive")
+    if shinylive is None:
+        sys.exit("shinylive is not installed: pip install shinylive")
+    subprocess.run([shinylive, "export", app_dir, dest], check=True)
+
+
+def prune_editor(dest):
+    for name in EDITOR_FILES:
+        path = os.path.join(dest, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def wheel_imports(path):
+    # Load-time imports of every module in a wheel
+    names = set()
+    with zipfile.ZipFile(path) as wheel:
+        for member in wheel.namelist():
+            if member.endswith(".py"):
+                try:
+                    names |= load_time_imports(ast.parse(wheel.read(member)))
+                except SyntaxError:
+                    pass
+    return names
+
+
+def prune_packages(dest, sources, keep=(), prune=()):
+    # Delete the wheels nothing imports when the app starts (imports of the
+    # `prune` packages and PRUNED_PACKAGES do not count), and drop them from
+    # the dependencies in the lock file. Returns the removed packages.
+    pyodide_dir = os.path.join(dest, "shinylive", "pyodide")
+    lock_path = os.path.join(pyodide_dir, "pyodide-lock.json")
+    with open(lock_path) as f:
+        lock = json.load(f)
+    packages = lock["packages"]
+    shipped = {name for name, package in packages.items()
+               if os.path.exists(os.path.join(pyodide_dir, package["file_name"]))}
+    by_import = {}
+    for name in packages:
+        for module in packages[name].get("imports", ()):
+            by_import[module] = name
+
+    imports = set()
+    for path in sources:
+        with open(path) as f:
+            imports |= load_time_imports(ast.parse(f.read(), path))
+    imports = (imports - set(PRUNED_PACKAGES) - set(prune)) | set(RUNTIME_PACKAGES) | set(keep)
+    needed = set()
+    pending = [by_import[module] for module in imports if module in by_import]
+    while pending:
+        name = pending.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        package = packages[name]
+        depends = [dep for dep in package.get("depends", ()) if dep in packages]
+        if name in shipped and package["file_name"].endswith(".whl"):
+            # Shared libraries are loaded, not imported
+            pending += [dep for dep in depends if packages[dep].get("shared_library")]
+            pending += [by_import[module] for module in wheel_imports(os.path.join(pyodide_dir, package["file_name"]))
+                        if module in by_import]
+        else:
+            # A zipped stdlib module, a shared library or a package fetched
+            # from elsewhere: keep everything it declares
+            pending += depends
+
+    removed = sorted(shipped - needed)
+    for name in removed:
+        os.remove(os.path.join(pyodide_dir, packages[name]["file_name"]))
+    for name in needed:
+        packages[name]["depends"] = [dep for dep in packages[name].get("depends", ()) if dep not in removed]
+    with open(lock_path, "w") as f:
+        json.dump(lock, f)
+    return removed
+
+
+def size(path):
+    total = 0
+    for directory, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dest", nargs="?", default=os.path.join(ROOT, "docs"))
+    parser.add_argument("--full", action="store_true", help="plain shinylive export of the whole repo")
+    parser.add_argument("--keep", action="append", default=[], metavar="MODULE",
+                        help="ship the package providing MODULE even if nothing imports it at startup")
+    parser.add_argument("--prune", action="append", default=[], metavar="MODULE",
+                        help="leave out the package providing MODULE even though the app imports it")
+    args = parser.parse_args()
+
+    if args.full:
+        export(ROOT, args.dest)
+        return
+    sources = app_sources()
+    with tempfile.TemporaryDirectory() as staging:
+        for path in sources:
+            shutil.copy(path, staging)
+        export(staging, args.dest)
+    before = size(args.dest)
+    prune_editor(args.dest)
+    removed = prune_packages(args.dest, sources, args.keep, args.prune)
+    print(f"Exported {', '.join(os.path.basename(path) for path in sources)}")
+    print(f"Removed the editor and {len(removed)} unused packages: {', '.join(removed) or '-'}")
+    print(f"{before / 1e6:.1f} MB -> {size(args.dest) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+# Operations are plain tuples so they are cheap to keep and trivial to persist.
+# Tasks are addressed by their stable ID (see task_store.py), so an operation
+# still applies after other tasks have moved around it:
+#   ("add", list_id, index, task_id, title, description, timestamp)
+#   ("edit", task_id, title, description, timestamp)
+#   ("delete", task_id)
+#   ("move", task_id, target_list_id, target_index)
+#   ("rename", list_id, name)
+#   ("create_list", list_id, name)
+#   ("archive_list", list_id, archived)
+#   ("delete_list", list_id)
+#   ("sort", list_id, key, reverse)
+#   ("batch", [op, ...])
+# An add or move puts the task at the given index (clamped to the end of the
+# list); an index of -1 appends. A sort key is one of task_store.SORT_KEYS.
+# A batch holds task changes (not list changes) and is applied in one pass by
+# TaskStore.apply_batch. List changes update the list registry passed as
+# `names` (see list_registry.py); creating a list that exists or deleting one
+# that does not is not an error, so they replay cleanly onto a version that
+# already has them.
+
+# Changes to whole lists, which are never folded into task changes
+LIST_CHANGES = {"rename", "create_list", "archive_list", "delete_list", "sort", "batch"}
+
+# Bumped whenever the operation tuples change shape; persisted journals from
+# another version are not replayed
+JOURNAL_FORMAT = 2
+
+# Persisted journals belong to one browser: a random ID kept in its local
+# storage (sent as input.browser_id)
+BROWSER_ID_SCRIPT = """
+$(document).on('shiny:connected', function() {
+    const key = 'todo-browser-id';
+    let id = localStorage.getItem(key);
+    if (!id) {
+        id = Math.random().toString(36).slice(2) + Date.now().toString(36);
+        localStorage.setItem(key, id);
+    }
+    Shiny.setInputValue('browser_id', id);
+});
+"""
+
+
+def journal_path(directory, repo, token, browser_id):
+    # Keyed by a hash of (repo, token), like the local cache, and of the
+    # browser that made the changes: another user's changes, or another
+    # browser's, are never replayed here, and the token is never stored
+    key = hashlib.sha256(f"{repo}\n{token}\n{browser_id}".encode()).hexdigest()
+    return os.path.join(directory, f"{key}.journal.json")
+
+
+def apply_change(store, op, names=None):
+    kind = op[0]
+    if kind == "add":
+        _, list_id, index, task_id, title, desc, timestamp = op
+        store.add(list_id, index, title, desc, task_id=task_id, now=timestamp)
+    elif kind == "edit":
+        _, task_id, title, desc, timestamp = op
+        store.update(task_id, title, desc, now=timestamp)
+    elif kind == "delete":
+        _, task_id = op
+        store.remove(task_id)
+    elif kind == "move":
+        _, task_id, target_id, target_index = op
+        store.move(task_id, target_id, target_index)
+    elif kind == "sort":
+        store.apply_batch([op])
+    elif kind == "batch":
+        store.apply_batch(op[1])
+    elif kind == "rename":
+        _, list_id, name = op
+        if names is not None:
+            names.rename(list_id, name)
+    elif kind == "create_list":
+        _, list_id, name = op
+        store.add_list(list_id)
+        if names is not None:
+            names.create(name, list_id)
+    elif kind == "archive_list":
+        _, list_id, archived = op
+        if names is not None:
+            names.archive(list_id, archived)
+    elif kind == "delete_list":
+        _, list_id = op
+        store.drop_list(list_id)
+        if names is not None:
+            names.delete(list_id)
+    else:
+        raise ValueError(f"Unknown change: {kind}")
+
+
+class ChangeJournal:
+    # Operations made since the last successful save. Each append is folded
+    # into the previous operation where that is exact (edit or move after add,
+    # delete after add or edit, chained edits or moves of the same task,
+    # repeated renames), so bursts of edits stay small. Past `max_ops` the journal stops recording and is
+    # marked `overflowed`; callers then fall back to pushing the full state.
+
+    def __init__(self, max_ops=500, path=None):
+        self.max_ops = max_ops
+        self.path = path
+        self.overflowed = False
+        self._ops = []  # [seq, op] pairs
+        self._seq = 0
+        self._sealed = 0  # ops with seq <= this are part of an in-flight save
+
+    def __len__(self):
+        return 0 if self.overflowed else len(self._ops)
+
+    def __bool__(self):
+        return self.overflowed or bool(self._ops)
+
+    def ops(self):
+        return [op for _, op in self._ops]
+
+    def append(self, op):
+        op = tuple(op)
+        if self.overflowed:
+            self._seq += 1
+            return
+        if not self._compact(op):
+            self._seq += 1
+            self._ops.append([self._seq, op])
+        if len(self._ops) > self.max_ops:
+            self.overflowed = True
+            self._ops = []
+        self._persist()
+
+    def _compact(self, op):
+        if not self._ops or self._ops[-1][0] <= self._sealed:
+            return False
+        last = self._ops[-1][1]
+        kind = op[0]
+        if kind in LIST_CHANGES or last[0] in LIST_CHANGES:
+            if kind == "rename" and last[0] == "rename" and last[1] == op[1]:
+                self._ops[-1][1] = op
+                return True
+            return False
+        if _task_id(last) != op[1]:
+            return False
+
+        if kind == "edit" and last[0] == "add":
+            self._ops[-1][1] = last[:4] + op[2:4] + last[6:]
+            return True
+        if kind == "edit" and last[0] == "edit":
+            self._ops[-1][1] = op
+            return True
+        if kind == "delete":
+            if last[0] == "add":
+                self._ops.pop()
+                return True
+            if last[0] == "edit":
+                self._ops[-1][1] = op
+                return True
+        if kind == "move":
+            if last[0] == "add":
+                self._ops[-1][1] = (last[0], op[2], op[3]) + last[3:]
+                return True
+            if last[0] == "move":
+                self._ops[-1][1] = op
+                return True
+        return False
+
+    def checkpoint(self):
+        # Seal everything recorded so far (a save of this state is starting)
+        # and return a token for discard_through() once that save succeeds
+        self._sealed = self._seq
+        return self._seq
+
+    def discard_through(self, seq):
+        self._ops = [entry for entry in self._ops if entry[0] > seq]
+        if self.overflowed and seq >= self._seq:
+            self.overflowed = False
+        self._persist()
+
+    def clear(self):
+        self._ops = []
+        self.overflowed = False
+        self._sealed = self._seq
+        self._persist()
+
+    def mark_unreplayable(self):
+        # The lists were replaced wholesale (e.g. by a merge), so the recorded
+        # operations no longer describe the change since the base version
+        self._ops = []
+        self.overflowed = True
+        self._persist()
+
+    def replay(self, store, names=None):
+        # Re-apply the recorded operations on top of another version of the
+        # lists (e.g. freshly loaded from GitHub). Returns a new TaskStore, or
+        # None if the journal overflowed or an operation no longer applies
+        # (its task is gone); `store` is never touched, `names` only on
+        # success.
+        if self.overflowed:
+            return None
+        new_store = store.copy()
+        new_names = names.copy() if names is not None else None
+        try:
+            for _, op in self._ops:
+                apply_change(new_store, op, new_names)
+        except (KeyError, ValueError):
+            return None
+        if names is not None:
+            names.replace_with(new_names)
+        return new_store
+
+    def _persist(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"format": JOURNAL_FORMAT, "overflowed": self.overflowed, "ops": self.ops()}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # Keep journalling in memory only: a stale copy left on disk
+            # would be replayed by a later session
+            logger.warning("Could not write offline change journal, keeping it in memory only: %s", e)
+            for stale_path in (tmp_path, self.path):
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass
+            self.path = None
+
+    def restore(self):
+        # Pick up operations persisted by an earlier session, if any
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if saved.get("format") != JOURNAL_FORMAT:
+            logger.warning("Ignoring offline changes saved in an older journal format")
+            return False
+        self.overflowed = bool(saved.get("overflowed"))
+        self._ops = []
+        for op in saved.get("ops", []):
+            self._seq += 1
+            self._ops.append([self._seq, tuple(op)])
+        self._sealed = self._seq
+        return bool(self)
+
+
+def _task_id(op):
+    return op[3] if op[0] == "add" else op[1]
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from github_client import GITHUB_API_URL, http
+
+
+def probe_github(timeout=2):
+    try:
+        http.get(GITHUB_API_URL, timeout=timeout)
+        return True
+    except (http.ConnectionError, http.Timeout):
+        return False
+
+
+class ConnectivityMonitor:
+    # Shared view of whether GitHub is reachable. Real API calls feed it
+    # through record_success()/record_failure(), so normally no extra probe
+    # is ever sent. A probe is only due once the last observation is older
+    # than `ttl` seconds, or, while offline, once the current backoff has
+    # elapsed (doubling from `min_backoff` up to `max_backoff`).
+
+    def __init__(self, probe=probe_github, ttl=300.0, min_backoff=2.0, max_backoff=300.0,
+                 clock=time.monotonic):
+        self.probe_fn = probe
+        self.ttl = ttl
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.online = True
+        self.failures = 0
+        self._checked_at = None
+        self._next_probe_at = None
+        self._lock = threading.Lock()
+        self._probing = threading.Lock()
+
+    def record_success(self):
+        with self._lock:
+            self.online = True
+            self.failures = 0
+            self._checked_at = self.clock()
+            self._next_probe_at = self._checked_at + self.ttl
+
+    def record_failure(self):
+        with self._lock:
+            self.online = False
+            self.failures += 1
+            backoff = min(self.max_backoff, self.min_backoff * 2 ** (self.failures - 1))
+            self._checked_at = self.clock()
+            self._next_probe_at = self._checked_at + backoff
+
+    def seconds_until_probe(self):
+        if self._next_probe_at is None:
+            return 0.0
+        return max(0.0, self._next_probe_at - self.clock())
+
+    def needs_probe(self):
+        return self.seconds_until_probe() == 0.0
+
+    def probe(self):
+        # Blocking; run it off the event loop. Concurrent callers share the
+        # probe already in flight instead of sending their own.
+        if not self._probing.acquire(blocking=False):
+            return self.online
+        try:
+            if not self.needs_probe():
+                return self.online
+            if self.probe_fn():
+                self.record_success()
+            else:
+                self.record_failure()
+            return self.online
+        finally:
+            self._probing.release()
@@ -0,0 +1,434 @@
+import asyncio
+import base64
+import functools
+import hashlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import METRICS
+from rate_limit import LOAD, MAX_RETRIES, RateLimited, backoff, budget_for
+
+if sys.platform == "emscripten":
+    # No sockets under shinylive: requests is replaced by the browser's own
+    # HTTP (see browser_http.py)
+    import browser_http as http
+else:
+    # Left out of the shinylive site by build_docs.py (PRUNED_PACKAGES)
+    import requests as http
+RequestException = http.RequestException
+
+
+# Set TODO_GITHUB_API_URL to talk to another API host (GitHub Enterprise, or
+# the local stand-in in benchmarks/fake_github.py)
+GITHUB_API_URL = os.environ.get("TODO_GITHUB_API_URL", "https://api.github.com").rstrip("/")
+REQUEST_TIMEOUT = 15
+
+# Bounded pool shared by every session in the process, so a slow GitHub
+# response ties up a worker thread instead of the event loop
+IO_POOL_SIZE = 8
+_io_pool = None
+
+
+async def run_io(fn, *args, **kwargs):
+    # Run blocking GitHub I/O off the event loop. Pyodide has no threads, so
+    # under shinylive the call simply runs inline.
+    global _io_pool
+    if sys.platform == "emscripten":
+        return fn(*args, **kwargs)
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix="github-io")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_pool, functools.partial(fn, *args, **kwargs))
+
+
+class FileResult:
+    # Outcome of a Contents API call. `content` is the decoded file text,
+    # `not_modified` is True when GitHub answered 304 and we served our copy.
+    # A write also reports the commit it made and that commit's tree.
+    def __init__(self, status_code, content=None, sha=None, not_modified=False, commit=None, tree=None):
+        self.status_code = status_code
+        self.content = content
+        self.sha = sha
+        self.not_modified = not_modified
+        self.commit = commit
+        self.tree = tree
+
+    @property
+    def ok(self):
+        return self.status_code in (200, 201, 304)
+
+    @property
+    def conflict(self):
+        # A stale `sha` precondition on PUT comes back as 409 (or 422 when
+        # the file exists and no sha was sent)
+        return self.status_code in (409, 422)
+
+
+class CommitResult:
+    # Outcome of a Git Data API call that reads or moves the branch head
+    def __init__(self, status_code, commit=None, tree=None):
+        self.status_code = status_code
+        self.commit = commit
+        self.tree = tree
+
+    @property
+    def ok(self):
+        return self.status_code in (200, 201)
+
+    @property
+    def conflict(self):
+        # The branch moved: a fast-forward-only ref update is refused with 422
+        return self.status_code in (409, 422)
+
+
+def blob_sha(text):
+    # The SHA git gives a file with this content, so a file can be compared
+    # with one on GitHub without fetching it
+    data = text.encode()
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+# Commits that land between our check and our ref update are retried this often
+MAX_COMMIT_ATTEMPTS = 3
+
+
+class CommitBuilder:
+    # Stages file writes and deletions, then commits them all at once: one
+    # tree (file contents go inline, so there is no request per file), one
+    # commit on top of `parent`, and a compare-and-swap of the branch from
+    # `parent` to that commit. If anyone else committed in the meantime the
+    # branch does not move and the result is a conflict; either every
+    # staged file changes or none does.
+
+    def __init__(self, client, parent, base_tree):
+        self.client = client
+        self.parent = parent
+        self.base_tree = base_tree
+        self.files = {}  # path -> text, or None to delete
+
+    def __len__(self):
+        return len(self.files)
+
+    def write(self, path, text):
+        self.files[path] = text
+
+    def delete(self, path):
+        self.files[path] = None
+
+    def commit(self, message):
+        entries = [
+            {"path": path, "mode": "100644", "type": "blob", "content": text} if text is not None
+            else {"path": path, "mode": "100644", "type": "blob", "sha": None}
+            for path, text in self.files.items()
+        ]
+        response = self.client.create_tree(self.base_tree, entries)
+        if not response.ok:
+            return response
+        response = self.client.create_commit(message, response.tree, self.parent)
+        if not response.ok:
+            return response
+        response = self.client.move_head(response.commit, response.tree)
+        if response.ok:
+            for path, text in self.files.items():
+                if text is None:
+                    self.client.forget(path)
+                else:
+                    self.client.wrote(path, text)
+        return response
+
+
+class CachedFile:
+    __slots__ = ("etag", "sha", "content")
+
+    def __init__(self, etag=None, sha=None, content=None):
+        self.etag = etag
+        self.sha = sha
+        self.content = content
+
+
+class GitHubClient:
+    # One client per (repo, token). Keeps a pooled keep-alive session and
+    # remembers the ETag/SHA/content of every file it has seen so repeat
+    # reads can be conditional GETs (a 304 is free against the rate limit).
+
+    def __init__(self, repo, token, session=None, monitor=None, metrics=None, budget=None, shared=None):
+        self.repo = repo
+        self.token = token
+        # Decoded files and ETags other sessions already have, and their GETs
+        # in flight (see shared_cache.py); None to share nothing
+        self.shared = shared
+        self._token_key = hashlib.sha256(token.encode()).hexdigest()
+        self.monitor = monitor
+        self.metrics = metrics if metrics is not None else METRICS
+        # Rate limits are per token, so clients for the same token share
+        # one budget (see rate_limit.py)
+        self.budget = budget if budget is not None else budget_for(token)
+        self._local = threading.local()
+        self.session = session or http.Session()
+        if session is None and sys.platform != "emscripten":
+            adapter = http.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=4)
+            self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json",
+        })
+        self._files = {}
+        self._branch = None
+        self._trees = {}  # commit SHA -> its tree SHA
+
+    @property
+    def priority(self):
+        return getattr(self._local, "priority", LOAD)
+
+    def at_priority(self, priority, fn, *args, **kwargs):
+        # Call fn with the requests it makes through this client (on this
+        # thread) sent at `priority`
+        previous = self.priority
+        self._local.priority = priority
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._local.priority = previous
+
+    def _request(self, method, url, **kwargs):
+        # Every API call passes through here: it waits for the rate-limit
+        # budget, and transient failures (5xx, secondary rate limits) are
+        # retried. RateLimited if the budget would not let it through in time.
+        endpoint = self._endpoint(url)
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                self.budget.acquire(self.priority, write=method != "GET")
+            except RateLimited:
+                self.metrics.count("github_rate_limited_total", endpoint=endpoint)
+                raise
+            response = self._send(method, url, endpoint, **kwargs)
+            status = response.status_code
+            wait = self.budget.update(status, response.headers, response.text if status in (403, 429) else "")
+            if (status < 500 and wait is None) or attempt == MAX_RETRIES:
+                return response
+            self.metrics.count("github_request_retries_total", endpoint=endpoint)
+            if wait is None:
+                time.sleep(backoff(attempt))
+            # else the budget holds the next attempt back until GitHub allows it
+        return response
+
+    def _send(self, method, url, endpoint, **kwargs):
+        # One HTTP request. The connectivity monitor learns from real
+        # traffic instead of separate probes, and every request is timed and
+        # counted (see metrics.py).
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except (http.ConnectionError, http.Timeout):
+            self.metrics.count("github_errors_total", endpoint=endpoint)
+            if self.monitor is not None:
+                self.monitor.record_failure()
+            raise
+        finally:
+            self.metrics.observe("github_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+        if self.monitor is not None:
+            self.monitor.record_success()
+
+        status = response.status_code
+        self.metrics.count("github_requests_total", method=method, status=str(status))
+        body = response.request.body
+        if body:
+            self.metrics.count("github_bytes_sent_total", len(body))
+        self.metrics.count("github_bytes_received_total", len(response.content))
+        if status == 304:
+            self.metrics.count("github_not_modified_total")
+        elif status in (409, 422) and method in ("PUT", "PATCH"):
+            self.metrics.count("github_conflicts_total", endpoint=endpoint)
+        return response
+
+    def _endpoint(self, url):
+        # "contents", "git/trees", ...: which kind of call, without the repo
+        # or file path, to label its metrics
+        parts = url[len(f"{GITHUB_API_URL}/repos/{self.repo}/"):].split("/")
+        if parts[0] == "git" and len(parts) > 1:
+            return f"git/{parts[1]}"
+        return parts[0] or "repo"
+
+    def contents_url(self, path):
+        return f"{GITHUB_API_URL}/repos/{self.repo}/contents/{path}"
+
+    def git_url(self, path):
+        return f"{GITHUB_API_URL}/repos/{self.repo}/git/{path}"
+
+    def cached(self, path):
+        return self._files.get(path)
+
+    def seed(self, path, content, sha, etag=None):
+        # Prime the cache from a copy kept elsewhere (e.g. on disk) so the
+        # next read of `path` is a conditional GET
+        if path not in self._files:
+            self._files[path] = CachedFile(etag=etag, sha=sha, content=content)
+
+    def forget(self, path):
+        self._files.pop(path, None)
+
+    def get_file(self, path, ref=None):
+        if ref is not None:
+            # The file as of a given commit: a plain read, not cached
+            response = self._request("GET", self.contents_url(path), params={"ref": ref})
+            if response.status_code == 200:
+                body = response.json()
+                return FileResult(200, base64.b64decode(body["content"]).decode(), body["sha"])
+            return FileResult(response.status_code)
+
+        if self.shared is None:
+            return self._get_file(path)[0]
+        # Sessions using this token share one GET of a file at a time
+        result, cached = self.shared.coalesce(("get", self._token_key, self.repo, path), self._get_file, path)
+        if cached is not None:
+            self._files[path] = cached
+        elif result.status_code == 404:
+            self.forget(path)
+        return result
+
+    def _get_file(self, path):
+        # (FileResult, the CachedFile it leaves us with)
+        cached = self._files.get(path)
+        if cached is None and self.shared is not None:
+            # Someone else's copy, if GitHub confirms it is still current
+            # for us (the ETag alone shows nothing)
+            latest = self.shared.get(("etag", self.repo, path))
+            if latest is not None:
+                content = self.shared.get(("content", self.repo, path, latest[1]))
+                if content is not None:
+                    cached = CachedFile(etag=latest[0], sha=latest[1], content=content)
+        headers = {}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+
+        response = self._request("GET", self.contents_url(path), headers=headers)
+
+        if response.status_code == 304 and cached:
+            self._files[path] = cached
+            return FileResult(304, cached.content, cached.sha, not_modified=True), cached
+
+        if response.status_code == 200:
+            body = response.json()
+            content = self._decode(path, body)
+            etag = response.headers.get("ETag")
+            cached = self._files[path] = CachedFile(etag=etag, sha=body["sha"], content=content)
+            if self.shared is not None and etag:
+                self.shared.put(("etag", self.repo, path), (etag, body["sha"]), len(etag) + 40)
+            return FileResult(200, content, body["sha"]), cached
+
+        if response.status_code == 404:
+            self.forget(path)
+        return FileResult(response.status_code), None
+
+    def _decode(self, path, body):
+        # The text of a Contents or Blobs API response, decoded once per
+        # process for each version of a file
+        if self.shared is None:
+            return base64.b64decode(body["content"]).decode()
+        key = ("content", self.repo, path, body["sha"])
+        content = self.shared.get(key)
+        if content is None:
+            content = base64.b64decode(body["content"]).decode()
+            self.shared.put(key, content, len(content))
+        return content
+
+    def put_file(self, path, content, message, sha=None):
+        data = {
+            "message": message,
+            "content": base64.b64encode(content.encode()).decode(),
+        }
+        if sha:
+            data["sha"] = sha
+
+        response = self._request("PUT", self.contents_url(path), json=data)
+
+        if response.status_code in (200, 201):
+            body = response.json()
+            new_sha = body["content"]["sha"]
+            self.wrote(path, content, new_sha)
+            commit = body.get("commit") or {}
+            return FileResult(response.status_code, content, new_sha,
+                              commit=commit.get("sha"), tree=(commit.get("tree") or {}).get("sha"))
+        return FileResult(response.status_code)
+
+    def wrote(self, path, content, sha=None):
+        # We know the new content and SHA but not the ETag GitHub will hand
+        # out for it, so the next read is a plain GET
+        self._files[path] = CachedFile(sha=sha or blob_sha(content), content=content)
+
+    # Git Data API: read the branch head and the files in a tree, and write
+    # several files as one commit (see CommitBuilder). The Contents API above
+    # commits one file per request.
+
+    def default_branch(self):
+        if self._branch is None:
+            response = self._request("GET", f"{GITHUB_API_URL}/repos/{self.repo}")
+            if response.status_code != 200:
+                return None
+            self._branch = response.json()["default_branch"]
+        return self._branch
+
+    def get_head(self):
+        # The commit at the tip of the default branch and its tree
+        branch = self.default_branch()
+        if branch is None:
+            return CommitResult(404)
+        response = self._request("GET", self.git_url(f"ref/heads/{branch}"))
+        if response.status_code != 200:
+            return CommitResult(response.status_code)
+        commit = response.json()["object"]["sha"]
+        tree = self._trees.get(commit)
+        if tree is None:
+            response = self._request("GET", self.git_url(f"commits/{commit}"))
+            if response.status_code != 200:
+                return CommitResult(response.status_code)
+            tree = self._trees[commit] = response.json()["tree"]["sha"]
+        return CommitResult(200, commit, tree)
+
+    def get_blob(self, sha):
+        # A blob is immutable, and we only ask for ones a manifest we read
+        # from this repo lists, so another session's copy will do
+        if self.shared is not None:
+            content = self.shared.get(("content", self.repo, "blob", sha))
+            if content is not None:
+                return FileResult(200, content, sha)
+        response = self._request("GET", self.git_url(f"blobs/{sha}"))
+        if response.status_code != 200:
+            return FileResult(response.status_code)
+        return FileResult(200, self._decode("blob", response.json()), sha)
+
+    def get_tree(self, tree):
+        # {path: blob SHA} of the files at the top of a tree, None on error
+        response = self._request("GET", self.git_url(f"trees/{tree}"))
+        if response.status_code != 200:
+            return None
+        return {entry["path"]: entry["sha"] for entry in response.json()["tree"] if entry["type"] == "blob"}
+
+    def create_tree(self, base_tree, entries):
+        response = self._request("POST", self.git_url("trees"), json={"base_tree": base_tree, "tree": entries})
+        return CommitResult(response.status_code, tree=response.json()["sha"] if response.status_code == 201 else None)
+
+    def create_commit(self, message, tree, parent):
+        response = self._request("POST", self.git_url("commits"),
+                                 json={"message": message, "tree": tree, "parents": [parent]})
+        return CommitResult(response.status_code, response.json()["sha"] if response.status_code == 201 else None, tree)
+
+    def move_head(self, commit, tree):
+        # Fast-forward only: refused (422) if the branch no longer points at
+        # the new commit's parent
+        branch = self.default_branch()
+        if branch is None:
+            return CommitResult(404)
+        response = self._request("PATCH", self.git_url(f"refs/heads/{branch}"),
+                                 json={"sha": commit, "force": False})
+        if response.status_code != 200:
+            return CommitResult(response.status_code)
+        self._trees[commit] = tree
+        return CommitResult(200, commit, tree)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,194 @@
+import re
+
+# A user's task lists: their IDs and names in display order, which ones are
+# archived (kept with their tasks but hidden from the working views), and a
+# reverse index from name to ID. Each session has its own registry, loaded
+# from ToDoListNames.txt:
+#
+#   list1:Groceries
+#   !list7:Old projects
+#
+# one "id:name" line per list in display order, with "!" marking an archived
+# list. List names appear as headers in ToDoList.txt, so they are unique.
+#
+# New lists get the next "listN" ID after the highest ever used, so a deleted
+# list's ID (which other sessions or journals may still refer to) is never
+# given to another list. When that highest list has been deleted, a last
+# "#last list12" line keeps the count; it has no ":" so older versions of
+# the app skip it.
+
+# Lists a new user starts with
+DEFAULT_LIST_NAMES = {f"list{n}": f"List {n}" for n in range(1, 11)}
+
+_NUMBERED_ID = re.compile(r"list(\d+)")
+
+
+def _id_number(list_id):
+    # N of a "listN" ID, else 0
+    match = _NUMBERED_ID.fullmatch(list_id)
+    return int(match.group(1)) if match else 0
+
+
+class ListRegistry:
+    def __init__(self, names=None, archived=()):
+        self.names = {}  # list_id -> name, in display order
+        self.archived = set()
+        self._ids_by_name = {}
+        self.last_number = 0  # highest N of a "listN" ID this registry has had
+        for list_id, name in (names or {}).items():
+            self.create(name, list_id)
+        self.archived.update(list_id for list_id in archived if list_id in self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, list_id):
+        return list_id in self.names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def name(self, list_id):
+        return self.names.get(list_id, list_id)
+
+    def id_for(self, name):
+        return self._ids_by_name.get(name)
+
+    def active(self):
+        # {list_id: name} of the lists that are not archived
+        return {list_id: name for list_id, name in self.names.items() if list_id not in self.archived}
+
+    def copy(self):
+        registry = ListRegistry()
+        registry.replace_with(self)
+        return registry
+
+    def replace_with(self, other):
+        self.names = dict(other.names)
+        self.archived = set(other.archived)
+        self._ids_by_name = dict(other._ids_by_name)
+        self.last_number = other.last_number
+
+    def unused_id(self):
+        n = self.last_number + 1
+        while f"list{n}" in self.names:
+            n += 1
+        return f"list{n}"
+
+    def _saw_id(self, list_id):
+        self.last_number = max(self.last_number, _id_number(list_id))
+
+    def _check_name(self, name, list_id=None):
+        name = name.strip()
+        if not name or "\n" in name:
+            raise ValueError("A list needs a one-line name")
+        owner = self._ids_by_name.get(name)
+        if owner is not None and owner != list_id:
+            raise ValueError(f"There is already a list named {name!r}")
+        return name
+
+    def create(self, name, list_id=None):
+        # Add a list at the end and return its ID. Creating a list that
+        # exists already just renames it, so replaying a creation is harmless.
+        if list_id in self.names:
+            self.rename(list_id, name)
+            return list_id
+        list_id = list_id or self.unused_id()
+        name = self._check_name(name)
+        self.names[list_id] = name
+        self._ids_by_name[name] = list_id
+        self._saw_id(list_id)
+        return list_id
+
+    def rename(self, list_id, name):
+        name = self._check_name(name, list_id)
+        del self._ids_by_name[self.names[list_id]]
+        self.names[list_id] = name
+        self._ids_by_name[name] = list_id
+
+    def archive(self, list_id, archived=True):
+        if list_id not in self.names:
+            raise KeyError(list_id)
+        if archived:
+            self.archived.add(list_id)
+        else:
+            self.archived.discard(list_id)
+
+    def delete(self, list_id):
+        name = self.names.pop(list_id, None)
+        if name is not None:
+            del self._ids_by_name[name]
+        self.archived.discard(list_id)
+
+    def format(self):
+        lines = [f"{'!' if list_id in self.archived else ''}{list_id}:{name}"
+                 for list_id, name in self.names.items()]
+        if self.last_number > max(map(_id_number, self.names), default=0):
+            lines.append(f"#last list{self.last_number}")
+        return "\n".join(lines)
+
+    @classmethod
+    def parse(cls, text):
+        # Lines that do not parse or repeat an ID are skipped
+        registry = cls()
+        for line in text.strip().split("\n"):
+            if line.startswith("#last "):
+                registry._saw_id(line[len("#last "):].strip())
+                continue
+            if ":" not in line:
+                continue
+            list_id, name = line.split(":", 1)
+            archived = list_id.startswith("!")
+            list_id = list_id.lstrip("!").strip()
+            if not list_id or list_id in registry:
+                continue
+            for candidate in (name, list_id):  # an unusable name: keep the list under its ID
+                try:
+                    registry.create(candidate, list_id)
+                    break
+                except ValueError:
+                    continue
+            else:
+                continue
+            if archived:
+                registry.archived.add(list_id)
+        return registry
+
+
+def merge_registries(base, local, remote):
+    # Three-way merge of this session's registry (`local`) with GitHub's
+    # (`remote`), both changed since `base` (the names as last loaded or
+    # saved). Lists created on GitHub are added at the end, and renames and
+    # archiving done only on GitHub are taken; lists deleted here stay
+    # deleted. Returns the merged registry and the IDs of the lists the two
+    # sides disagree on, which need the user: renamed differently on both
+    # sides, created on both with the same ID, deleted on GitHub but kept
+    # here, or given a name the other side already uses.
+    merged = local.copy()
+    merged.last_number = max(local.last_number, remote.last_number)
+    disagreements = [list_id for list_id in base if list_id not in remote and list_id in local]
+    for list_id, name in remote.names.items():
+        if list_id not in local:
+            if list_id not in base:  # created on GitHub
+                try:
+                    merged.create(name, list_id)
+                except ValueError:
+                    disagreements.append(list_id)
+                    continue
+                if list_id in remote.archived:
+                    merged.archived.add(list_id)
+            continue
+        base_name = base.names.get(list_id)
+        if name != local.names[list_id]:
+            if local.names[list_id] != base_name:  # renamed here
+                if name != base_name:
+                    disagreements.append(list_id)
+            else:
+                try:
+                    merged.rename(list_id, name)
+                except ValueError:
+                    disagreements.append(list_id)
+        archived = list_id in remote.archived
+        if list_id in base and (list_id in base.archived) == (list_id in local.archived) != archived:
+            merged.archive(list_id, archived)
+    return merged, disagreements
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+# Last known copy of the GitHub files, so a session can render before the
+# network answers. Entries look like
+#   {"ToDoList.txt": {"content": ..., "sha": ..., "etag": ...}, ...}
+# and are keyed by a hash of (repo, token): nothing is shared between users,
+# a wrong or half-typed token simply misses, and the token is never stored.
+
+
+def cache_key(repo, token):
+    return hashlib.sha256(f"{repo}\n{token}".encode()).hexdigest()
+
+
+class DirectoryCache:
+    # Server deployments: one JSON file per key in `directory`
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def read(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, key, entry):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning("Could not write local cache: %s", e)
+
+
+class BrowserCache:
+    # shinylive: Python runs in a web worker without localStorage, so the
+    # page hands us its stored entries once at startup (`entries`) and every
+    # write is sent back to the page through `send(key, json_text)`
+
+    def __init__(self, send, entries=None):
+        self.send = send
+        self.entries = dict(entries or {})
+
+    def read(self, key):
+        text = self.entries.get(key)
+        if not text:
+            return None
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None
+
+    def write(self, key, entry):
+        text = json.dumps(entry)
+        self.entries[key] = text
+        self.send(key, text)
+
+
+# Page-side half of BrowserCache
+BROWSER_CACHE_SCRIPT = """
+$(document).on('shiny:connected', function() {
+    const prefix = 'todo-cache:';
+    const entries = {};
+    for (let i = 0; i < localStorage.length; i++) {
+        const key = localStorage.key(i);
+        if (key.startsWith(prefix)) {
+            entries[key.slice(prefix.length)] = localStorage.getItem(key);
+        }
+    }
+    Shiny.setInputValue('browser_cache', entries);
+    Shiny.addCustomMessageHandler('todo_cache_store', function(msg) {
+        try {
+            localStorage.setItem(prefix + msg.key, msg.value);
+        } catch (e) {
+            console.warn('Could not write local cache', e);
+        }
+    });
+});
+"""
@@ -0,0 +1,127 @@
+from difflib import SequenceMatcher
+
+from task_store import TaskStore
+
+
+# Three-way merge of task lists. Each list is merged independently as a
+# sequence of (task_id, title, description) items using the diff3 approach:
+# regions where base, local and remote all agree are kept, a region changed
+# on only one side takes that side, and a region changed differently on both
+# sides is a conflict the user has to decide.
+
+
+class MergeConflict:
+    __slots__ = ("list_id", "base", "local", "remote")
+
+    def __init__(self, list_id, base, local, remote):
+        self.list_id = list_id
+        self.base = base
+        self.local = local
+        self.remote = remote
+
+    def resolve(self, choice):
+        if choice == "local":
+            return list(self.local)
+        if choice == "remote":
+            return list(self.remote)
+        # "both": ours first, then whatever GitHub added that we don't have
+        return list(self.local) + [item for item in self.remote if item not in self.local]
+
+
+class MergeResult:
+    def __init__(self, chunks, tasks):
+        # {list_id: [item, ..., MergeConflict, ...]}
+        self.chunks = chunks
+        self.tasks = tasks  # item -> Task, to carry timestamps through
+        self.conflicts = [chunk for items in chunks.values() for chunk in items
+                          if isinstance(chunk, MergeConflict)]
+
+    def resolve(self, choices=None):
+        # `choices` holds "local", "remote" or "both" per conflict, in order
+        choices = list(choices or [])
+        choices += ["both"] * (len(self.conflicts) - len(choices))
+        picked = dict(zip(map(id, self.conflicts), choices))
+        lists = {}
+        for list_id, items in self.chunks.items():
+            merged = []
+            for chunk in items:
+                if isinstance(chunk, MergeConflict):
+                    merged.extend(chunk.resolve(picked[id(chunk)]))
+                else:
+                    merged.append(chunk)
+            lists[list_id] = [self.tasks[item] for item in merged]
+        # A task kept on both sides of a conflict gets a fresh ID for its copy
+        return TaskStore.from_lists(lists)
+
+
+def _items(store, list_id, tasks):
+    if list_id not in store.lists:
+        return []
+    items = []
+    for task in store.tasks(list_id):
+        item = (task.id, task.title, task.description)
+        tasks.setdefault(item, task)
+        items.append(item)
+    return items
+
+
+def _sync_regions(base, local, remote):
+    # Base ranges that match unchanged in both local and remote:
+    # (base_start, base_end, local_start, local_end, remote_start, remote_end)
+    local_matches = SequenceMatcher(None, base, local, autojunk=False).get_matching_blocks()
+    remote_matches = SequenceMatcher(None, base, remote, autojunk=False).get_matching_blocks()
+    regions = []
+    i = j = 0
+    while i < len(local_matches) and j < len(remote_matches):
+        local_base, local_start, local_len = local_matches[i]
+        remote_base, remote_start, remote_len = remote_matches[j]
+        start = max(local_base, remote_base)
+        end = min(local_base + local_len, remote_base + remote_len)
+        if start < end:
+            local_at = local_start + (start - local_base)
+            remote_at = remote_start + (start - remote_base)
+            regions.append((start, end, local_at, local_at + end - start,
+                            remote_at, remote_at + end - start))
+        if local_base + local_len < remote_base + remote_len:
+            i += 1
+        else:
+            j += 1
+    regions.append((len(base), len(base), len(local), len(local), len(remote), len(remote)))
+    return regions
+
+
+def merge_items(list_id, base, local, remote):
+    chunks = []
+    base_at = local_at = remote_at = 0
+    for base_start, base_end, local_start, local_end, remote_start, remote_end in _sync_regions(base, local, remote):
+        base_part = base[base_at:base_start]
+        local_part = local[local_at:local_start]
+        remote_part = remote[remote_at:remote_start]
+        if local_part or remote_part:
+            if local_part == remote_part:
+                chunks.extend(local_part)
+            elif local_part == base_part:
+                chunks.extend(remote_part)
+            elif remote_part == base_part:
+                chunks.extend(local_part)
+            else:
+                chunks.append(MergeConflict(list_id, base_part, local_part, remote_part))
+        chunks.extend(base[base_start:base_end])
+        base_at, local_at, remote_at = base_end, local_end, remote_end
+    return chunks
+
+
+def merge_task_lists(base, local, remote):
+    # `base`, `local` and `remote` are TaskStores
+    list_ids = list(local.lists)
+    list_ids += [list_id for list_id in remote.lists if list_id not in local.lists]
+    tasks = {}  # local records win over identical remote ones
+    return MergeResult({
+        list_id: merge_items(
+            list_id,
+            _items(base, list_id, {}),
+            _items(local, list_id, tasks),
+            _items(remote, list_id, tasks),
+        )
+        for list_id in list_ids
+    }, tasks)
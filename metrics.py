@@ -0,0 +1,197 @@
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+# Counters and timing histograms for the hot paths: GitHub calls, parsing,
+# serializing, rendering and reactive effects. Each session records into its
+# own Metrics, which passes everything on to the process-wide METRICS, so the
+# settings panel can show one user's numbers and the /metrics endpoint the
+# totals for the whole server. Recording is a lock and a few additions, cheap
+# enough to leave on.
+#
+# Metric names follow Prometheus conventions ("_total" counters, "_seconds"
+# histograms); labels are keyword arguments and must stay low-cardinality
+# (an endpoint or an effect name, never a repo or a task).
+
+# Upper bounds of the histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation (the
+        # largest observation for the +Inf bucket)
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Metrics:
+    def __init__(self, parent=None, buckets=DEFAULT_BUCKETS):
+        self.parent = parent
+        self.buckets = buckets
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        if self.parent is not None:
+            self.parent.count(name, value, **labels)
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+        if self.parent is not None:
+            self.parent.observe(name, seconds, **labels)
+
+    @contextmanager
+    def span(self, name, **labels):
+        # Time the block into the `name` histogram, exceptions included
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, **labels):
+        # Decorator: time every call of a function (sync or async) as a span
+        def decorate(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def timed_async(*args, **kwargs):
+                    with self.span(name, **labels):
+                        return await fn(*args, **kwargs)
+                return timed_async
+
+            @functools.wraps(fn)
+            def timed_sync(*args, **kwargs):
+                with self.span(name, **labels):
+                    return fn(*args, **kwargs)
+            return timed_sync
+        return decorate
+
+    def snapshot(self):
+        # (counters, histograms) as sorted lists of ((name, labels), value),
+        # copied so they can be read while recording goes on
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = []
+            for key, histogram in sorted(self.histograms.items()):
+                copy = Histogram(histogram.buckets)
+                copy.counts, copy.count = list(histogram.counts), histogram.count
+                copy.sum, copy.max = histogram.sum, histogram.max
+                histograms.append((key, copy))
+        return counters, histograms
+
+    def prometheus(self, prefix="todo_"):
+        # The Prometheus text exposition format
+        counters, histograms = self.snapshot()
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {prefix}{name} counter")
+            lines.append(f"{prefix}{name}{_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {prefix}{name} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{prefix}{name}_bucket{_labels(labels, le=repr(bound))} {cumulative}")
+            lines.append(f"{prefix}{name}_bucket{_labels(labels, le='+Inf')} {histogram.count}")
+            lines.append(f"{prefix}{name}_sum{_labels(labels)} {histogram.sum}")
+            lines.append(f"{prefix}{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+# Totals for every session in the process
+METRICS = Metrics()
+
+
+def metrics_route(path, metrics=METRICS):
+    # Starlette route serving `metrics` to a Prometheus scraper
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    async def endpoint(request):
+        return PlainTextResponse(metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
+    return Route(path, endpoint, methods=["GET"])
+
+
+# Page-side time to interactive: seconds from the start of navigation (of
+# the top page under shinylive, which runs the app in an iframe and first
+# has to boot Python) until Shiny connects and until it first goes idle with
+# every initial output rendered. Logged to the browser console and sent back
+# as the startup_timing input.
+STARTUP_TIMING_SCRIPT = """
+(function() {
+    let origin = performance.timeOrigin;
+    try {
+        origin = window.top.performance.timeOrigin;
+    } catch (e) {
+        // a cross-origin parent page: time from the app's own navigation
+    }
+    const since = function() {
+        return (performance.timeOrigin + performance.now() - origin) / 1000;
+    };
+    const timing = {};
+    $(document).on('shiny:connected', function() {
+        timing.connected = since();
+    });
+    $(document).one('shiny:idle', function() {
+        timing.interactive = since();
+        console.info('ToDo: connected after ' + timing.connected.toFixed(2) +
+                     ' s, interactive after ' + timing.interactive.toFixed(2) + ' s');
+        Shiny.setInputValue('startup_timing', timing);
+    });
+})();
+"""
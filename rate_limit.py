@@ -0,0 +1,168 @@
+import collections
+import hashlib
+import random
+import sys
+import threading
+import time
+
+# What GitHub has told us about a token's rate limits, and the gate every API
+# call for that token goes through. All sessions using the same token share
+# one RateBudget (keyed by a hash; the token itself is not kept), because
+# GitHub counts the calls per token, not per session.
+#
+# Requests have a priority. Saves (and the merges they lead to) may spend
+# the whole remaining budget, explicit loads leave a reserve for saves, and
+# the background check after showing the cached copy leaves a larger one, so
+# revalidation is the first thing to stop as the budget runs low. While GitHub has asked
+# us to wait (Retry-After, an exhausted budget or a secondary rate limit)
+# nothing is sent: a request either waits its turn on the I/O pool, most
+# urgent first, or, if the wait would be too long, fails with RateLimited
+# without spending a call.
+#
+# pressure() tells the app to fold autosaves into fewer, less frequent
+# commits before the limits are reached: when little of the hourly budget is
+# left, or when writes come quickly enough to approach the secondary limit
+# on content-creating requests.
+
+SAVE, LOAD, BACKGROUND = 0, 1, 2  # most urgent first
+
+# Share of the budget each priority leaves unspent for the more urgent ones
+RESERVES = {SAVE: 0.0, LOAD: 0.02, BACKGROUND: 0.1}
+# Longest each priority waits for its turn before giving up (never under
+# shinylive, where waiting would freeze the page)
+MAX_WAITS = {SAVE: 30.0, LOAD: 10.0, BACKGROUND: 0.0}
+if sys.platform == "emscripten":
+    MAX_WAITS = dict.fromkeys(MAX_WAITS, 0.0)
+
+# GitHub's advice for a secondary rate limit without a Retry-After
+SECONDARY_LIMIT_WAIT = 60.0
+# Under pressure below this share of the hourly budget, or at this many
+# writes in the last minute
+LOW_BUDGET_FRACTION = 0.1
+WRITE_WINDOW_SECONDS = 60.0
+WRITES_PER_WINDOW = 40
+
+# Transient failures are retried this often: a 5xx after 1 s, 2 s, 4 s ...
+# with jitter, a secondary rate limit once the budget lets it through
+MAX_RETRIES = 0 if sys.platform == "emscripten" else 3
+RETRY_BASE_SECONDS = 1.0
+
+
+class RateLimited(Exception):
+    # A request that was not sent because GitHub's rate limit would not let
+    # it through within its priority's wait
+    def __init__(self, retry_after):
+        super().__init__(f"GitHub rate limit reached, try again in {int(retry_after) + 1} s")
+        self.retry_after = retry_after
+
+
+def backoff(attempt, rng=random):
+    # Exponential backoff with jitter: between half and all of 1 s, 2 s, 4 s ...
+    return rng.uniform(0.5, 1.0) * RETRY_BASE_SECONDS * 2 ** attempt
+
+
+def is_rate_limited(status_code, headers, body=""):
+    # A 403/429 caused by a rate limit, as opposed to a bad token or missing
+    # permission
+    if status_code not in (403, 429):
+        return False
+    return (status_code == 429 or "Retry-After" in headers
+            or headers.get("X-RateLimit-Remaining") == "0" or "rate limit" in body.lower())
+
+
+class RateBudget:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.limit = None  # calls per window, once GitHub has told us
+        self.remaining = None
+        self.reset_at = None  # epoch seconds when `remaining` refills
+        self.blocked_until = 0.0  # nothing goes out before this
+        self.writes = collections.deque()  # send times of recent writes
+        self._waiting = [0] * (BACKGROUND + 1)
+        self._cond = threading.Condition()
+
+    def _delay(self, priority, now):
+        # Seconds before a request of `priority` may be sent
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.remaining is not None and self.reset_at is not None and now < self.reset_at:
+            if self.remaining <= RESERVES[priority] * (self.limit or 0):
+                return self.reset_at - now
+        return 0.0
+
+    def acquire(self, priority, write=False, max_wait=None):
+        # Block until a request of `priority` may be sent, letting more
+        # urgent ones go first; RateLimited if that would take too long
+        max_wait = MAX_WAITS[priority] if max_wait is None else max_wait
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                deadline = self.clock() + max_wait
+                while True:
+                    now = self.clock()
+                    wait = self._delay(priority, now)
+                    if not wait and not any(self._waiting[:priority]):
+                        break
+                    wait = wait or 0.05  # a more urgent request goes first
+                    if now + wait > deadline:
+                        raise RateLimited(wait)
+                    self._cond.wait(wait)
+                if self.remaining is not None:
+                    self.remaining -= 1  # until the response says otherwise
+                if write:
+                    self.writes.append(now)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def update(self, status_code, headers, body=""):
+        # Learn from a response's rate-limit headers; how long to back off
+        # if it was refused by a rate limit, else None
+        now = self.clock()
+        wait = None
+        with self._cond:
+            if "X-RateLimit-Remaining" in headers:
+                try:
+                    self.limit = int(headers.get("X-RateLimit-Limit", self.limit or 0)) or None
+                    self.remaining = int(headers["X-RateLimit-Remaining"])
+                    self.reset_at = float(headers.get("X-RateLimit-Reset", now))
+                except ValueError:
+                    pass
+            if is_rate_limited(status_code, headers, body):
+                if "Retry-After" in headers:
+                    try:
+                        wait = float(headers["Retry-After"])
+                    except ValueError:
+                        wait = SECONDARY_LIMIT_WAIT
+                elif self.remaining == 0 and self.reset_at is not None:
+                    wait = max(0.0, self.reset_at - now)
+                else:
+                    wait = SECONDARY_LIMIT_WAIT
+                self.blocked_until = max(self.blocked_until, now + wait)
+            self._cond.notify_all()
+        return wait
+
+    def pressure(self):
+        # Whether saves should be spaced out to stay within the limits
+        now = self.clock()
+        with self._cond:
+            while self.writes and self.writes[0] < now - WRITE_WINDOW_SECONDS:
+                self.writes.popleft()
+            if now < self.blocked_until or len(self.writes) >= WRITES_PER_WINDOW:
+                return True
+            return (self.remaining is not None and self.limit is not None
+                    and self.remaining < self.limit * LOW_BUDGET_FRACTION)
+
+
+_budgets = {}
+_budgets_lock = threading.Lock()
+
+
+def budget_for(token):
+    # The shared RateBudget of a token
+    key = hashlib.sha256(token.encode()).hexdigest()
+    with _budgets_lock:
+        budget = _budgets.get(key)
+        if budget is None:
+            budget = _budgets[key] = RateBudget()
+        return budget
@@ -0,0 +1,55 @@
+import time
+
+
+class SaveScheduler:
+    # Debounces autosave. Every mutation calls mark_dirty(); a save becomes
+    # due once no further mutation has arrived for `quiet_seconds`, or once
+    # `max_delay_seconds` have passed since the first unsaved mutation, so a
+    # steady stream of edits still gets written out. take() hands back how
+    # many mutations were folded into the save and resets the window.
+    # defer() holds the next save back, e.g. until a rate limit resets.
+
+    def __init__(self, quiet_seconds=2.0, max_delay_seconds=10.0, clock=time.monotonic):
+        self.quiet_seconds = quiet_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.clock = clock
+        self.pending = 0
+        self._first_change = None
+        self._last_change = None
+        self._not_before = None
+
+    def mark_dirty(self):
+        now = self.clock()
+        if self._first_change is None:
+            self._first_change = now
+        self._last_change = now
+        self.pending += 1
+
+    def seconds_until_due(self):
+        # None when there is nothing to save, otherwise seconds to wait
+        # (0 means the save is due now)
+        if self._first_change is None:
+            return None
+        due_at = min(self._last_change + self.quiet_seconds,
+                     self._first_change + self.max_delay_seconds)
+        if self._not_before is not None:
+            due_at = max(due_at, self._not_before)
+        return max(0.0, due_at - self.clock())
+
+    def due(self):
+        return self.seconds_until_due() == 0.0
+
+    def defer(self, seconds):
+        # A save is still needed, but not for another `seconds`
+        now = self.clock()
+        if self._first_change is None:
+            self._first_change = self._last_change = now
+        self._not_before = now + seconds
+
+    def take(self):
+        folded = self.pending
+        self.pending = 0
+        self._first_change = None
+        self._last_change = None
+        self._not_before = None
+        return folded
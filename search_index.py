@@ -0,0 +1,249 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+
+# In-memory full-text index over task titles and descriptions in all lists.
+# It maps each word to the tasks containing it (weighted: a word in the title
+# counts for more than one in the description) and is kept up to date from
+# the same change tuples as the change journal (see change_journal.py), so an
+# add, edit or delete only re-indexes that task. When the lists are replaced
+# wholesale (a load or a merge) the index is marked stale and rebuilt by the
+# next search.
+#
+# A query matches tasks containing every query word, each as a whole word, a
+# word prefix or (for longer words without digits) a word one typo away.
+# Typos are found through an index of each word with one letter deleted, so
+# no query scans the whole vocabulary, and results are scored best-first so a
+# query matching most tasks stops once nothing left can make the top results.
+
+_WORD = re.compile(r"\w+")
+
+TITLE_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+# Relative worth of a whole-word, prefix and one-typo match
+EXACT_MATCH = 3
+PREFIX_MATCH = 2
+FUZZY_MATCH = 1
+# Shortest query word matched by prefix, and shortest word matched with a typo
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 4
+
+
+def words(text):
+    return _WORD.findall(text.casefold())
+
+
+def _deletions(word):
+    # The word with each one of its letters left out
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _fuzzy(word):
+    # Whether typos are looked for in this word: numbers and short words
+    # would mostly match unrelated ones
+    return len(word) >= MIN_FUZZY_LENGTH and not any(c.isdigit() for c in word)
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = {}  # word -> {task_id: weight}
+        self.task_words = {}  # task_id -> {word: weight}
+        self.vocabulary = []  # sorted, for prefix lookups
+        self.near = {}  # word with a letter deleted (or the word) -> {word}
+        self.in_titles = {}  # word -> number of tasks with it in the title
+        self.stale = True
+
+    def __len__(self):
+        return len(self.task_words)
+
+    def rebuild(self, store):
+        # Same result as add() for every task, with the word lists built
+        # once at the end rather than a word at a time
+        self.__init__()
+        postings = self.postings
+        for tasks in store.lists.values():
+            for task in tasks:
+                weights = self._weights(task.title, task.description)
+                self.task_words[task.id] = weights
+                for word, weight in weights.items():
+                    posting = postings.get(word)
+                    if posting is None:
+                        posting = postings[word] = {}
+                    posting[task.id] = weight
+                    if weight == TITLE_WEIGHT:
+                        self.in_titles[word] = self.in_titles.get(word, 0) + 1
+        self.vocabulary = sorted(postings)
+        for word in self.vocabulary:
+            if _fuzzy(word):
+                for variant in _deletions(word) | {word}:
+                    self.near.setdefault(variant, set()).add(word)
+        self.stale = False
+
+    @staticmethod
+    def _weights(title, description):
+        weights = dict.fromkeys(words(description), DESCRIPTION_WEIGHT)
+        weights.update(dict.fromkeys(words(title), TITLE_WEIGHT))
+        return weights
+
+    def add(self, task_id, title, description):
+        if task_id in self.task_words:
+            self.remove(task_id)
+        weights = self._weights(title, description)
+        self.task_words[task_id] = weights
+        for word, weight in weights.items():
+            posting = self.postings.get(word)
+            if posting is None:
+                posting = self.postings[word] = {}
+                self._add_word(word)
+            posting[task_id] = weight
+            if weight == TITLE_WEIGHT:
+                self.in_titles[word] = self.in_titles.get(word, 0) + 1
+
+    def remove(self, task_id):
+        for word in self.task_words.pop(task_id, ()):
+            posting = self.postings[word]
+            if posting.pop(task_id) == TITLE_WEIGHT:
+                count = self.in_titles[word] - 1
+                if count:
+                    self.in_titles[word] = count
+                else:
+                    del self.in_titles[word]
+            if not posting:
+                del self.postings[word]
+                self._remove_word(word)
+
+    def _add_word(self, word):
+        insort(self.vocabulary, word)
+        if _fuzzy(word):
+            for variant in _deletions(word) | {word}:
+                self.near.setdefault(variant, set()).add(word)
+
+    def _remove_word(self, word):
+        del self.vocabulary[bisect_left(self.vocabulary, word)]
+        if _fuzzy(word):
+            for variant in _deletions(word) | {word}:
+                similar = self.near[variant]
+                similar.discard(word)
+                if not similar:
+                    del self.near[variant]
+
+    def _best_weight(self, word):
+        return TITLE_WEIGHT if word in self.in_titles else DESCRIPTION_WEIGHT
+
+    def apply(self, op):
+        # Follow one change tuple; changes that only move tasks or rename,
+        # create or archive lists leave the text alone
+        if self.stale:
+            return
+        kind = op[0]
+        if kind == "add":
+            _, _, _, task_id, title, desc, _ = op
+            self.add(task_id, title, desc)
+        elif kind == "edit":
+            _, task_id, title, desc, _ = op
+            self.add(task_id, title, desc)
+        elif kind == "delete":
+            self.remove(op[1])
+        elif kind == "batch":
+            for batch_op in op[1]:
+                self.apply(batch_op)
+        elif kind == "delete_list":
+            self.stale = True  # its tasks are gone; rebuilt by the next search
+
+    def matches(self, term):
+        # {word: match score} for the indexed words a query word matches
+        found = {}
+        if _fuzzy(term):
+            for variant in _deletions(term) | {term}:
+                for word in self.near.get(variant, ()):
+                    found[word] = FUZZY_MATCH
+        if len(term) >= MIN_PREFIX_LENGTH:
+            i = bisect_left(self.vocabulary, term)
+            while i < len(self.vocabulary) and self.vocabulary[i].startswith(term):
+                found[self.vocabulary[i]] = PREFIX_MATCH
+                i += 1
+        if term in self.postings:
+            found[term] = EXACT_MATCH
+        return found
+
+    def search(self, query, store, limit=50):
+        # [(task, position in its list)] for the best `limit` tasks matching
+        # every word of `query`, best first and equal scores in list order.
+        # Among equal scores the tasks indexed first make the cut.
+        if self.stale:
+            self.rebuild(store)
+        terms = list(dict.fromkeys(words(query)))
+        if not terms:
+            return []
+        per_term = []
+        for term in terms:
+            found = self.matches(term)
+            if not found:
+                return []
+            per_term.append((sum(len(self.postings[word]) for word in found), found))
+        per_term.sort(key=lambda item: item[0])
+
+        # Go through the tasks matching the rarest word, best match first,
+        # and score each against the other words. Tasks matching the rarest
+        # word equally well can gain at most `others_best` from the rest, so
+        # once the top results reach that, the remaining tasks cannot beat
+        # them.
+        first = per_term[0][1]
+        others = [found for _, found in per_term[1:]]
+        others_best = sum(max(match * self._best_weight(word) for word, match in found.items())
+                          for found in others)
+        passes = sorted(
+            ((match * weight, word, weight)
+             for word, match in first.items()
+             for weight in (TITLE_WEIGHT, DESCRIPTION_WEIGHT)
+             if weight <= self._best_weight(word)),
+            key=lambda item: -item[0],
+        )
+        scored = set()
+        top = []  # min-heap of (score, order found, task_id)
+        found_count = 0
+        for first_score, word, pass_weight in passes:
+            if len(top) == limit and top[0][0] >= first_score + others_best:
+                break  # ties go to the tasks found first
+            for task_id, weight in self.postings[word].items():
+                if weight != pass_weight:
+                    continue
+                if len(top) == limit and top[0][0] >= first_score + others_best:
+                    break
+                if task_id in scored:
+                    continue  # matched the rarest word twice; the best came first
+                scored.add(task_id)
+                score = first_score
+                weights = self.task_words[task_id]
+                for found in others:
+                    best = 0
+                    if len(found) < len(weights):
+                        for word, match in found.items():
+                            weight = weights.get(word)
+                            if weight is not None and match * weight > best:
+                                best = match * weight
+                    else:
+                        for word, weight in weights.items():
+                            match = found.get(word)
+                            if match is not None and match * weight > best:
+                                best = match * weight
+                    if not best:
+                        break
+                    score += best
+                else:
+                    found_count += 1
+                    entry = (score, -found_count, task_id)
+                    if len(top) < limit:
+                        heapq.heappush(top, entry)
+                    elif entry > top[0]:
+                        heapq.heapreplace(top, entry)
+
+        list_order = {list_id: n for n, list_id in enumerate(store.lists)}
+        results = []
+        for score, _, task_id in top:
+            task = store.get(task_id)
+            if task is not None:
+                position = store.position(task)
+                results.append((-score, list_order[task.list_id], position, task))
+        results.sort(key=lambda item: item[:3])
+        return [(task, position) for _, _, position, task in results]
@@ -0,0 +1,238 @@
+from datetime import datetime, timezone
+
+from github_client import MAX_COMMIT_ATTEMPTS, CommitBuilder, blob_sha
+from task_store import TaskStore
+from todo_format import iter_tasks
+
+
+# One-file-per-list storage layout, the alternative to a single ToDoList.txt:
+#
+#   ToDoLists/manifest.txt   metadata block, then "list_id blob_sha" per list
+#   ToDoLists/list1.txt      the list's "=== name ===" block, as in ToDoList.txt
+#
+# The manifest records the git blob SHA of every list file, so comparing two
+# manifests tells which lists changed without fetching any of them. A save
+# writes only the lists whose text changed, plus the manifest, as a single
+# commit through the Git Data API, and the branch only moves if nobody else
+# committed in the meantime. If someone did, only the lists we are writing are
+# checked against theirs: edits to other lists are not a conflict and are
+# merged in after the save.
+
+SHARD_DIR = "ToDoLists"
+MANIFEST_PATH = f"{SHARD_DIR}/manifest.txt"
+
+
+def list_path(list_id):
+    return f"{SHARD_DIR}/{list_id}.txt"
+
+
+def format_manifest(timestamp, shas):
+    lines = [f"{list_id} {sha}\n" for list_id, sha in shas.items()]
+    return f"--- METADATA ---\nLast updated: {timestamp}\n--- END METADATA ---\n\n" + "".join(lines)
+
+
+def parse_manifest(text):
+    # (timestamp, {list_id: blob SHA}); unreadable lines are skipped
+    timestamp = ""
+    shas = {}
+    for line in text.split("\n"):
+        if line.startswith("Last updated: "):
+            timestamp = line[len("Last updated: "):].strip()
+            continue
+        fields = line.split()
+        if len(fields) == 2 and len(fields[1]) == 40 and fields[0] not in shas:
+            shas[fields[0]] = fields[1]
+    return timestamp, shas
+
+
+def parse_list_file(list_id, text, errors=None):
+    # The file's header names the list, but its tasks belong to `list_id`
+    # whatever the header says
+    header = text.split("\n", 1)[0].strip()
+    name = header.strip("= ") if header.startswith("===") and header.endswith("===") else ""
+    return list(iter_tasks(text, {list_id: name}, errors))
+
+
+def parse_lists(texts, list_names, errors=None, parse_file=parse_list_file):
+    # TaskStore from {list_id: file text}, with every list in `list_names`
+    # (lists that are not are skipped, as in parse_task_lists)
+    lists = {list_id: [] for list_id in list_names}
+    for list_id, text in texts.items():
+        if list_id in lists:
+            lists[list_id] = parse_file(list_id, text, errors)
+    return TaskStore.from_lists(lists)
+
+
+class ShardedBase:
+    # The GitHub commit our lists are based on: its commit and tree SHAs, its
+    # manifest, and the text (and blob SHA) of each list as we last read or
+    # wrote it. A list whose manifest SHA differs from ours changed on GitHub
+    # after we read it.
+
+    def __init__(self, commit=None, tree=None, timestamp="", manifest=None, texts=None, shas=None):
+        self.commit = commit
+        self.tree = tree
+        self.timestamp = timestamp
+        self.manifest = dict(manifest or {})
+        self.texts = dict(texts or {})
+        self.shas = dict(shas or {})
+
+    def copy(self):
+        return ShardedBase(self.commit, self.tree, self.timestamp, self.manifest, self.texts, self.shas)
+
+    def replace_with(self, other):
+        self.__init__(other.commit, other.tree, other.timestamp, other.manifest, other.texts, other.shas)
+
+    def behind(self, list_ids=None):
+        # Lists (of `list_ids`, default all) changed on GitHub since we read them
+        if list_ids is None:
+            list_ids = self.manifest.keys() | self.shas.keys()
+        return [list_id for list_id in list_ids if self.manifest.get(list_id) != self.shas.get(list_id)]
+
+    def to_json(self):
+        return {"commit": self.commit, "tree": self.tree, "timestamp": self.timestamp,
+                "manifest": self.manifest, "texts": self.texts, "shas": self.shas}
+
+    @classmethod
+    def from_json(cls, entry):
+        return cls(entry.get("commit"), entry.get("tree"), entry.get("timestamp", ""),
+                   entry.get("manifest"), entry.get("texts"), entry.get("shas"))
+
+
+class ShardedResult:
+    # Outcome of reading or writing the list files. `base` is the state it
+    # leaves us on; `conflicts` the lists that changed on both sides; `behind`
+    # the lists someone else changed that still need merging in. A read with
+    # no manifest yet carries the ToDoList.txt read in `legacy`.
+    def __init__(self, status_code, base=None, not_modified=False, conflicts=(), behind=()):
+        self.status_code = status_code
+        self.base = base
+        self.not_modified = not_modified
+        self.conflicts = list(conflicts)
+        self.behind = list(behind)
+        self.legacy = None
+
+    @property
+    def ok(self):
+        return self.status_code in (200, 201, 304)
+
+    @property
+    def conflict(self):
+        return self.status_code in (409, 422)
+
+
+def _read_manifest(client, head):
+    # {list_id: blob SHA} at the head commit; empty if there is no manifest
+    # yet, None if it could not be read
+    response = client.get_file(MANIFEST_PATH, ref=head.commit)
+    if response.status_code == 404:
+        return "", {}
+    if not response.ok:
+        return None
+    return parse_manifest(response.content)
+
+
+def fetch_lists(client, base):
+    # Runs on the I/O pool. A new base for the head commit, fetching only the
+    # list files whose blob SHA differs from ours. 404 when the repo has no
+    # list files yet.
+    head = client.get_head()
+    if not head.ok:
+        return ShardedResult(head.status_code)
+    if head.commit == base.commit:
+        if not base.behind():
+            return ShardedResult(304, base.copy(), not_modified=True)
+        timestamp, manifest = base.timestamp, base.manifest
+    else:
+        read = _read_manifest(client, head)
+        if read is None:
+            return ShardedResult(500)
+        timestamp, manifest = read
+        if not manifest:
+            return ShardedResult(404, ShardedBase(head.commit, head.tree))
+
+    new_base = ShardedBase(head.commit, head.tree, timestamp, manifest)
+    for list_id, sha in manifest.items():
+        if base.shas.get(list_id) == sha:
+            new_base.texts[list_id] = base.texts[list_id]
+        else:
+            response = client.get_blob(sha)
+            if not response.ok:
+                return ShardedResult(response.status_code)
+            new_base.texts[list_id] = response.content
+        new_base.shas[list_id] = sha
+    return ShardedResult(200, new_base)
+
+
+def push_lists(client, base, texts, message, force=False, extra_files=None, removed=()):
+    # Runs on the I/O pool. Commit the lists in `texts` ({list_id: file
+    # text}, in display order) whose text differs from `base`, and delete
+    # the files of the lists in `removed` (the ones this session deleted),
+    # together with `extra_files` ({path: text}, last writer wins). A list
+    # that is in neither stays as it is on GitHub: someone else created it.
+    # `base` is updated in place once the commit lands. With `force` our
+    # version of every list in `texts` wins.
+    changed = {list_id: text for list_id, text in texts.items() if base.texts.get(list_id) != text}
+    removed = [list_id for list_id in removed
+               if list_id not in texts and (list_id in base.texts or list_id in base.manifest)]
+    if base.commit and not changed and not removed and not force and not extra_files:
+        return ShardedResult(200, base)
+
+    parent, tree, manifest = base.commit, base.tree, base.manifest
+    # Our base is the head as far as we know, unless we have never read it or
+    # someone else changed a list we are about to write
+    check = force or parent is None or base.behind([*changed, *removed])
+    for _ in range(MAX_COMMIT_ATTEMPTS):
+        if check:
+            head = client.get_head()
+            if not head.ok:
+                return ShardedResult(head.status_code)
+            if head.commit != parent:
+                read = _read_manifest(client, head)
+                if read is None:
+                    return ShardedResult(500)
+                parent, tree, manifest = head.commit, head.tree, read[1]
+            if force:
+                changed = {list_id: text for list_id, text in texts.items()
+                           if blob_sha(text) != manifest.get(list_id)}
+            else:
+                conflicts = [list_id for list_id in [*changed, *removed]
+                             if manifest.get(list_id) != base.shas.get(list_id)]
+                if conflicts:
+                    return ShardedResult(409, conflicts=conflicts)
+
+        written = {list_id: blob_sha(text) for list_id, text in changed.items()}
+        shas = {}
+        for list_id in texts:
+            sha = written.get(list_id) or manifest.get(list_id)
+            if sha:
+                shas[list_id] = sha
+        # Lists only GitHub has (added by someone else) stay
+        for list_id, sha in manifest.items():
+            if list_id not in shas and list_id not in removed and list_id not in texts:
+                shas[list_id] = sha
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+        commit = CommitBuilder(client, parent, tree)
+        for list_id, text in changed.items():
+            commit.write(list_path(list_id), text)
+        for list_id in removed:
+            if list_id in manifest:
+                commit.delete(list_path(list_id))
+        for path, text in (extra_files or {}).items():
+            commit.write(path, text)
+        commit.write(MANIFEST_PATH, format_manifest(timestamp, shas))
+        response = commit.commit(message)
+        if response.ok:
+            base.commit, base.tree, base.timestamp, base.manifest = response.commit, response.tree, timestamp, shas
+            base.texts.update(changed)
+            base.shas.update(written)
+            for list_id in removed:
+                base.texts.pop(list_id, None)
+                base.shas.pop(list_id, None)
+            return ShardedResult(201, base, behind=base.behind())
+        if not response.conflict:
+            return ShardedResult(response.status_code)
+        client.metrics.count("github_commit_retries_total")
+        check = True  # the branch moved under us
+    return ShardedResult(409)
@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from metrics import METRICS
+
+
+# What every session in a server process can share: decoded GitHub files and
+# the task lists parsed from them, least recently used first out once the
+# cache holds more than `max_bytes` (approximately) or `max_entries` entries.
+#
+# Nothing in here is a secret or grants access to anything. Entries are
+# keyed by content (a git blob SHA, plus the repo and path it came from), and
+# a session only looks one up after GitHub has answered its own request,
+# made with its own token, with that SHA: the cache saves decoding and
+# parsing, never the permission check. ETags are shared the same way, so a
+# session's first read of a file another user already fetched can be a
+# conditional GET, answered with a free 304 only if GitHub lets this token
+# read the file.
+#
+# Concurrent GETs are coalesced with coalesce(): callers with the same key
+# wait for the one request in flight and all get its result. Clients put
+# the token's hash in their keys, so only sessions using the same token
+# share a response.
+
+# Rough bytes per parsed task on top of its text (the Task record, its ID
+# and its place in the list index)
+TASK_OVERHEAD_BYTES = 200
+
+
+class SharedCache:
+    def __init__(self, max_bytes=64 * 2**20, max_entries=1024, metrics=METRICS):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.metrics = metrics
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._flights = {}  # key -> Future of the call in flight
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def get(self, key):
+        # The value, or None; a hit makes the entry the most recently used
+        value = self._lookup(key)
+        self.metrics.count("shared_cache_lookups_total", kind=key[0], result="miss" if value is None else "hit")
+        return value
+
+    def put(self, key, value, size):
+        # Values larger than the whole cache are not kept
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            evicted = 0
+            while self.bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                evicted += 1
+        if evicted:
+            self.metrics.count("shared_cache_evictions_total", evicted)
+
+    def coalesce(self, key, fn, *args):
+        # fn(*args), unless a call with the same key is already running, in
+        # which case its result (or exception) is returned instead
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+        if not leader:
+            self.metrics.count("shared_cache_coalesced_total", kind=key[0])
+            return flight.result()
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def parsed(self, key, parse, text, errors=None):
+        # parse(text, errors), shared by everyone asking for the same key.
+        # The cached result must never change, so each caller gets its own
+        # copy of it: a TaskStore copy shares everything until it is changed
+        # (see task_store.py), and a list of Task records is copied shallowly.
+        # The errors of the original parse are reported to every caller.
+        entry = self.get(key)
+        if entry is None:
+            entry = self.coalesce(key, self._parse, key, parse, text)
+        value, parse_errors = entry
+        if errors is not None:
+            errors.extend(parse_errors)
+        return value.copy()
+
+    def _parse(self, key, parse, text):
+        # Someone may have finished the same parse since our lookup
+        entry = self._lookup(key)
+        if entry is None:
+            errors = []
+            value = parse(text, errors)
+            entry = (value, errors)
+            self.put(key, entry, len(text) + len(value) * TASK_OVERHEAD_BYTES)
+        return entry
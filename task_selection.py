@@ -0,0 +1,87 @@
+# The set of selected tasks, by task ID. A TaskSelection is never changed in
+# place: every operation returns a new one, so it can sit in a reactive.value
+# and two versions can be compared with selection_delta() to tell the page which rows
+# to mark or unmark. IDs are kept in the order they were selected, which is
+# the order bulk moves append them in.
+
+
+class TaskSelection:
+    __slots__ = ("ids", "anchor")
+
+    def __init__(self, ids=(), anchor=None):
+        self.ids = dict.fromkeys(ids)  # ordered set
+        self.anchor = anchor  # task a shift-click extends from
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __bool__(self):
+        return bool(self.ids)
+
+    def __contains__(self, task_id):
+        return task_id in self.ids
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def only(self, task_id):
+        # Plain click: select just this task, or nothing if it already was
+        if list(self.ids) == [task_id]:
+            return TaskSelection()
+        return TaskSelection([task_id], task_id)
+
+    def toggle(self, task_id):
+        ids = dict(self.ids)
+        if ids.pop(task_id, False) is False:
+            ids[task_id] = None
+        return TaskSelection(ids, task_id)
+
+    def extend_to(self, store, task_id, keep=False):
+        # Shift-click: select every task between the anchor and `task_id`.
+        # A range only spans one list; from an anchor in another list (or
+        # none) it is a single task.
+        task = store.get(task_id)
+        anchor = store.get(self.anchor)
+        if task is None:
+            return self
+        if anchor is None or anchor.list_id != task.list_id:
+            return self.toggle(task_id) if keep else self.only(task_id)
+        first, last = sorted((store.position(anchor), store.position(task)))
+        span = [t.id for t in store.tasks(task.list_id)[first:last + 1]]
+        ids = list(self.ids) + span if keep else span
+        return TaskSelection(ids, self.anchor)
+
+    def with_tasks(self, task_ids):
+        ids = list(self.ids)
+        ids.extend(task_ids)
+        return TaskSelection(ids, self.anchor)
+
+    def pruned(self, store):
+        # Drop tasks that are gone; the same selection if none are
+        if all(task_id in store for task_id in self.ids):
+            return self
+        kept = [task_id for task_id in self.ids if task_id in store]
+        anchor = self.anchor if self.anchor in store else None
+        return TaskSelection(kept, anchor)
+
+    def tasks(self, store):
+        # Selected task records in selection order
+        selected = (store.get(task_id) for task_id in self.ids)
+        return [task for task in selected if task is not None]
+
+
+def matching_tasks(tasks, text):
+    # Tasks whose title or description contains `text` (case-insensitive);
+    # all of them for an empty filter
+    text = text.strip().casefold()
+    if not text:
+        return list(tasks)
+    return [task for task in tasks
+            if text in task.title.casefold() or text in task.description.casefold()]
+
+
+def selection_delta(old, new):
+    # (added, removed) task IDs between two selections
+    added = [task_id for task_id in new.ids if task_id not in old.ids]
+    removed = [task_id for task_id in old.ids if task_id not in new.ids]
+    return added, removed
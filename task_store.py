@@ -0,0 +1,447 @@
+import hashlib
+import itertools
+import secrets
+import time
+from bisect import bisect_left
+
+
+# Task records and the per-session store that holds them. A Task is never
+# changed once it is in a store: edits, moves and renumbering put a new record
+# in its place (see Task.replace), so a Task can be held on to, cached or
+# compared by identity safely.
+
+
+class Task:
+    __slots__ = ("id", "list_id", "title", "description", "created", "updated", "order")
+
+    def __init__(self, id, list_id, title, description="", created=0, updated=0, order=0.0):
+        self.id = id
+        self.list_id = list_id
+        self.title = title
+        self.description = description
+        self.created = created  # Unix seconds, 0 when unknown
+        self.updated = updated
+        self.order = order  # sort key within the list
+
+    def replace(self, **changes):
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Task(**fields)
+
+    def __repr__(self):
+        return f"Task({self.id!r}, {self.list_id!r}, {self.title!r})"
+
+
+def new_task_id():
+    return secrets.token_hex(6)
+
+
+def content_task_id(list_id, title, occurrence):
+    # Stable ID for tasks from files written before tasks carried one: the
+    # same file always yields the same IDs, whichever session parses it
+    key = f"{list_id}\0{title}\0{occurrence}".encode()
+    return hashlib.sha1(key).hexdigest()[:12]
+
+
+def now_timestamp():
+    return int(time.time())
+
+
+def _order_key(task):
+    return task.order
+
+
+# Keys a list can be sorted by in a batch ("sort", list_id, key, reverse)
+SORT_KEYS = {
+    "title": lambda task: task.title.casefold(),
+    "created": lambda task: task.created,
+    "updated": lambda task: task.updated,
+}
+
+
+class TaskStore:
+    # Ordered task lists, each with its own index by task ID. Each list is
+    # kept sorted by its tasks' `order` keys, so finding a task's position is
+    # a binary search and inserting between two tasks only picks a key
+    # between theirs (the list is renumbered in the rare case the keys run
+    # out of room).
+    #
+    # Stores are copy-on-write: copy() only copies the two small dicts of
+    # lists and shares every list with the original, and the first change to
+    # a list in either store gives that store its own copy of the list and
+    # its index. A list that is shared is never changed, so comparing
+    # `old.tasks(list_id) is new.tasks(list_id)` tells whether a list changed
+    # between two versions.
+    #
+    # Which list each task is in is kept in a task -> list map, so finding a
+    # task is a lookup or two whatever the number of lists. The map is
+    # copy-on-write too: a copy shares it until either store first moves,
+    # adds or removes a task, which gives that store a map of its own.
+
+    def __init__(self, list_ids=()):
+        self.lists = {list_id: [] for list_id in list_ids}
+        self.indexes = {list_id: {} for list_id in self.lists}
+        self._owned = set(self.lists)  # lists this store may change in place
+        self._homes = {}  # task_id -> list_id
+        self._homes_owned = True  # whether _homes may be changed in place
+
+    @classmethod
+    def from_lists(cls, lists):
+        # Build a store from {list_id: [Task, ...]} in display order. Tasks
+        # are re-keyed where needed, and a repeated ID gets a fresh one.
+        store = cls(lists)
+        seen = set()
+        for list_id, tasks in lists.items():
+            target = store.lists[list_id]
+            index = store.indexes[list_id]
+            for n, task in enumerate(tasks):
+                task_id = task.id
+                if task_id in seen:
+                    task_id = store.unused_id()
+                if task.id != task_id or task.list_id != list_id or task.order != n:
+                    task = task.replace(id=task_id, list_id=list_id, order=float(n))
+                target.append(task)
+                index[task_id] = task
+                seen.add(task_id)
+        store._homes = {task_id: task.list_id for index in store.indexes.values()
+                              for task_id, task in index.items()}
+        return store
+
+    def copy(self):
+        store = TaskStore()
+        store.lists = dict(self.lists)
+        store.indexes = dict(self.indexes)
+        store._homes = self._homes
+        # Everything is shared now, so neither side may write in place
+        self._owned = set()
+        self._homes_owned = store._homes_owned = False
+        return store
+
+    def _writable_homes(self):
+        # The task -> list map, to record a change to this store in it
+        if not self._homes_owned:
+            self._homes = dict(self._homes)
+            self._homes_owned = True
+        return self._homes
+
+    def _left(self, homes, task_id, list_id):
+        # `task_id` is no longer in `list_id` (it may have arrived elsewhere)
+        if homes.get(task_id) == list_id:
+            del homes[task_id]
+
+    def _writable(self, list_id):
+        tasks = self.lists[list_id]
+        if list_id not in self._owned:
+            tasks = self.lists[list_id] = list(tasks)
+            self.indexes[list_id] = dict(self.indexes[list_id])
+            self._owned.add(list_id)
+        return tasks, self.indexes[list_id]
+
+    def __len__(self):
+        return sum(len(index) for index in self.indexes.values())
+
+    def __contains__(self, task_id):
+        return self.get(task_id) is not None
+
+    def get(self, task_id):
+        list_id = self._homes.get(task_id)
+        if list_id is None:
+            return None
+        return self.indexes[list_id].get(task_id)
+
+    def _require(self, task_id):
+        task = self.get(task_id)
+        if task is None:
+            raise KeyError(task_id)
+        return task
+
+    def tasks(self, list_id):
+        return self.lists[list_id]
+
+    def position(self, task):
+        return bisect_left(self.lists[task.list_id], task.order, key=_order_key)
+
+    def add_list(self, list_id):
+        # A new, empty list (kept as is if it exists already)
+        if list_id not in self.lists:
+            self.lists[list_id] = []
+            self.indexes[list_id] = {}
+            self._owned.add(list_id)
+
+    def drop_list(self, list_id):
+        # Remove a list and its tasks, returning the tasks
+        tasks = self.lists.pop(list_id, [])
+        homes = self._writable_homes()
+        for task in tasks:
+            self._left(homes, task.id, list_id)
+        self.indexes.pop(list_id, None)
+        self._owned.discard(list_id)
+        return tasks
+
+    def unused_id(self):
+        task_id = new_task_id()
+        while task_id in self:
+            task_id = new_task_id()
+        return task_id
+
+    def _order_at(self, tasks, index):
+        if not tasks:
+            return 0.0
+        if index == 0:
+            return tasks[0].order - 1
+        if index == len(tasks):
+            return tasks[-1].order + 1
+        low, high = tasks[index - 1].order, tasks[index].order
+        middle = (low + high) / 2
+        return middle if low < middle < high else None
+
+    def _renumber(self, list_id):
+        tasks, task_index = self._writable(list_id)
+        for n, task in enumerate(tasks):
+            task = task.replace(order=float(n))
+            tasks[n] = task
+            task_index[task.id] = task
+
+    def insert(self, list_id, index, task):
+        # Put `task` at `index` in `list_id` (clamped; -1 appends)
+        if task.id in self:
+            raise ValueError(f"Duplicate task id: {task.id}")
+        tasks, task_index = self._writable(list_id)
+        index = len(tasks) if index < 0 else min(index, len(tasks))
+        order = self._order_at(tasks, index)
+        if order is None:
+            self._renumber(list_id)
+            order = self._order_at(tasks, index)
+        task = task.replace(list_id=list_id, order=order)
+        tasks.insert(index, task)
+        task_index[task.id] = task
+        self._writable_homes()[task.id] = list_id
+        return task
+
+    def add(self, list_id, index, title, description="", task_id=None, now=None):
+        now = now_timestamp() if now is None else now
+        task = Task(task_id or self.unused_id(), list_id, title, description, now, now)
+        return self.insert(list_id, index, task)
+
+    def update(self, task_id, title, description, now=None):
+        task = self._require(task_id)
+        new_task = task.replace(
+            title=title,
+            description=description,
+            updated=now_timestamp() if now is None else now,
+        )
+        tasks, task_index = self._writable(task.list_id)
+        tasks[self.position(task)] = new_task
+        task_index[task_id] = new_task
+        return new_task
+
+    def remove(self, task_id):
+        task = self._require(task_id)
+        tasks, task_index = self._writable(task.list_id)
+        tasks.pop(self.position(task))
+        del task_index[task_id]
+        self._left(self._writable_homes(), task_id, task.list_id)
+        return task
+
+    def move(self, task_id, list_id, index):
+        if list_id not in self.lists:
+            raise KeyError(list_id)
+        task = self.remove(task_id)
+        return self.insert(list_id, index, task)
+
+    def apply_batch(self, ops):
+        # Apply a sequence of changes in one pass over each list they touch,
+        # rather than one list shift per change. Takes the change tuples of
+        # change_journal.py ("add", "edit", "delete", "move") plus
+        # ("sort", list_id, key, reverse) with a key from SORT_KEYS.
+        #
+        # Tasks added or moved by the batch are taken out first and dropped
+        # into place when their list is rebuilt: an index counts the target
+        # list's remaining tasks, and tasks given the same index keep batch
+        # order (so moving several tasks to index 0 puts them on top in that
+        # order). A sort rebuilds its list straight away, so later changes
+        # see the sorted order. Unknown tasks or lists raise KeyError and a
+        # duplicate new task ID raises ValueError, as the single changes do;
+        # lists rebuilt before that point keep their changes.
+        removed = {}  # list_id -> IDs leaving that list
+        pending = {}  # list_id -> {task_id: (index, seq, task)} to place
+        placed_in = {}  # task_id -> list_id of its pending entry
+        # task_id -> list_id a rebuild put it in; until the list it left is
+        # rebuilt too, its old record is still in that list's index
+        settled = {}
+        edits = {}  # task_id -> (title, description, updated)
+        touched = set()
+        sequence = itertools.count()
+
+        def live(task_id):
+            # The task as the batch has it so far, or None if there is none
+            list_id = placed_in.get(task_id)
+            if list_id is not None:
+                return pending[list_id][task_id][2]
+            list_id = settled.get(task_id)
+            task = self.get(task_id) if list_id is None else self.indexes[list_id].get(task_id)
+            if task is None or task_id in removed.get(task.list_id, ()):
+                return None
+            return task
+
+        def take(task_id):
+            # Take a task out of wherever the batch has it so far
+            task = live(task_id)
+            if task is None:
+                raise KeyError(task_id)
+            list_id = placed_in.pop(task_id, None)
+            if list_id is not None:
+                del pending[list_id][task_id]
+            else:
+                removed.setdefault(task.list_id, set()).add(task_id)
+                touched.add(task.list_id)
+            return task
+
+        def place(list_id, index, task):
+            if list_id not in self.lists:
+                raise KeyError(list_id)
+            pending.setdefault(list_id, {})[task.id] = (index, next(sequence), task)
+            placed_in[task.id] = list_id
+            touched.add(list_id)
+
+        def rebuild(list_id):
+            # Drop the tasks that left and merge in the ones placed here
+            gone = removed.pop(list_id, set())
+            incoming = pending.pop(list_id, {})
+            for task_id in incoming:
+                del placed_in[task_id]
+                settled[task_id] = list_id
+            tasks = self.lists[list_id]
+            if gone:
+                tasks = [task for task in tasks if task.id not in gone]
+            count = len(tasks)
+            arrivals = sorted(
+                (count if index < 0 else min(index, count), seq, task)
+                for index, seq, task in incoming.values()
+            )
+            merged = []
+            groups = []  # (start in merged, tasks, keys) per arrival position
+            copied = 0
+            for position, group in itertools.groupby(arrivals, key=_first):
+                merged.extend(tasks[copied:position])
+                copied = position
+                group = [task for _, _, task in group]
+                keys = _spread(
+                    tasks[position - 1].order if position else None,
+                    tasks[position].order if position < count else None,
+                    len(group),
+                )
+                groups.append((len(merged), group, keys))
+                merged.extend(group)
+            merged.extend(tasks[copied:])
+            homes = self._writable_homes()
+            if any(keys is None for _, _, keys in groups):
+                self._set_list(list_id, merged, edits)  # no room between the keys
+            else:
+                self._patch_list(list_id, merged, gone, groups, edits)
+            for task_id in gone:
+                self._left(homes, task_id, list_id)
+            for task_id in incoming:
+                homes[task_id] = list_id
+            touched.discard(list_id)
+
+        for op in ops:
+            kind = op[0]
+            if kind == "add":
+                _, list_id, index, task_id, title, desc, timestamp = op
+                if live(task_id) is not None:
+                    raise ValueError(f"Duplicate task id: {task_id}")
+                place(list_id, index, Task(task_id, list_id, title, desc, timestamp, timestamp))
+            elif kind == "edit":
+                _, task_id, title, desc, timestamp = op
+                task = live(task_id)
+                if task is None:
+                    raise KeyError(task_id)
+                touched.add(placed_in.get(task_id, task.list_id))
+                edits[task_id] = (title, desc, timestamp)
+            elif kind == "delete":
+                take(op[1])
+                edits.pop(op[1], None)
+            elif kind == "move":
+                _, task_id, list_id, index = op
+                if list_id not in self.lists:
+                    raise KeyError(list_id)
+                place(list_id, index, take(task_id))
+            elif kind == "sort":
+                _, list_id, key, reverse = op
+                if list_id not in self.lists:
+                    raise KeyError(list_id)
+                rebuild(list_id)
+                tasks = sorted(self.lists[list_id], key=SORT_KEYS[key], reverse=bool(reverse))
+                self._set_list(list_id, tasks, {})
+            else:
+                raise ValueError(f"Unknown change: {kind}")
+
+        for list_id in list(touched):
+            rebuild(list_id)
+
+    def _patch_list(self, list_id, tasks, gone, groups, edits):
+        # Install the merged list `tasks`: tasks that stayed keep their
+        # records and order keys, arrivals get the keys picked for them, and
+        # pending `edits` to tasks in this list are applied
+        index = dict(self.indexes[list_id])
+        for task_id in gone:
+            del index[task_id]
+        for start, group, keys in groups:
+            for offset, (task, order) in enumerate(zip(group, keys)):
+                task = _edited(task, edits).replace(list_id=list_id, order=order)
+                tasks[start + offset] = task
+                index[task.id] = task
+        for task_id in [task_id for task_id in edits if task_id in index]:
+            task = index[task_id]
+            new_task = _edited(task, edits)
+            tasks[bisect_left(tasks, task.order, key=_order_key)] = new_task
+            index[task_id] = new_task
+        self.lists[list_id] = tasks
+        self.indexes[list_id] = index
+        self._owned.add(list_id)
+
+    def _set_list(self, list_id, tasks, edits):
+        # Install `tasks` as the whole of `list_id`, numbered from 0
+        index = {}
+        for n, task in enumerate(tasks):
+            task = _edited(task, edits)
+            if task.list_id != list_id or task.order != n:
+                task = Task(task.id, list_id, task.title, task.description, task.created, task.updated, float(n))
+            tasks[n] = task
+            index[task.id] = task
+        self.lists[list_id] = tasks
+        self.indexes[list_id] = index
+        self._owned.add(list_id)
+
+
+def _first(item):
+    return item[0]
+
+
+def _edited(task, edits):
+    # `task` with its pending batch edit applied (and removed from `edits`)
+    edit = edits.pop(task.id, None)
+    if edit is None:
+        return task
+    title, description, updated = edit
+    return task.replace(title=title, description=description, updated=updated)
+
+
+def _spread(low, high, count):
+    # `count` increasing order keys strictly between `low` and `high`
+    # (either may be None for an open end), or None if floats run out
+    if low is None and high is None:
+        return [float(i) for i in range(count)]
+    if low is None:
+        return [high - count + i for i in range(count)]
+    if high is None:
+        return [low + 1 + i for i in range(count)]
+    step = (high - low) / (count + 1)
+    keys = [low + step * (i + 1) for i in range(count)]
+    previous = low
+    for order in keys + [high]:
+        if not previous < order:
+            return None
+        previous = order
+    return keys
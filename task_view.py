@@ -0,0 +1,358 @@
+from shiny import ui
+
+
+# Task elements for the list views, and keyed patches that bring a rendered
+# list up to date without re-sending it. Lists are windowed: a list's
+# ".task-items" element is a scroll viewport holding a spacer, the rendered
+# rows (".task-window") and another spacer, and only WINDOW_ROWS tasks from
+# `start` on are ever on the page. The spacers stand in for the rest, and
+# TASK_VIEW_SCRIPT asks for another window as the user scrolls. Every task
+# element carries its task ID in data-task-id and sits directly in the
+# window, which is what patches address.
+
+# Past this many operations a patch is no cheaper than re-sending the window
+PATCH_MAX_OPS = 50
+# Rows rendered per list, and how many of them are kept above the first
+# visible row so short scrolls need no round trip
+WINDOW_ROWS = 60
+OVERSCAN_ROWS = 15
+
+
+def task_element(task, drag_drop):
+    if drag_drop:
+        return ui.div(
+            {"draggable": "true",
+             "data-task-id": task.id,
+             "data-list-id": task.list_id,
+             "ondragstart": "handleDragStart(event)",
+             "ondragover": "handleDragOver(event)",
+             "ondrop": "handleDrop(event)",
+             "class": "draggable-task"},
+            ui.h5(task.title),
+            ui.p(task.description, style="white-space: pre-line;") if task.description else "",
+            style="cursor: move; padding: 10px; margin: 5px; border: 1px solid #ddd; border-radius: 4px;"
+        )
+    desc_paragraphs = [ui.p(p, style="text-indent:50px") for p in task.description.split('\n')]
+    return ui.div(
+        {"data-task-id": task.id},
+        ui.h5(f"• {task.title}"),
+        *desc_paragraphs,
+        style="margin-bottom: 0;"
+    )
+
+
+def window_start(first_visible, total):
+    # Start of the window to render when row `first_visible` is at the top
+    start = max(0, first_visible - OVERSCAN_ROWS)
+    return max(0, min(start, total - WINDOW_ROWS))
+
+
+def task_window(tasks, start, drag_drop):
+    rows = [task_element(task, drag_drop) for task in tasks[start:start + WINDOW_ROWS]]
+    return ui.div({"class": "task-window"}, *rows or [ui.p("No tasks in this list")])
+
+
+def task_items(list_id, tasks, drag_drop, start=0, scroll_to=None):
+    # `scroll_to` is a row the page scrolls to once the list is shown
+    attrs = {"class": "task-items",
+             "data-list-id": list_id,
+             "data-start": str(start),
+             "data-total": str(len(tasks)),
+             "data-overscan": str(OVERSCAN_ROWS)}
+    if scroll_to is not None:
+        attrs["data-scroll-to"] = str(scroll_to)
+    return ui.div(
+        attrs,
+        ui.div({"class": "task-spacer", "data-list-id": list_id, "data-edge": "top"}),
+        task_window(tasks, start, drag_drop),
+        ui.div({"class": "task-spacer", "data-list-id": list_id, "data-edge": "bottom"}),
+    )
+
+
+def _stable_positions(positions):
+    # Indices (into `positions`) of a longest increasing subsequence: the
+    # elements that can stay where they are while the others move around them
+    tails, tails_at, previous = [], [], [None] * len(positions)
+    for i, position in enumerate(positions):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if tails[middle] < position:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(tails):
+            tails.append(position)
+            tails_at.append(i)
+        else:
+            tails[low] = position
+            tails_at[low] = i
+        previous[i] = tails_at[low - 1] if low else None
+    stable = set()
+    i = tails_at[-1] if tails_at else None
+    while i is not None:
+        stable.add(i)
+        i = previous[i]
+    return stable
+
+
+def diff_tasks(old_tasks, new_tasks, drag_drop):
+    # Operations that turn the rendered `old_tasks` into `new_tasks`, keyed
+    # by task ID; None when re-sending the whole list is simpler. "insert"
+    # and "move" place a task right after another one (or first, for None).
+    if not old_tasks or not new_tasks:
+        return None
+    old_at = {task.id: i for i, task in enumerate(old_tasks)}
+    new_ids = {task.id for task in new_tasks}
+    ops = [{"op": "remove", "id": task.id} for task in old_tasks if task.id not in new_ids]
+
+    kept = [task for task in new_tasks if task.id in old_at]
+    stable = _stable_positions([old_at[task.id] for task in kept])
+    stable_ids = {kept[i].id for i in stable}
+
+    after = None
+    for task in new_tasks:
+        if task.id not in old_at:
+            ops.append({"op": "insert", "id": task.id, "after": after,
+                        "html": str(task_element(task, drag_drop))})
+        else:
+            old_task = old_tasks[old_at[task.id]]
+            if task.id not in stable_ids:
+                ops.append({"op": "move", "id": task.id, "after": after})
+            if (old_task.title, old_task.description) != (task.title, task.description):
+                ops.append({"op": "update", "id": task.id, "html": str(task_element(task, drag_drop))})
+        after = task.id
+        if len(ops) > PATCH_MAX_OPS:
+            return None
+    return ops
+
+
+# Loaded once with the page: drag and drop handlers for the drag-drop view,
+# window bookkeeping for the list viewports, task selection by clicking rows,
+# and the receiving end of the "todo_list_patch" and "todo_selection" messages
+TASK_VIEW_SCRIPT = """
+function handleDragStart(event) {
+    event.dataTransfer.setData('text/plain',
+        JSON.stringify({
+            taskId: event.target.dataset.taskId,
+            listId: event.target.dataset.listId
+        })
+    );
+}
+
+function handleDragOver(event) {
+    event.preventDefault();
+    // Scroll the list while dragging near its edges, so tasks outside the
+    // rendered window can be reached as drop targets
+    const viewport = event.target.closest && event.target.closest('.task-items');
+    if (!viewport) return;
+    const bounds = viewport.getBoundingClientRect();
+    const edge = Math.min(60, bounds.height / 4);
+    if (event.clientY < bounds.top + edge) {
+        viewport.scrollTop -= 20;
+    } else if (event.clientY > bounds.bottom - edge) {
+        viewport.scrollTop += 20;
+    }
+}
+
+function handleDrop(event) {
+    event.preventDefault();
+    const data = JSON.parse(event.dataTransfer.getData('text/plain'));
+
+    // Get target list and position
+    let targetElement = event.target;
+    while (targetElement && !targetElement.classList.contains('droppable-list') &&
+           !targetElement.classList.contains('draggable-task') &&
+           !targetElement.classList.contains('task-spacer')) {
+        targetElement = targetElement.parentElement;
+    }
+
+    if (!targetElement) return;
+
+    const targetListId = targetElement.dataset.listId;
+    let targetTaskId = null;
+    let targetIndex = -1;
+
+    if (targetElement.classList.contains('draggable-task')) {
+        targetTaskId = targetElement.dataset.taskId;
+    } else if (targetElement.classList.contains('task-spacer')) {
+        // Dropped on rows that are not rendered: work out which one
+        const viewport = targetElement.closest('.task-items');
+        const state = todoWindowState(viewport);
+        const bounds = targetElement.getBoundingClientRect();
+        const fraction = bounds.height ? (event.clientY - bounds.top) / bounds.height : 0;
+        if (targetElement.dataset.edge === 'top') {
+            targetIndex = Math.floor(fraction * state.start);
+        } else {
+            targetIndex = state.end + Math.floor(fraction * (state.total - state.end));
+        }
+    }
+
+    // Send move information to Shiny (tasks by ID; the server
+    // works out the positions against its current lists)
+    const moveInfo = {
+        taskId: data.taskId,
+        targetListId: targetListId,
+        targetTaskId: targetTaskId,
+        targetIndex: targetIndex
+    };
+
+    Shiny.setInputValue('drag_drop_move', moveInfo, {priority: 'event'});
+}
+
+function todoWindowState(viewport) {
+    const rows = viewport.querySelector('.task-window').querySelectorAll(':scope > [data-task-id]');
+    let height = 0;
+    rows.forEach(function(row) { height += row.offsetHeight; });
+    const start = parseInt(viewport.dataset.start);
+    return {
+        start: start,
+        end: start + rows.length,
+        total: parseInt(viewport.dataset.total),
+        overscan: parseInt(viewport.dataset.overscan),
+        rowHeight: rows.length && height ? height / rows.length : 40
+    };
+}
+
+function todoLayoutWindow(viewport) {
+    // Size the spacers so the scrollbar covers the whole list
+    const state = todoWindowState(viewport);
+    viewport.querySelector('.task-spacer[data-edge="top"]').style.height =
+        (state.start * state.rowHeight) + 'px';
+    viewport.querySelector('.task-spacer[data-edge="bottom"]').style.height =
+        ((state.total - state.end) * state.rowHeight) + 'px';
+}
+
+function todoScrollToRow(viewport, row) {
+    viewport.scrollTop = row * todoWindowState(viewport).rowHeight;
+    viewport.dataset.requested = String(row);  // this window is already here
+}
+
+function todoCheckWindow(viewport) {
+    // Ask for another window once the visible rows get near the edge of
+    // the rendered ones
+    const state = todoWindowState(viewport);
+    const first = Math.floor(viewport.scrollTop / state.rowHeight);
+    const last = first + Math.ceil(viewport.clientHeight / state.rowHeight);
+    const margin = Math.floor(state.overscan / 2);
+    if ((state.start > 0 && first < state.start + margin) ||
+        (state.end < state.total && last > state.end - margin)) {
+        const request = viewport.dataset.requested;
+        if (request === String(first)) return;
+        viewport.dataset.requested = String(first);
+        Shiny.setInputValue('list_window', {list: viewport.dataset.listId, first: first},
+                            {priority: 'event'});
+    }
+}
+
+// Selected task IDs, kept in step with the server by "todo_selection"
+// deltas; rows are marked from here whenever they are (re)rendered
+const todoSelected = new Set();
+
+function todoMarkSelected(root) {
+    root.querySelectorAll('.task-window > [data-task-id]').forEach(function(row) {
+        row.classList.toggle('selected', todoSelected.has(row.dataset.taskId));
+    });
+}
+
+document.addEventListener('click', function(event) {
+    const row = event.target.closest && event.target.closest('.task-window > [data-task-id]');
+    if (!row) return;
+    Shiny.setInputValue('select_task', {
+        id: row.dataset.taskId,
+        shift: event.shiftKey,
+        toggle: event.ctrlKey || event.metaKey
+    }, {priority: 'event'});
+});
+
+document.addEventListener('mousedown', function(event) {
+    // Keep Shift-click from selecting text across the rows
+    if (event.shiftKey && event.target.closest && event.target.closest('.task-window')) {
+        event.preventDefault();
+    }
+});
+
+document.addEventListener('scroll', function(event) {
+    const viewport = event.target;
+    if (!viewport.classList || !viewport.classList.contains('task-items')) return;
+    clearTimeout(viewport.todoScrollTimer);
+    viewport.todoScrollTimer = setTimeout(function() { todoCheckWindow(viewport); }, 80);
+}, true);
+
+$(document).on('shiny:value', function(event) {
+    if (!event.name.startsWith('list_view_')) return;
+    setTimeout(function() {
+        document.querySelectorAll('#' + event.name + ' .task-items').forEach(function(viewport) {
+            todoLayoutWindow(viewport);
+            todoMarkSelected(viewport);
+            if (viewport.dataset.scrollTo !== undefined) {
+                todoScrollToRow(viewport, parseInt(viewport.dataset.scrollTo));
+                delete viewport.dataset.scrollTo;
+            }
+        });
+    }, 0);
+});
+
+$(document).on('shiny:connected', function() {
+    function fromHtml(html) {
+        const template = document.createElement('template');
+        template.innerHTML = html.trim();
+        return template.content.firstElementChild;
+    }
+
+    Shiny.addCustomMessageHandler('todo_list_patch', function(msg) {
+        const viewport = document.querySelector('#list_view_' + msg.list + ' .task-items');
+        if (!viewport) return;
+        const container = viewport.querySelector('.task-window');
+        const find = function(id) {
+            return container.querySelector(':scope > [data-task-id="' + CSS.escape(id) + '"]');
+        };
+        const place = function(element, after) {
+            if (after === null) {
+                container.prepend(element);
+            } else {
+                const anchor = find(after);
+                if (anchor) anchor.after(element); else container.append(element);
+            }
+        };
+
+        viewport.dataset.start = msg.start;
+        viewport.dataset.total = msg.total;
+        delete viewport.dataset.requested;
+        if (msg.html !== undefined) {
+            // A new window: keep the rows the user was looking at in view
+            const state = todoWindowState(viewport);
+            const first = viewport.scrollTop / state.rowHeight;
+            container.replaceWith(fromHtml(msg.html));
+            todoLayoutWindow(viewport);
+            todoMarkSelected(viewport);
+            if (msg.scrollTo !== undefined) {
+                todoScrollToRow(viewport, msg.scrollTo);
+            } else {
+                viewport.scrollTop = first * todoWindowState(viewport).rowHeight;
+            }
+            return;
+        }
+        for (const op of msg.ops) {
+            const element = find(op.id);
+            if (op.op === 'remove') {
+                if (element) element.remove();
+            } else if (op.op === 'insert') {
+                place(fromHtml(op.html), op.after);
+            } else if (op.op === 'move') {
+                if (element) place(element, op.after);
+            } else if (op.op === 'update') {
+                if (element) element.replaceWith(fromHtml(op.html));
+            }
+        }
+        todoLayoutWindow(viewport);
+        todoMarkSelected(viewport);
+    });
+
+    Shiny.addCustomMessageHandler('todo_selection', function(msg) {
+        msg.add.forEach(function(id) { todoSelected.add(id); });
+        msg.remove.forEach(function(id) { todoSelected.delete(id); });
+        todoMarkSelected(document);
+    });
+});
+"""
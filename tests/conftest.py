@@ -0,0 +1,49 @@
+# Shared fixtures: the app's modules on the path, and GitHub clients talking
+# to the local stand-in in benchmarks/fake_github.py.
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import github_client  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+from metrics import Metrics  # noqa: E402
+from rate_limit import RateBudget  # noqa: E402
+
+REPO = "test/todo"
+
+
+@pytest.fixture(scope="session")
+def github_server():
+    with FakeGitHub() as server:
+        yield server
+
+
+@pytest.fixture
+def github(github_server, monkeypatch):
+    # The fake GitHub with no repos yet; add them with github.add_repo()
+    github_server.repos.clear()
+    github_server.forced_conflicts = 0
+    github_server.reset_stats()
+    monkeypatch.setattr(github_client, "GITHUB_API_URL", github_server.url)
+    return github_server
+
+
+@pytest.fixture
+def make_client(github):
+    # make_client() -> a GitHubClient for REPO with its own budget and
+    # metrics, as a separate session would have
+    clients = []
+
+    def make(repo=REPO, token="token", shared=None):
+        client = github_client.GitHubClient(repo, token, metrics=Metrics(), budget=RateBudget(), shared=shared)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
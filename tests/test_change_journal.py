@@ -0,0 +1,178 @@
+# ChangeJournal: folding operations, checkpoints around saves, persisting and
+# restoring, and replaying onto another version of the lists.
+#
+#   python -m pytest tests
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from change_journal import JOURNAL_FORMAT, ChangeJournal, journal_path  # noqa: E402
+from list_registry import ListRegistry  # noqa: E402
+from task_store import Task, TaskStore  # noqa: E402
+
+
+def add(task_id, list_id="list1", title="t", index=-1):
+    return ("add", list_id, index, task_id, title, "", 1)
+
+
+def edit(task_id, title):
+    return ("edit", task_id, title, "", 2)
+
+
+COMPACTIONS = [
+    # (what happened, appended, recorded)
+    ("edit after add", [add("a"), edit("a", "x")], [("add", "list1", -1, "a", "x", "", 1)]),
+    ("edits of one task", [edit("a", "x"), edit("a", "y")], [edit("a", "y")]),
+    ("edits of different tasks", [edit("a", "x"), edit("b", "y")], [edit("a", "x"), edit("b", "y")]),
+    ("delete after add", [add("a"), ("delete", "a")], []),
+    ("delete after edit", [edit("a", "x"), ("delete", "a")], [("delete", "a")]),
+    ("move after add", [add("a"), ("move", "a", "list2", 0)], [("add", "list2", 0, "a", "t", "", 1)]),
+    ("moves of one task", [("move", "a", "list2", 0), ("move", "a", "list3", 1)], [("move", "a", "list3", 1)]),
+    ("renames of one list", [("rename", "list1", "A"), ("rename", "list1", "B")], [("rename", "list1", "B")]),
+    ("renames of two lists", [("rename", "list1", "A"), ("rename", "list2", "B")],
+     [("rename", "list1", "A"), ("rename", "list2", "B")]),
+    ("edit across a list change", [edit("a", "x"), ("rename", "list1", "A"), edit("a", "y")],
+     [edit("a", "x"), ("rename", "list1", "A"), edit("a", "y")]),
+    ("delete after move", [("move", "a", "list2", 0), ("delete", "a")], [("move", "a", "list2", 0), ("delete", "a")]),
+]
+
+
+@pytest.mark.parametrize("case, appended, recorded", COMPACTIONS, ids=[case[0] for case in COMPACTIONS])
+def test_compaction(case, appended, recorded):
+    journal = ChangeJournal()
+    for op in appended:
+        journal.append(op)
+    assert journal.ops() == recorded
+
+
+def test_nothing_folds_into_a_save_in_flight():
+    journal = ChangeJournal()
+    journal.append(add("a"))
+    seq = journal.checkpoint()
+    journal.append(edit("a", "x"))  # the save has the add without this edit
+    journal.append(edit("a", "y"))
+    assert journal.ops() == [add("a"), edit("a", "y")]
+    journal.discard_through(seq)
+    assert journal.ops() == [edit("a", "y")]
+
+
+def test_a_failed_save_keeps_everything():
+    journal = ChangeJournal()
+    journal.append(edit("a", "x"))
+    journal.checkpoint()
+    journal.append(edit("b", "y"))
+    assert len(journal) == 2
+
+
+def test_overflow():
+    journal = ChangeJournal(max_ops=2)
+    for task_id in "abc":
+        journal.append(edit(task_id, "x"))
+    assert journal.overflowed and journal and len(journal) == 0
+    journal.append(edit("d", "x"))
+    assert journal.ops() == []
+    # Cleared only by a save of everything recorded, including since
+    seq = journal.checkpoint()
+    journal.append(edit("e", "x"))
+    journal.discard_through(seq)
+    assert journal.overflowed
+    journal.discard_through(journal.checkpoint())
+    assert not journal
+
+
+def test_persist_and_restore(tmp_path):
+    path = journal_path(str(tmp_path), "me/todo", "token", "browser")
+    journal = ChangeJournal(path=path)
+    journal.append(add("a"))
+    journal.append(("rename", "list1", "Home"))
+    with open(path) as f:
+        assert json.load(f)["format"] == JOURNAL_FORMAT
+
+    restored = ChangeJournal(path=path)
+    assert restored.restore()
+    assert restored.ops() == journal.ops()
+    # Restored operations belong to no save yet, but are not folded into
+    restored.append(edit("a", "x"))
+    assert len(restored) == 3
+
+    journal.discard_through(journal.checkpoint())
+    assert not ChangeJournal(path=path).restore()
+
+
+def test_journals_are_per_repo_token_and_browser(tmp_path):
+    paths = {journal_path(str(tmp_path), repo, token, browser)
+             for repo, token, browser in [("me/todo", "secret", "b"), ("me/other", "secret", "b"),
+                                          ("me/todo", "other", "b"), ("me/todo", "secret", "c")]}
+    assert len(paths) == 4
+    assert not any("secret" in path for path in paths)
+
+
+def test_unwritable_journal_is_kept_in_memory(tmp_path, monkeypatch):
+    path = str(tmp_path / "journal.json")
+    journal = ChangeJournal(path=path)
+    journal.append(edit("a", "x"))
+
+    def disk_full(src, dst):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(os, "replace", disk_full)
+    journal.append(edit("b", "y"))
+    assert journal.ops() == [edit("a", "x"), edit("b", "y")]
+    assert journal.path is None
+    assert os.listdir(tmp_path) == []  # neither the stale copy nor the .tmp
+    journal.append(edit("c", "z"))  # no more attempts
+    assert len(journal) == 3
+
+
+def test_restore_ignores_other_formats_and_junk(tmp_path):
+    path = str(tmp_path / "journal.json")
+    with open(path, "w") as f:
+        json.dump({"format": JOURNAL_FORMAT - 1, "ops": [list(edit("a", "x"))]}, f)
+    assert not ChangeJournal(path=path).restore()
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert not ChangeJournal(path=path).restore()
+    assert not ChangeJournal(path=str(tmp_path / "missing.json")).restore()
+
+
+def store(**lists):
+    return TaskStore.from_lists({
+        list_id: [Task(task_id, list_id, f"task {task_id}") for task_id in ids.split()]
+        for list_id, ids in lists.items()
+    })
+
+
+def ids(store, list_id):
+    return [task.id for task in store.tasks(list_id)]
+
+
+def test_replay_onto_a_newer_version():
+    journal = ChangeJournal()
+    journal.append(add("x", index=0))
+    journal.append(("move", "b", "list2", -1))
+    journal.append(("create_list", "list3", "Errands"))
+    names = ListRegistry({"list1": "Home", "list2": "Work"})
+    remote = store(list1="a b c", list2="d")  # c was added on GitHub
+    replayed = journal.replay(remote, names)
+    assert (ids(replayed, "list1"), ids(replayed, "list2")) == (["x", "a", "c"], ["d", "b"])
+    assert names.name("list3") == "Errands"
+    assert ids(remote, "list1") == ["a", "b", "c"]  # untouched
+
+
+def test_replay_fails_when_a_task_is_gone():
+    journal = ChangeJournal()
+    journal.append(edit("b", "x"))
+    names = ListRegistry({"list1": "Home"})
+    assert journal.replay(store(list1="a"), names) is None
+    assert list(names) == ["list1"]
+
+
+def test_unreplayable_after_a_wholesale_change():
+    journal = ChangeJournal()
+    journal.append(edit("a", "x"))
+    journal.mark_unreplayable()
+    assert journal.replay(store(list1="a")) is None
@@ -0,0 +1,107 @@
+# GitHubClient against the fake GitHub: conditional reads, preconditioned
+# writes and multi-file commits.
+#
+#   python -m pytest tests
+from conftest import REPO
+from github_client import CommitBuilder, blob_sha
+
+
+def test_reads_are_revalidated_with_etags(github, make_client):
+    repo = github.add_repo(REPO, {"ToDoList.txt": "v1"})
+    client = make_client()
+    first = client.get_file("ToDoList.txt")
+    assert (first.status_code, first.content, first.sha) == (200, "v1", blob_sha("v1"))
+    again = client.get_file("ToDoList.txt")
+    assert (again.status_code, again.content, again.not_modified) == (304, "v1", True)
+    assert again.ok
+    assert github.stats["not_modified"] == 1
+
+    repo.write({"ToDoList.txt": "v2"})
+    changed = client.get_file("ToDoList.txt")
+    assert (changed.status_code, changed.content, changed.not_modified) == (200, "v2", False)
+
+
+def test_missing_files_are_forgotten(github, make_client):
+    repo = github.add_repo(REPO, {"ToDoList.txt": "v1"})
+    client = make_client()
+    assert client.get_file("ToDoList.txt").ok
+    repo.write({"ToDoList.txt": None})
+    assert client.get_file("ToDoList.txt").status_code == 404
+    assert client.cached("ToDoList.txt") is None
+
+
+def test_a_read_of_an_old_commit_is_not_cached(github, make_client):
+    repo = github.add_repo(REPO, {"ToDoList.txt": "v1"})
+    old = repo.head
+    repo.write({"ToDoList.txt": "v2"})
+    client = make_client()
+    assert client.get_file("ToDoList.txt", ref=old).content == "v1"
+    assert client.cached("ToDoList.txt") is None
+
+
+def test_a_save_is_one_request(github, make_client):
+    # The SHA from the last read or write is the precondition: no read first
+    repo = github.add_repo(REPO, {"ToDoList.txt": "v1"})
+    client = make_client()
+    sha = client.get_file("ToDoList.txt").sha
+    github.reset_stats()
+    for text in ("v2", "v3"):
+        response = client.put_file("ToDoList.txt", text, "save", sha=sha)
+        assert (response.status_code, response.sha, response.commit) == (200, blob_sha(text), repo.head)
+        sha = response.sha
+    assert github.stats["requests"] == 2
+    assert repo.files() == {"ToDoList.txt": "v3"}
+    assert client.cached("ToDoList.txt").sha == blob_sha("v3")
+
+
+def test_stale_sha_is_a_conflict(github, make_client):
+    repo = github.add_repo(REPO, {"ToDoList.txt": "v1"})
+    client = make_client()
+    sha = client.get_file("ToDoList.txt").sha
+    repo.write({"ToDoList.txt": "theirs"})
+    response = client.put_file("ToDoList.txt", "ours", "save", sha=sha)
+    assert (response.status_code, response.conflict, response.ok) == (409, True, False)
+    assert repo.files() == {"ToDoList.txt": "theirs"}
+
+
+def test_missing_sha_for_an_existing_file_is_a_conflict(github, make_client):
+    repo = github.add_repo(REPO, {"ToDoList.txt": "theirs"})
+    response = make_client().put_file("ToDoList.txt", "ours", "save")
+    assert (response.status_code, response.conflict) == (422, True)
+    assert repo.files() == {"ToDoList.txt": "theirs"}
+
+
+def test_new_file_needs_no_sha(github, make_client):
+    repo = github.add_repo(REPO)
+    response = make_client().put_file("ToDoList.txt", "first", "create")
+    assert (response.status_code, response.conflict) == (201, False)
+    assert repo.files() == {"ToDoList.txt": "first"}
+
+
+def test_commit_builder_writes_and_deletes_in_one_commit(github, make_client):
+    repo = github.add_repo(REPO, {"a.txt": "a", "b.txt": "b"})
+    client = make_client()
+    assert client.get_file("b.txt").content == "b"
+    head = client.get_head()
+    commit = CommitBuilder(client, head.commit, head.tree)
+    commit.write("a.txt", "A")
+    commit.write("c.txt", "c")
+    commit.delete("b.txt")
+    assert len(commit) == 3
+    response = commit.commit("one commit")
+    assert response.ok and repo.head == response.commit
+    assert repo.commits[repo.head][1] == head.commit
+    assert repo.files() == {"a.txt": "A", "c.txt": "c"}
+    assert client.cached("b.txt") is None and client.cached("c.txt").content == "c"
+
+
+def test_commit_builder_refuses_a_stale_parent(github, make_client):
+    repo = github.add_repo(REPO, {"a.txt": "a"})
+    client = make_client()
+    head = client.get_head()
+    repo.write({"a.txt": "someone else"})
+    commit = CommitBuilder(client, head.commit, head.tree)
+    commit.write("a.txt", "ours")
+    response = commit.commit("stale")
+    assert response.conflict
+    assert repo.files() == {"a.txt": "someone else"}
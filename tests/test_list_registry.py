@@ -0,0 +1,53 @@
+# ListRegistry: new list IDs, and reading and writing ToDoListNames.txt.
+#
+#   python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from list_registry import DEFAULT_LIST_NAMES, ListRegistry, merge_registries  # noqa: E402
+
+
+def test_new_lists_follow_the_highest_id():
+    registry = ListRegistry({"list1": "A", "list7": "B"})
+    assert registry.create("C") == "list8"
+    registry.delete("list1")
+    assert registry.create("D") == "list9"
+
+
+def test_a_deleted_list_id_is_not_reused():
+    registry = ListRegistry(DEFAULT_LIST_NAMES)
+    registry.delete("list10")
+    assert registry.unused_id() == "list11"
+    # Not even after a save and a reload
+    text = registry.format()
+    assert text.endswith("\n#last list10")
+    reloaded = ListRegistry.parse(text)
+    assert list(reloaded) == list(registry)
+    assert reloaded.create("New") == "list11"
+    assert reloaded.format().endswith("list11:New")  # the line is only kept while needed
+
+
+def test_copies_and_merges_keep_the_count():
+    registry = ListRegistry({"list1": "A", "list2": "B"})
+    registry.delete("list2")
+    assert registry.copy().unused_id() == "list3"
+    # GitHub deleted a list we never saw
+    base = ListRegistry({"list1": "A"})
+    remote = ListRegistry.parse("list1:A\n#last list5")
+    merged, _ = merge_registries(base, base.copy(), remote)
+    assert merged.unused_id() == "list6"
+
+
+def test_other_ids_are_left_alone():
+    registry = ListRegistry.parse("groceries:Groceries\nlist3x:Odd")
+    assert registry.unused_id() == "list1"
+    assert registry.format() == "groceries:Groceries\nlist3x:Odd"
+
+
+def test_parse_skips_what_it_cannot_use():
+    registry = ListRegistry.parse("list1:A\nnonsense\n!list2:B\nlist1:again\nlist3:A\n")
+    assert registry.names == {"list1": "A", "list2": "B", "list3": "list3"}
+    assert registry.archived == {"list2"}
+    assert registry.format() == "list1:A\n!list2:B\nlist3:list3"
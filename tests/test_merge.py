@@ -0,0 +1,124 @@
+# Three-way merges: task lists (merge.py) and list registries
+# (list_registry.merge_registries).
+#
+#   python -m pytest tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from list_registry import ListRegistry, merge_registries  # noqa: E402
+from merge import MergeConflict, merge_items, merge_task_lists  # noqa: E402
+from task_store import Task, TaskStore  # noqa: E402
+
+# Items are single letters; a capital is an edited version of its lower case
+# letter. "?" in the expected result stands for a conflict.
+MERGES = [
+    # (what happened, base, ours, theirs, merged)
+    ("nothing changed", "abc", "abc", "abc", "abc"),
+    ("ours only", "abc", "aBc", "abc", "aBc"),
+    ("theirs only", "abc", "abc", "abC", "abC"),
+    ("both, different tasks", "abc", "Abc", "abC", "AbC"),
+    ("both, the same edit", "abc", "aBc", "aBc", "aBc"),
+    ("both edited one task", "abc", "aBc", "aXc", "a?c"),
+    ("we deleted, they edited", "abc", "ac", "aBc", "a?c"),
+    ("we edited, they deleted", "abc", "aBc", "ac", "a?c"),
+    ("both deleted", "abc", "ac", "ac", "ac"),
+    ("we added, they deleted elsewhere", "abc", "xabc", "ab", "xab"),
+    # diff3: changes next to each other overlap
+    ("we added right after the task they deleted", "abc", "abcd", "ab", "ab?"),
+    ("inserts at both ends", "ab", "xab", "aby", "xaby"),
+    ("inserts at one place", "ab", "axb", "ayb", "a?b"),
+    ("we reordered, they appended", "abc", "bac", "abcd", "bacd"),
+    ("we moved one, they prepended", "abc", "acb", "xabc", "xacb"),
+    ("they reordered, we edited elsewhere", "abcd", "abcD", "bacd", "bacD"),
+]
+
+
+def shown(chunks):
+    return "".join("?" if isinstance(chunk, MergeConflict) else chunk for chunk in chunks)
+
+
+@pytest.mark.parametrize("case, base, local, remote, expected", MERGES, ids=[case[0] for case in MERGES])
+def test_merge_items(case, base, local, remote, expected):
+    assert shown(merge_items("list1", list(base), list(local), list(remote))) == expected
+
+
+def test_conflict_keeps_each_side():
+    (_, conflict, _) = merge_items("list1", list("abc"), list("aBc"), list("aXc"))
+    assert (conflict.list_id, conflict.base, conflict.local, conflict.remote) == ("list1", ["b"], ["B"], ["X"])
+    assert conflict.resolve("local") == ["B"]
+    assert conflict.resolve("remote") == ["X"]
+    assert conflict.resolve("both") == ["B", "X"]
+
+
+def store(**lists):
+    # store(list1="a b") -> tasks with IDs a, b and titles "task a", "task b"
+    return TaskStore.from_lists({
+        list_id: [Task(task_id, list_id, f"task {task_id}") for task_id in ids.split()]
+        for list_id, ids in lists.items()
+    })
+
+
+def titles(store, list_id):
+    return [task.title for task in store.tasks(list_id)]
+
+
+def test_lists_merge_by_id():
+    base = store(list1="a b", list2="c")
+    local = store(list1="a b x", list2="c")
+    remote = store(list1="a b", list2="c y", list3="z")  # list3: created on GitHub
+    merged = merge_task_lists(base, local, remote).resolve()
+    assert list(merged.lists) == ["list1", "list2", "list3"]
+    assert titles(merged, "list1") == ["task a", "task b", "task x"]
+    assert titles(merged, "list2") == ["task c", "task y"]
+    assert titles(merged, "list3") == ["task z"]
+
+
+def test_both_edited_task_resolves_to_either_or_both():
+    base = store(list1="a")
+    local = base.copy()
+    local.update("a", "ours", "")
+    remote = base.copy()
+    remote.update("a", "theirs", "")
+    result = merge_task_lists(base, local, remote)
+    assert len(result.conflicts) == 1
+    assert titles(result.resolve(["remote"]), "list1") == ["theirs"]
+    both = result.resolve()
+    assert titles(both, "list1") == ["ours", "theirs"]
+    assert len({task.id for task in both.tasks("list1")}) == 2  # the copy gets a fresh ID
+
+
+def registry(text):
+    return ListRegistry.parse(text)
+
+
+REGISTRY_MERGES = [
+    # (what happened, base, ours, theirs, merged, disagreements)
+    ("nothing changed", "l1:A\nl2:B", "l1:A\nl2:B", "l1:A\nl2:B", "l1:A\nl2:B", []),
+    ("they created a list", "l1:A", "l1:A", "l1:A\nl2:B", "l1:A\nl2:B", []),
+    ("we created a list", "l1:A", "l1:A\nl2:B", "l1:A", "l1:A\nl2:B", []),
+    ("they renamed", "l1:A\nl2:B", "l1:A\nl2:B", "l1:A\nl2:C", "l1:A\nl2:C", []),
+    ("we renamed", "l1:A\nl2:B", "l1:A\nl2:C", "l1:A\nl2:B", "l1:A\nl2:C", []),
+    ("both renamed alike", "l1:A", "l1:C", "l1:C", "l1:C", []),
+    ("both renamed differently", "l1:A", "l1:C", "l1:D", "l1:C", ["l1"]),
+    ("they archived", "l1:A\nl2:B", "l1:A\nl2:B", "l1:A\n!l2:B", "l1:A\n!l2:B", []),
+    ("we unarchived", "!l1:A", "l1:A", "!l1:A", "l1:A", []),
+    ("we deleted", "l1:A\nl2:B", "l1:A", "l1:A\nl2:B", "l1:A", []),
+    ("they deleted", "l1:A\nl2:B", "l1:A\nl2:B", "l1:A", "l1:A\nl2:B", ["l2"]),
+    ("both created the same ID", "l1:A", "l1:A\nl2:B", "l1:A\nl2:C", "l1:A\nl2:B", ["l2"]),
+    ("they created a name we use", "l1:A", "l1:A\nl2:B", "l1:A\nl3:B", "l1:A\nl2:B", ["l3"]),
+]
+
+
+@pytest.mark.parametrize("case, base, local, remote, expected, disagreements", REGISTRY_MERGES,
+                         ids=[case[0] for case in REGISTRY_MERGES])
+def test_merge_registries(case, base, local, remote, expected, disagreements):
+    local = registry(local)
+    before = local.format()
+    merged, found = merge_registries(registry(base), local, registry(remote))
+    assert merged.format() == expected
+    assert found == disagreements
+    assert local.format() == before  # the session's registry is left alone
@@ -0,0 +1,153 @@
+# RateBudget: what GitHub's rate-limit headers let each priority send.
+#
+#   python -m pytest tests
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_limit  # noqa: E402
+from rate_limit import BACKGROUND, LOAD, SAVE, RateBudget, RateLimited, is_rate_limited  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def headers(remaining, limit=5000, reset=4600.0, **more):
+    return {"X-RateLimit-Limit": str(limit), "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(reset), **more}
+
+
+def make_budget(remaining=None, limit=5000):
+    clock = FakeClock()
+    budget = RateBudget(clock=clock)
+    if remaining is not None:
+        budget.update(200, headers(remaining, limit))
+    return budget, clock
+
+
+def test_nothing_known_lets_everything_through():
+    budget, _ = make_budget()
+    for priority in (SAVE, LOAD, BACKGROUND):
+        budget.acquire(priority)
+    assert budget.remaining is None
+
+
+def test_update_reads_the_headers_and_acquire_counts_down():
+    budget, _ = make_budget(remaining=100)
+    assert (budget.limit, budget.remaining, budget.reset_at) == (5000, 100, 4600.0)
+    budget.acquire(SAVE)
+    assert budget.remaining == 99
+    # Unreadable headers leave what we knew
+    budget.update(200, {"X-RateLimit-Remaining": "lots"})
+    assert budget.remaining == 99
+
+
+@pytest.mark.parametrize("remaining, allowed", [
+    (600, [SAVE, LOAD, BACKGROUND]),
+    (500, [SAVE, LOAD]),  # BACKGROUND leaves 10% of 5000
+    (100, [SAVE]),  # LOAD leaves 2%
+    (1, [SAVE]),
+    (0, []),
+])
+def test_reserves(remaining, allowed):
+    for priority in (SAVE, LOAD, BACKGROUND):
+        budget, _ = make_budget(remaining=remaining)
+        if priority in allowed:
+            budget.acquire(priority, max_wait=0)
+        else:
+            with pytest.raises(RateLimited) as raised:
+                budget.acquire(priority, max_wait=0)
+            assert raised.value.retry_after == 3600.0  # until the reset
+
+
+def test_background_never_waits():
+    assert rate_limit.MAX_WAITS[BACKGROUND] == 0
+    budget, _ = make_budget(remaining=400)
+    start = time.monotonic()
+    with pytest.raises(RateLimited):
+        budget.acquire(BACKGROUND)
+    assert time.monotonic() - start < 0.5
+    assert budget.remaining == 400  # nothing was spent
+
+
+def test_budget_refills_at_the_reset():
+    budget, clock = make_budget(remaining=0)
+    clock.now = 4600.0
+    budget.acquire(BACKGROUND)
+
+
+def test_retry_after_blocks_every_priority():
+    budget, clock = make_budget(remaining=4000)
+    wait = budget.update(403, {"Retry-After": "30"}, "You have exceeded a secondary rate limit")
+    assert wait == 30.0
+    with pytest.raises(RateLimited) as raised:
+        budget.acquire(SAVE, max_wait=10)
+    assert raised.value.retry_after == 30.0
+    clock.now += 30
+    budget.acquire(SAVE)
+
+
+def test_exhausted_budget_waits_until_the_reset():
+    budget, _ = make_budget()
+    assert budget.update(403, headers(0, reset=1500.0)) == 500.0
+    assert budget.blocked_until == 1500.0
+
+
+def test_secondary_limit_without_retry_after():
+    budget, _ = make_budget()
+    assert budget.update(403, {}, "secondary rate limit") == rate_limit.SECONDARY_LIMIT_WAIT
+
+
+def test_other_refusals_do_not_block():
+    budget, _ = make_budget()
+    assert budget.update(403, {}, "Resource not accessible by integration") is None
+    assert budget.update(404, {}) is None
+    assert budget.blocked_until == 0.0
+
+
+@pytest.mark.parametrize("status, hdrs, body, limited", [
+    (429, {}, "", True),
+    (403, {"Retry-After": "5"}, "", True),
+    (403, {"X-RateLimit-Remaining": "0"}, "", True),
+    (403, {}, "API rate limit exceeded", True),
+    (403, {}, "Bad credentials", False),
+    (500, {"Retry-After": "5"}, "", False),
+])
+def test_is_rate_limited(status, hdrs, body, limited):
+    assert is_rate_limited(status, hdrs, body) == limited
+
+
+def test_waits_out_a_short_block():
+    budget = RateBudget()
+    budget.update(429, {"Retry-After": "0.1"})
+    start = time.monotonic()
+    budget.acquire(SAVE)
+    assert time.monotonic() - start >= 0.05
+
+
+def test_pressure():
+    budget, clock = make_budget(remaining=4000)
+    assert not budget.pressure()
+    budget.update(200, headers(400))
+    assert budget.pressure()  # under 10% of the hourly budget
+
+    budget, clock = make_budget(remaining=4000)
+    for _ in range(rate_limit.WRITES_PER_WINDOW):
+        budget.acquire(SAVE, write=True)
+    assert budget.pressure()
+    clock.now += rate_limit.WRITE_WINDOW_SECONDS + 1
+    assert not budget.pressure()
+
+
+def test_budget_for_shares_one_budget_per_token():
+    assert rate_limit.budget_for("a") is rate_limit.budget_for("a")
+    assert rate_limit.budget_for("a") is not rate_limit.budget_for("b")
@@ -0,0 +1,106 @@
+# SaveScheduler with a fake clock.
+#
+#   python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from save_scheduler import SaveScheduler  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def make_scheduler(quiet=2.0, max_delay=10.0):
+    clock = FakeClock()
+    return SaveScheduler(quiet, max_delay, clock=clock), clock
+
+
+def test_nothing_to_save():
+    scheduler, clock = make_scheduler()
+    assert scheduler.seconds_until_due() is None
+    assert not scheduler.due()
+    assert scheduler.take() == 0
+
+
+def test_due_after_the_quiet_window():
+    scheduler, clock = make_scheduler()
+    scheduler.mark_dirty()
+    assert scheduler.seconds_until_due() == 2.0
+    clock.advance(1.5)
+    assert not scheduler.due()
+    clock.advance(0.5)
+    assert scheduler.due()
+
+
+def test_each_edit_restarts_the_quiet_window():
+    scheduler, clock = make_scheduler()
+    scheduler.mark_dirty()
+    clock.advance(1.5)
+    scheduler.mark_dirty()
+    assert scheduler.seconds_until_due() == 2.0
+    clock.advance(1.9)
+    assert not scheduler.due()
+
+
+def test_steady_edits_are_saved_by_the_max_delay():
+    scheduler, clock = make_scheduler()
+    for _ in range(9):
+        scheduler.mark_dirty()
+        clock.advance(1.0)
+    # Never quiet for 2 seconds, but the first edit was 9 seconds ago
+    assert scheduler.seconds_until_due() == 1.0
+    scheduler.mark_dirty()
+    clock.advance(1.0)
+    assert scheduler.due()
+
+
+def test_take_counts_the_folded_edits_and_resets():
+    scheduler, clock = make_scheduler()
+    for _ in range(5):
+        scheduler.mark_dirty()
+    clock.advance(2.0)
+    assert scheduler.take() == 5
+    assert scheduler.pending == 0
+    assert scheduler.seconds_until_due() is None
+    scheduler.mark_dirty()
+    assert scheduler.seconds_until_due() == 2.0  # a new window, not the old one
+
+
+def test_defer_holds_a_due_save_back():
+    scheduler, clock = make_scheduler()
+    scheduler.mark_dirty()
+    clock.advance(20.0)
+    assert scheduler.due()
+    scheduler.defer(30.0)
+    assert scheduler.seconds_until_due() == 30.0
+    clock.advance(29.0)
+    assert not scheduler.due()
+    clock.advance(1.0)
+    assert scheduler.due()
+    assert scheduler.take() == 1
+
+
+def test_defer_without_edits_still_schedules_a_save():
+    # A failed save is retried later even if nothing changes meanwhile
+    scheduler, clock = make_scheduler()
+    scheduler.defer(5.0)
+    assert scheduler.seconds_until_due() == 5.0
+    assert scheduler.take() == 0
+    assert scheduler.seconds_until_due() is None
+
+
+def test_defer_does_not_bring_a_save_forward():
+    scheduler, clock = make_scheduler(quiet=2.0)
+    scheduler.mark_dirty()
+    scheduler.defer(1.0)
+    assert scheduler.seconds_until_due() == 2.0
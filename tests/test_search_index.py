@@ -0,0 +1,149 @@
+# SearchIndex: whole-word, prefix and one-typo matches, scoring, top-k, and
+# staying in step with the change tuples.
+#
+#   python -m pytest tests
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex, words  # noqa: E402
+from task_store import Task, TaskStore  # noqa: E402
+
+
+def store(**lists):
+    # store(list1=[("a", "title", "description"), ...])
+    return TaskStore.from_lists({
+        list_id: [Task(task_id, list_id, title, description) for task_id, title, description in tasks]
+        for list_id, tasks in lists.items()
+    })
+
+
+TASKS = store(
+    list1=[("a", "Buy groceries", "milk, eggs and bread"),
+           ("b", "Call the plumber", "kitchen sink"),
+           ("c", "Bread recipe", "")],
+    list2=[("d", "Kitchen paint", "buy brushes"),
+           ("e", "Tax return 2024", "")],
+)
+
+
+def found(query, tasks=TASKS, index=None, limit=50):
+    index = index or SearchIndex()
+    return [task.id for task, _ in index.search(query, tasks, limit)]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("plumber", ["b"]),
+    ("PLUMBER", ["b"]),
+    ("plum", ["b"]),  # prefix
+    ("plumbr", ["b"]),  # a letter missing
+    ("plumbeer", ["b"]),  # a letter too many
+    ("plumbor", ["b"]),  # a letter wrong
+    ("p", []),  # too short for a prefix
+    ("2024", ["e"]),
+    ("2025", []),  # numbers are not matched with typos
+    ("kitchen sink", ["b"]),  # every word must match
+    ("kitchen bread", []),
+    ("", []),
+])
+def test_matches(query, expected):
+    assert found(query) == expected
+
+
+def test_titles_score_above_descriptions():
+    # "bread" is in c's title but a's description; "buy" in a's title and
+    # d's description
+    assert found("bread") == ["c", "a"]
+    assert found("buy") == ["a", "d"]
+
+
+def test_whole_words_score_above_prefixes_and_typos():
+    tasks = store(list1=[("a", "painting", ""), ("b", "paint", ""), ("c", "pains", "")])
+    assert found("paint", tasks) == ["b", "a", "c"]
+
+
+def test_results_carry_their_positions():
+    index = SearchIndex()
+    assert [(task.id, position) for task, position in index.search("kitchen", TASKS)] == [("d", 0), ("b", 1)]
+
+
+def random_store(seed, count=300):
+    rng = random.Random(seed)
+    vocabulary = ["alpha", "alpine", "alps", "beta", "better", "gamma", "gamut", "delta", "deltas", "omega"]
+    return store(**{
+        f"list{n}": [(f"t{n}-{i}", " ".join(rng.choices(vocabulary, k=2)), " ".join(rng.choices(vocabulary, k=3)))
+                     for i in range(count // 3)]
+        for n in range(1, 4)
+    })
+
+
+def score(index, task_id, query):
+    # A task's score worked out the slow way: the best match of each word
+    total = 0
+    for term in dict.fromkeys(words(query)):
+        weights = index.task_words[task_id]
+        best = max((match * weights[word] for word, match in index.matches(term).items() if word in weights),
+                   default=0)
+        if not best:
+            return 0
+        total += best
+    return total
+
+
+@pytest.mark.parametrize("query", ["alp", "alpha", "beta gamma", "delta omega alps", "gamut bett"])
+@pytest.mark.parametrize("limit", [1, 5, 20])
+def test_top_k_are_the_best_scores(query, limit):
+    # Which of several equally scored tasks make the cut is up to the index,
+    # so the scores are compared, and the order within them
+    tasks = random_store(1)
+    index = SearchIndex()
+    index.rebuild(tasks)
+    best = sorted((score(index, task_id, query) for task_id in index.task_words), reverse=True)
+    results = index.search(query, tasks, limit)
+    scores = [score(index, task.id, query) for task, _ in results]
+    assert scores == best[:limit] and scores[-1] > 0
+    list_ids = list(tasks.lists)
+    order = [(-score, list_ids.index(task.list_id), position) for score, (task, position) in zip(scores, results)]
+    assert order == sorted(order)
+
+
+def test_changes_keep_the_index_in_step():
+    tasks = random_store(2)
+    index = SearchIndex()
+    index.rebuild(tasks)
+    ops = [
+        ("add", "list1", 0, "new", "Alpha centauri", "stars", 1),
+        ("edit", "t1-0", "nothing left", "", 2),
+        ("delete", "t2-0"),
+        ("batch", [("delete", "t3-0"), ("edit", "t3-1", "gamma rays", "", 3)]),
+        ("move", "t1-1", "list2", 0),
+    ]
+    tasks.add("list1", 0, "Alpha centauri", "stars", task_id="new")
+    tasks.update("t1-0", "nothing left", "")
+    tasks.remove("t2-0")
+    tasks.remove("t3-0")
+    tasks.update("t3-1", "gamma rays", "")
+    tasks.move("t1-1", "list2", 0)
+    for op in ops:
+        index.apply(op)
+    assert not index.stale
+    rebuilt = SearchIndex()
+    rebuilt.rebuild(tasks)
+    assert (index.postings, index.vocabulary, index.near, index.in_titles) == \
+        (rebuilt.postings, rebuilt.vocabulary, rebuilt.near, rebuilt.in_titles)
+    assert found("centauri", tasks, index) == ["new"]
+    assert found("nothing", tasks, index) == ["t1-0"]
+
+
+def test_deleting_a_list_rebuilds_on_the_next_search():
+    index = SearchIndex()
+    tasks = TASKS.copy()
+    assert found("kitchen", tasks, index) == ["d", "b"]
+    tasks.drop_list("list2")
+    index.apply(("delete_list", "list2"))
+    assert index.stale
+    assert found("kitchen", tasks, index) == ["b"]
@@ -0,0 +1,170 @@
+# One file per list (sharded_lists.py) against the fake GitHub: which files a
+# save writes and deletes, per-list conflicts, and commits retried when the
+# branch moves.
+#
+#   python -m pytest tests
+from conftest import REPO
+from github_client import blob_sha
+from sharded_lists import MANIFEST_PATH, ShardedBase, fetch_lists, format_manifest, list_path, parse_manifest, push_lists
+
+
+def list_text(name, *titles):
+    return f"=== {name} ===\n" + "".join(f"- {title}\n" for title in titles) + "\n"
+
+
+def sharded_files(texts):
+    files = {list_path(list_id): text for list_id, text in texts.items()}
+    files[MANIFEST_PATH] = format_manifest("T0", {list_id: blob_sha(text) for list_id, text in texts.items()})
+    return files
+
+
+def add_repo(github, **texts):
+    return github.add_repo(REPO, sharded_files(texts))
+
+
+def load(client):
+    response = fetch_lists(client, ShardedBase())
+    assert response.status_code == 200
+    return response.base
+
+
+def on_github(repo):
+    # {list_id: text} of the list files, checking the manifest agrees
+    files = repo.files()
+    _, shas = parse_manifest(files[MANIFEST_PATH])
+    texts = {path[len("ToDoLists/"):-len(".txt")]: text for path, text in files.items()
+             if path.startswith("ToDoLists/") and path != MANIFEST_PATH}
+    assert shas == {list_id: blob_sha(text) for list_id, text in texts.items()}
+    return texts
+
+
+HOME = list_text("Home", "a")
+WORK = list_text("Work", "w")
+
+
+def test_save_writes_only_changed_lists(github, make_client):
+    repo = add_repo(github, list1=HOME, list2=WORK)
+    client = make_client()
+    base = load(client)
+    home = list_text("Home", "a", "b")
+    response = push_lists(client, base, {"list1": home, "list2": WORK}, "save")
+    assert response.status_code == 201 and not response.behind
+    assert on_github(repo) == {"list1": home, "list2": WORK}
+    written = repo.trees[repo.tree_of(repo.head)]
+    before = repo.trees[repo.tree_of(repo.commits[repo.head][1])]
+    assert sorted(path for path in written if written[path] != before.get(path)) == [list_path("list1"), MANIFEST_PATH]
+    # Nothing changed since: no commit at all
+    head = repo.head
+    assert push_lists(client, base, {"list1": home, "list2": WORK}, "save").ok
+    assert repo.head == head
+
+
+def test_lists_another_session_created_survive_our_save(github, make_client):
+    # The regression: a save used to delete every list file it did not know
+    repo = add_repo(github, list1=HOME, list2=WORK)
+    ours, theirs = make_client(), make_client(token="other")
+    our_base, their_base = load(ours), load(theirs)
+    new_list = list_text("Errands", "e")
+    assert push_lists(theirs, their_base, {"list1": HOME, "list2": WORK, "list3": new_list}, "create").ok
+
+    home = list_text("Home", "a", "b")
+    response = push_lists(ours, our_base, {"list1": home, "list2": WORK}, "save")
+    assert response.ok
+    assert on_github(repo) == {"list1": home, "list2": WORK, "list3": new_list}
+
+
+def test_only_lists_deleted_here_are_deleted(github, make_client):
+    repo = add_repo(github, list1=HOME, list2=WORK)
+    ours, theirs = make_client(), make_client(token="other")
+    our_base, their_base = load(ours), load(theirs)
+    new_list = list_text("Errands", "e")
+    assert push_lists(theirs, their_base, {"list1": HOME, "list2": WORK, "list3": new_list}, "create").ok
+
+    response = push_lists(ours, our_base, {"list1": HOME}, "delete Work", removed=["list2"])
+    assert response.ok
+    assert on_github(repo) == {"list1": HOME, "list3": new_list}
+    assert "list2" not in our_base.texts and "list2" not in our_base.manifest
+    # A list only named in `removed` that GitHub never had is ignored
+    assert push_lists(ours, our_base, {"list1": HOME}, "again", removed=["list9"]).ok
+
+
+def test_conflicts_are_per_list(github, make_client):
+    repo = add_repo(github, list1=HOME, list2=WORK)
+    ours, theirs = make_client(), make_client(token="other")
+    our_base, their_base = load(ours), load(theirs)
+    their_home = list_text("Home", "a", "theirs")
+    assert push_lists(theirs, their_base, {"list1": their_home, "list2": WORK}, "theirs").ok
+
+    # The same list: refused, nothing written
+    head = repo.head
+    response = push_lists(ours, our_base, {"list1": list_text("Home", "a", "ours"), "list2": WORK}, "ours")
+    assert response.status_code == 409 and response.conflicts == ["list1"]
+    assert repo.head == head
+
+    # Another list: written, and list1 is reported as needing a merge
+    work = list_text("Work", "w", "ours")
+    response = push_lists(ours, our_base, {"list1": HOME, "list2": work}, "ours")
+    assert response.status_code == 201 and response.behind == ["list1"]
+    assert on_github(repo) == {"list1": their_home, "list2": work}
+
+
+def test_deleting_a_list_changed_elsewhere_is_a_conflict(github, make_client):
+    repo = add_repo(github, list1=HOME, list2=WORK)
+    ours, theirs = make_client(), make_client(token="other")
+    our_base, their_base = load(ours), load(theirs)
+    their_work = list_text("Work", "w", "theirs")
+    assert push_lists(theirs, their_base, {"list1": HOME, "list2": their_work}, "theirs").ok
+    response = push_lists(ours, our_base, {"list1": HOME}, "delete", removed=["list2"])
+    assert response.status_code == 409 and response.conflicts == ["list2"]
+    assert on_github(repo)["list2"] == their_work
+
+
+def test_force_overwrites_conflicting_lists(github, make_client):
+    repo = add_repo(github, list1=HOME, list2=WORK)
+    ours, theirs = make_client(), make_client(token="other")
+    our_base, their_base = load(ours), load(theirs)
+    assert push_lists(theirs, their_base, {"list1": list_text("Home", "theirs"), "list2": WORK}, "theirs").ok
+    home = list_text("Home", "ours")
+    assert push_lists(ours, our_base, {"list1": home, "list2": WORK}, "ours", force=True).ok
+    assert on_github(repo) == {"list1": home, "list2": WORK}
+
+
+def test_commit_is_retried_when_the_branch_moves(github, make_client):
+    # Someone commits another list between our check and our ref update:
+    # the ref update is refused, and the retry keeps their list
+    repo = add_repo(github, list1=HOME, list2=WORK)
+    client = make_client()
+    base = load(client)
+    new_list = list_text("Errands", "e")
+    move_head = client.move_head
+
+    def someone_commits_first(commit, tree):
+        if not repo.foreign_edits:
+            repo.foreign_edits += 1
+            texts = {"list1": HOME, "list2": WORK, "list3": new_list}
+            repo.write({list_path("list3"): new_list,
+                        MANIFEST_PATH: sharded_files(texts)[MANIFEST_PATH]})
+        return move_head(commit, tree)
+
+    client.move_head = someone_commits_first
+    home = list_text("Home", "a", "b")
+    response = push_lists(client, base, {"list1": home, "list2": WORK}, "save")
+    assert response.status_code == 201
+    assert client.metrics.counters[("github_commit_retries_total", ())] == 1
+    assert on_github(repo) == {"list1": home, "list2": WORK, "list3": new_list}
+    assert base.commit == repo.head
+
+
+def test_gives_up_after_max_attempts(github, make_client):
+    repo = add_repo(github, list1=HOME, list2=WORK)
+    client = make_client()
+    base = load(client)
+    move_head = client.move_head
+
+    def always_beaten(commit, tree):
+        repo.write({"elsewhere.txt": str(len(repo.commits))})
+        return move_head(commit, tree)
+
+    client.move_head = always_beaten
+    response = push_lists(client, base, {"list1": list_text("Home", "b"), "list2": WORK}, "save")
+    assert response.status_code == 409 and not response.conflicts
@@ -0,0 +1,180 @@
+# SharedCache: LRU eviction, coalesced calls and shared parses, and GitHub
+# clients sharing one cache.
+#
+#   python -m pytest tests
+import threading
+
+from conftest import REPO
+from metrics import Metrics
+from shared_cache import SharedCache
+from todo_format import parse_task_lists
+
+
+def make_cache(max_bytes=100, max_entries=10):
+    return SharedCache(max_bytes=max_bytes, max_entries=max_entries, metrics=Metrics())
+
+
+def test_least_recently_used_goes_first_by_bytes():
+    cache = make_cache(max_bytes=100)
+    for key in "abc":
+        cache.put(("x", key), key, 40)
+    assert cache.get(("x", "a")) is None
+    assert (len(cache), cache.bytes) == (2, 80)
+    assert cache.metrics.counters[("shared_cache_evictions_total", ())] == 1
+
+
+def test_least_recently_used_goes_first_by_entries():
+    cache = make_cache(max_entries=2)
+    cache.put(("x", "a"), "a", 1)
+    cache.put(("x", "b"), "b", 1)
+    assert cache.get(("x", "a")) == "a"  # now b is the least recently used
+    cache.put(("x", "c"), "c", 1)
+    assert [cache.get(("x", key)) for key in "abc"] == ["a", None, "c"]
+
+
+def test_replacing_an_entry_counts_its_size_once():
+    cache = make_cache()
+    cache.put(("x", "a"), "a", 30)
+    cache.put(("x", "a"), "A", 50)
+    assert (len(cache), cache.bytes, cache.get(("x", "a"))) == (1, 50, "A")
+
+
+def test_values_larger_than_the_cache_are_not_kept():
+    cache = make_cache(max_bytes=100)
+    cache.put(("x", "a"), "a", 10)
+    cache.put(("x", "big"), "big", 101)
+    assert cache.get(("x", "big")) is None
+    assert cache.get(("x", "a")) == "a"
+
+
+def test_lookups_are_counted_by_kind():
+    cache = make_cache()
+    cache.put(("content", "a"), "a", 1)
+    cache.get(("content", "a"))
+    cache.get(("content", "b"))
+    counters = cache.metrics.counters
+    assert counters[("shared_cache_lookups_total", (("kind", "content"), ("result", "hit")))] == 1
+    assert counters[("shared_cache_lookups_total", (("kind", "content"), ("result", "miss")))] == 1
+
+
+def run_together(count, fn):
+    # fn() in `count` threads; their results
+    results = [None] * count
+
+    def run(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_concurrent_calls_are_coalesced():
+    cache = make_cache()
+    release = threading.Event()
+    calls = []
+
+    def fetch(value):
+        calls.append(value)
+        release.wait(5)
+        return value
+
+    threads, results = run_together(4, lambda: cache.coalesce(("get", "a"), fetch, "result"))
+    while cache.metrics.counters.get(("shared_cache_coalesced_total", (("kind", "get"),)), 0) < 3:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == ["result"]
+    assert results == ["result"] * 4
+    # Once finished, the next call runs again
+    assert cache.coalesce(("get", "a"), fetch, "again") == "again"
+
+
+def test_coalesced_callers_get_the_exception():
+    cache = make_cache()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("no")
+
+    threads, results = run_together(3, lambda: cache.coalesce(("get", "a"), fail))
+    while cache.metrics.counters.get(("shared_cache_coalesced_total", (("kind", "get"),)), 0) < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_parsed_once_with_errors_for_every_caller():
+    cache = make_cache(max_bytes=10**6)
+    parses = []
+
+    def parse(text, errors):
+        parses.append(text)
+        errors.append("line 2: bad")
+        return text.split()
+
+    first_errors, second_errors = [], []
+    first = cache.parsed(("tasks", "a"), parse, "a b", first_errors)
+    second = cache.parsed(("tasks", "a"), parse, "a b", second_errors)
+    assert first == second == ["a", "b"] and first is not second
+    assert parses == ["a b"]
+    assert first_errors == second_errors == ["line 2: bad"]
+
+
+def test_copies_of_a_cached_store_diverge():
+    # Each session changes its own copy; the cached store and every other
+    # copy keep the tasks as parsed
+    cache = make_cache(max_bytes=10**6)
+    text = "=== Home ===\n- a\n  @a\n- b\n  @b\n\n=== Work ===\n- c\n  @c\n\n"
+    names = {"list1": "Home", "list2": "Work"}
+
+    def parse(text, errors):
+        return parse_task_lists(text, names, errors)
+
+    ours = cache.parsed(("tasks", "x"), parse, text)
+    theirs = cache.parsed(("tasks", "x"), parse, text)
+    ours.move("a", "list2", 0)
+    ours.remove("c")
+    theirs.move("c", "list1", 0)
+    theirs.add("list2", -1, "d", task_id="d")
+
+    def where(store):
+        return {list_id: [task.id for task in store.tasks(list_id)] for list_id in names}
+
+    assert where(ours) == {"list1": ["b"], "list2": ["a"]}
+    assert (ours.get("a").list_id, ours.get("c"), ours.get("d")) == ("list2", None, None)
+    assert where(theirs) == {"list1": ["c", "a", "b"], "list2": ["d"]}
+    assert (theirs.get("a").list_id, theirs.get("c").list_id) == ("list1", "list1")
+    fresh = cache.parsed(("tasks", "x"), parse, text)
+    assert where(fresh) == {"list1": ["a", "b"], "list2": ["c"]}
+    assert (fresh.get("a").list_id, fresh.get("c").list_id, fresh.get("d")) == ("list1", "list2", None)
+
+
+def test_sessions_share_decoded_files(github, make_client):
+    # Another token's first read is a conditional GET: GitHub still checks
+    # it may read the file, but sends nothing
+    github.add_repo(REPO, {"ToDoList.txt": "text"})
+    shared = make_cache(max_bytes=10**6)
+    first = make_client(token="one", shared=shared).get_file("ToDoList.txt")
+    second = make_client(token="two", shared=shared).get_file("ToDoList.txt")
+    assert (first.status_code, second.status_code) == (200, 304)
+    assert first.content == second.content == "text"
+    assert github.stats["not_modified"] == 1
+
+
+def test_nothing_is_handed_over_without_github(github, make_client):
+    # Whatever other sessions have cached, a file GitHub does not show this
+    # client is a 404
+    github.add_repo(REPO, {"ToDoList.txt": "text"})
+    shared = make_cache(max_bytes=10**6)
+    assert make_client(token="one", shared=shared).get_file("ToDoList.txt").ok
+    result = make_client(repo="test/other", token="two", shared=shared).get_file("ToDoList.txt")
+    assert (result.status_code, result.content) == (404, None)
@@ -0,0 +1,78 @@
+# TaskSelection: clicks, shift-clicks and pruning, and selection_delta.
+#
+#   python -m pytest tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_selection import TaskSelection, matching_tasks, selection_delta  # noqa: E402
+from task_store import Task, TaskStore  # noqa: E402
+
+STORE = TaskStore.from_lists({
+    "list1": [Task(task_id, "list1", f"task {task_id}") for task_id in "abcde"],
+    "list2": [Task(task_id, "list2", f"task {task_id}", "notes") for task_id in "xy"],
+})
+
+
+def test_click_selects_only_that_task_or_nothing():
+    selection = TaskSelection(["a", "b"]).only("c")
+    assert (list(selection), selection.anchor) == (["c"], "c")
+    assert not selection.only("c")
+
+
+def test_toggle_keeps_selection_order():
+    selection = TaskSelection().toggle("c").toggle("a").toggle("b").toggle("a")
+    assert list(selection) == ["c", "b"]
+
+
+def test_operations_return_new_selections():
+    selection = TaskSelection(["a"])
+    selection.toggle("b")
+    selection.with_tasks(["c"])
+    assert list(selection) == ["a"]
+
+
+@pytest.mark.parametrize("anchor, target, keep, expected", [
+    ("b", "d", False, ["b", "c", "d"]),
+    ("d", "b", False, ["b", "c", "d"]),  # upwards: still list order
+    ("b", "d", True, ["x", "b", "c", "d"]),  # ctrl+shift keeps the rest
+    ("x", "c", False, ["c"]),  # the anchor is in another list
+    ("x", "c", True, ["x", "c"]),
+    (None, "c", False, ["c"]),
+])
+def test_extend_to(anchor, target, keep, expected):
+    selection = TaskSelection(["x"], anchor).extend_to(STORE, target, keep)
+    assert list(selection) == expected
+
+
+def test_pruned():
+    selection = TaskSelection(["a", "gone", "x"], "gone")
+    pruned = selection.pruned(STORE)
+    assert (list(pruned), pruned.anchor) == (["a", "x"], None)
+    assert pruned.pruned(STORE) is pruned
+
+
+def test_tasks_in_selection_order():
+    assert [task.id for task in TaskSelection(["x", "gone", "a"]).tasks(STORE)] == ["x", "a"]
+
+
+@pytest.mark.parametrize("old, new, added, removed", [
+    ("", "", [], []),
+    ("ab", "ab", [], []),
+    ("", "abc", ["a", "b", "c"], []),
+    ("abc", "", [], ["a", "b", "c"]),
+    ("abc", "bcd", ["d"], ["a"]),
+    ("abc", "cba", [], []),  # the same tasks, in another order
+])
+def test_selection_delta(old, new, added, removed):
+    assert selection_delta(TaskSelection(old), TaskSelection(new)) == (added, removed)
+
+
+def test_matching_tasks():
+    tasks = STORE.tasks("list1") + STORE.tasks("list2")
+    assert [task.id for task in matching_tasks(tasks, " TASK X ")] == ["x"]
+    assert [task.id for task in matching_tasks(tasks, "notes")] == ["x", "y"]
+    assert len(matching_tasks(tasks, "  ")) == 7
@@ -0,0 +1,142 @@
+# TaskStore.apply_batch against the single changes it stands for.
+#
+#   python -m pytest tests
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from change_journal import apply_change  # noqa: E402
+from task_store import SORT_KEYS, Task, TaskStore  # noqa: E402
+
+LIST_IDS = ["a", "b", "c"]
+
+
+def make_store(rng, task_count=12):
+    lists = {list_id: [] for list_id in LIST_IDS}
+    for n in range(task_count):
+        list_id = rng.choice(LIST_IDS)
+        created = rng.randrange(5)
+        lists[list_id].append(Task(f"t{n}", list_id, f"task {rng.randrange(5)}", "", created, created))
+    return TaskStore.from_lists(lists)
+
+
+def random_ops(rng, store, count):
+    # Valid changes, checked by applying each one to `store` as it is made
+    ops = []
+    added = 0
+    for _ in range(count):
+        task_ids = [task.id for list_id in store.lists for task in store.tasks(list_id)]
+        kind = rng.choice(["add", "edit", "delete", "move", "move", "sort"])
+        if kind in ("edit", "delete", "move") and not task_ids:
+            kind = "add"
+        index = rng.choice([-1, 0, 1, 2, 5, 50])
+        if kind == "add":
+            added += 1
+            op = ("add", rng.choice(LIST_IDS), index, f"new{added}", f"added {added}", "note", 10 + added)
+        elif kind == "edit":
+            op = ("edit", rng.choice(task_ids), f"edited {rng.randrange(5)}", "", 20)
+        elif kind == "delete":
+            op = ("delete", rng.choice(task_ids))
+        elif kind == "move":
+            op = ("move", rng.choice(task_ids), rng.choice(LIST_IDS), index)
+        else:
+            op = ("sort", rng.choice(LIST_IDS), rng.choice(list(SORT_KEYS)), rng.random() < 0.5)
+        apply_change(store, op)
+        ops.append(op)
+    return ops
+
+
+def contents(store, list_id):
+    return sorted((task.id, task.title, task.description, task.updated) for task in store.tasks(list_id))
+
+
+def check_consistent(store):
+    seen = set()
+    for list_id, tasks in store.lists.items():
+        assert {task.id: task for task in tasks} == store.indexes[list_id]
+        assert all(task.list_id == list_id for task in tasks)
+        orders = [task.order for task in tasks]
+        assert orders == sorted(set(orders))
+        ids = {task.id for task in tasks}
+        assert not ids & seen
+        seen |= ids
+        for task in tasks:
+            assert store.get(task.id) is task
+            assert store.position(task) == tasks.index(task)
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_batch_keeps_the_tasks_of_the_single_changes(seed):
+    # Positions may differ (a batch index counts the tasks that stay), but
+    # every list ends up holding the same tasks with the same contents
+    rng = random.Random(seed)
+    store = make_store(rng)
+    expected = store.copy()
+    ops = random_ops(rng, expected, rng.randrange(1, 15))
+    original = {list_id: list(store.tasks(list_id)) for list_id in store.lists}
+
+    batched = store.copy()
+    batched.apply_batch(ops)
+
+    check_consistent(batched)
+    check_consistent(store)
+    for list_id in LIST_IDS:
+        assert contents(batched, list_id) == contents(expected, list_id)
+        assert store.tasks(list_id) == original[list_id]  # copy-on-write: the same records
+
+
+def test_batch_without_sorts_keeps_single_change_order():
+    # One move at a time: the same positions as move()
+    rng = random.Random(7)
+    store = make_store(rng)
+    for task_id in ["t0", "t3", "t5"]:
+        for list_id in LIST_IDS:
+            for index in (-1, 0, 2):
+                expected = store.copy()
+                expected.move(task_id, list_id, index)
+                batched = store.copy()
+                batched.apply_batch([("move", task_id, list_id, index)])
+                assert [task.id for task in batched.tasks(list_id)] == [task.id for task in expected.tasks(list_id)]
+
+
+def test_move_after_sort_of_its_new_list():
+    store = TaskStore.from_lists({
+        "a": [Task("t0", "a", "zero", created=3), Task("t1", "a", "one", created=1)],
+        "c": [Task("t2", "c", "two", created=2)],
+    })
+    store.apply_batch([("move", "t0", "c", -1), ("sort", "c", "created", False), ("move", "t0", "c", 3)])
+    assert [task.id for task in store.tasks("a")] == ["t1"]
+    assert [task.id for task in store.tasks("c")] == ["t2", "t0"]
+    check_consistent(store)
+
+
+def test_copies_find_their_own_tasks():
+    # Copies share the task -> list map until one changes; each finds its own
+    # version of a task
+    old = TaskStore.from_lists({"a": [Task("t0", "a", "zero"), Task("t1", "a", "one")], "b": []})
+    new = old.copy()
+    new.move("t0", "b", 0)
+    new.remove("t1")
+    assert old.get("t0").list_id == "a" and "t1" in old
+    assert new.get("t0").list_id == "b" and "t1" not in new
+    old.add("a", 0, "two", task_id="t2")
+    newer = new.copy()
+    newer.drop_list("b")
+    assert "t2" in old and "t2" not in new
+    assert new.get("t0").list_id == "b" and "t0" not in newer
+    for store in (old, new, newer):
+        check_consistent(store)
+
+
+def test_unknown_task_or_list():
+    store = TaskStore.from_lists({"a": [Task("t0", "a", "zero")]})
+    with pytest.raises(KeyError):
+        store.apply_batch([("delete", "t0"), ("edit", "t0", "x", "", 1)])
+    with pytest.raises(KeyError):
+        store.apply_batch([("move", "t0", "nowhere", 0)])
+    with pytest.raises(ValueError):
+        store.apply_batch([("add", "a", 0, "t0", "again", "", 1)])
@@ -0,0 +1,91 @@
+# diff_tasks: keyed patches that bring a rendered list up to date, checked by
+# applying them the way TASK_VIEW_SCRIPT does.
+#
+#   python -m pytest tests
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_store import Task  # noqa: E402
+from task_view import PATCH_MAX_OPS, WINDOW_ROWS, diff_tasks, window_start  # noqa: E402
+
+
+def tasks(ids, edited=""):
+    # Tasks "a", "b" ...; those in `edited` get another title
+    return [Task(task_id, "list1", f"task {task_id}" + ("!" if task_id in edited else "")) for task_id in ids]
+
+
+def patched(old_ids, ops):
+    # The IDs on the page after applying `ops`, and the updated ones
+    rows = list(old_ids)
+    updated = []
+    for op in ops:
+        if op["op"] == "remove":
+            rows.remove(op["id"])
+        elif op["op"] == "update":
+            assert op["id"] in rows
+            updated.append(op["id"])
+        else:
+            if op["op"] == "move":
+                rows.remove(op["id"])
+            else:
+                assert op["id"] not in rows and op["html"]
+            rows.insert(0 if op["after"] is None else rows.index(op["after"]) + 1, op["id"])
+    return "".join(rows), updated
+
+
+DIFFS = [
+    # (what happened, old, new, edited, operations expected)
+    ("nothing", "abcd", "abcd", "", []),
+    ("append", "abc", "abcd", "", ["insert d"]),
+    ("prepend", "abc", "xabc", "", ["insert x"]),
+    ("remove", "abcd", "acd", "", ["remove b"]),
+    ("edit", "abc", "abc", "b", ["update b"]),
+    ("move one down", "abcde", "bcdae", "", ["move a"]),
+    ("move one up", "abcde", "eabcd", "", ["move e"]),
+    ("swap neighbours", "abcd", "bacd", "", ["move b"]),
+    ("reverse", "abcd", "dcba", "", ["move d", "move c", "move b"]),
+    ("everything at once", "abcde", "xceab", "e", ["remove d", "insert x", "move c", "move e", "update e"]),
+]
+
+
+@pytest.mark.parametrize("case, old, new, edited, expected", DIFFS, ids=[case[0] for case in DIFFS])
+def test_diff_tasks(case, old, new, edited, expected):
+    ops = diff_tasks(tasks(old), tasks(new, edited), drag_drop=True)
+    assert [f"{op['op']} {op['id']}" for op in ops] == expected
+    assert patched(old, ops) == (new, list(edited))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_edits(seed):
+    rng = random.Random(seed)
+    old = list("abcdefghijklmnop")
+    new = [task_id for task_id in old if rng.random() > 0.2] + list("qrs")[:rng.randrange(4)]
+    if seed % 2:
+        rng.shuffle(new)
+    edited = "".join(rng.sample(new, 2))
+    ops = diff_tasks(tasks(old), tasks(new, edited), drag_drop=False)
+    # New tasks arrive with their title; only old ones need updating
+    assert patched(old, ops) == ("".join(new), [task_id for task_id in new if task_id in edited and task_id in old])
+
+
+def test_whole_list_when_simpler():
+    assert diff_tasks([], tasks("ab"), drag_drop=True) is None
+    assert diff_tasks(tasks("ab"), [], drag_drop=True) is None
+    many = [str(i) for i in range(PATCH_MAX_OPS + 1)]
+    assert diff_tasks(tasks(["x"]), tasks(["x"] + many), drag_drop=True) is None
+
+
+@pytest.mark.parametrize("first_visible, total, start", [
+    (0, 1000, 0),
+    (10, 1000, 0),
+    (100, 1000, 85),
+    (990, 1000, 1000 - WINDOW_ROWS),  # the window does not run past the end
+    (5, 20, 0),
+])
+def test_window_start(first_visible, total, start):
+    assert window_start(first_visible, total) == start
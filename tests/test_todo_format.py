@@ -0,0 +1,83 @@
+# ToDoList.txt: what format_list_block writes, iter_tasks reads back.
+#
+#   python -m pytest tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_store import Task  # noqa: E402
+from todo_format import TodoParseError, format_list_block, iter_tasks, parse_task_lists  # noqa: E402
+
+
+@pytest.mark.parametrize("description", [
+    "",
+    "one line",
+    "  indented",
+    "trailing spaces  ",
+    " ",
+    "\n",
+    "first\n\nthird",
+    "ends with a blank line\n",
+    "tab\tinside\t",
+    "carriage\rreturn",
+    "\rfirst\n\rsecond",
+])
+def test_descriptions_round_trip_exactly(description):
+    task = Task("t1", "list1", "title", description, 1, 2)
+    text = format_list_block("List", [task])
+    (read,) = iter_tasks(text, {"list1": "List"})
+    assert read.description == description
+    assert (read.id, read.title, read.created, read.updated) == ("t1", "title", 1, 2)
+
+
+@pytest.mark.parametrize("title", ["plain", "trailing spaces  ", "  leading", " ", "", "tab\t", "cr\rinside"])
+def test_titles_round_trip_exactly(title):
+    text = format_list_block("List", [Task("t1", "list1", title, "notes", 1, 2)])
+    for source in (text, text.encode()):
+        (read,) = iter_tasks(source, {"list1": "List"})
+        assert (read.title, read.description) == (title, "notes")
+
+
+def test_windows_line_endings():
+    text = "=== List ===\r\n- title\r\n  |first \r\n  |second\r\n  @t1 1 2\r\n\r\n"
+    (read,) = iter_tasks(text, {"list1": "List"})
+    assert (read.title, read.description) == ("title", "first \nsecond")
+    text = "=== List ===\r\n- title \r\n  |a\rb\r\n\r\n"
+    (read,) = iter_tasks(text.encode(), {"list1": "List"})
+    assert (read.title, read.description) == ("title ", "a\rb")
+
+
+METADATA = "--- METADATA ---\nLast updated: 2024-01-01\n--- END METADATA ---\n"
+
+
+@pytest.mark.parametrize("text, lineno, message", [
+    ("=== List ===\n- a\nwhat\n", 3, "unrecognized line 'what'"),
+    (METADATA + "=== List ===\n- a\n  @a 1\n", 6, "malformed task id line '@a 1'"),
+    (METADATA + "\n- a\n", 5, "task outside of a list"),
+    ("  |note\n=== List ===\n", 1, "description outside of a list"),
+    ("=== List ===\n  |note\n", 2, "description without a task"),
+    ("=== List ===\n- a\n  @a\n  |late\n", 4, "description after the task id"),
+    ("=== List ===\n\n  @a\n", 3, "task id without a task"),
+    ("=== List ===\r\n- a\r\nwhat\r\n", 3, "unrecognized line 'what'"),
+])
+def test_errors_carry_line_numbers(text, lineno, message):
+    with pytest.raises(TodoParseError) as raised:
+        list(iter_tasks(text, {"list1": "List"}))
+    error = raised.value
+    assert (error.lineno, str(error)) == (lineno, f"line {lineno}: {message}")
+
+
+def test_errors_can_be_collected_instead():
+    text = "=== List ===\n- a\nwhat\n- b\n  @b x y\n- c\n"
+    errors = []
+    store = parse_task_lists(text, {"list1": "List"}, errors)
+    assert [task.title for task in store.tasks("list1")] == ["a", "b", "c"]
+    assert [(error.lineno, error.line) for error in errors] == [(3, "what"), (5, "  @b x y")]
+
+
+def test_lists_not_asked_for_are_skipped_quietly():
+    text = "=== Other ===\n- x\n  |note\n  @x\n=== List ===\n- a\n"
+    assert [task.title for task in iter_tasks(text, {"list1": "List"})] == ["a"]
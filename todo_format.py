@@ -0,0 +1,193 @@
+import io
+
+from task_store import Task, TaskStore, content_task_id
+
+
+# ToDoList.txt body format (after the metadata block):
+#
+#   === List name ===
+#   - task
+#     |first description line
+#     |second description line
+#     @task_id created updated
+#
+# One block per list, in display order, each ending with a blank line.
+# Descriptions that span several lines get one "  |" line per line, read back
+# exactly as written (blank lines, spaces and stray carriage returns
+# included); files written before that had at most one description line and
+# read the same. Titles keep their spaces too. Lines end at "\n" (or "\r\n",
+# so a "\r" at the very end of a line is taken for part of a Windows line
+# ending; text from the browser never has one there).
+# The "  @" line carries the task's stable ID and its created/updated Unix
+# timestamps (omitted when unknown). Older files have no "  @" lines; their
+# tasks get IDs derived from their content, the same in every session.
+
+
+def format_list_block(list_name, tasks):
+    # Serialize one list in a single pass: collect the pieces, join once
+    parts = [f"=== {list_name} ===\n"]
+    for task in tasks:
+        parts.append(f"- {task.title}\n")
+        if task.description:
+            for line in task.description.split("\n"):
+                parts.append(f"  |{line}\n")
+        if task.created or task.updated:
+            parts.append(f"  @{task.id} {task.created} {task.updated}\n")
+        else:
+            parts.append(f"  @{task.id}\n")
+    parts.append("\n")
+    return "".join(parts)
+
+
+class TaskListSerializer:
+    # Keeps each list's serialized block from the previous call and only
+    # re-serializes lists whose name or tasks changed since. A TaskStore
+    # never changes a list it shares with another version (see
+    # task_store.py), so an unchanged list is the very same list object and
+    # the check is a single identity comparison.
+
+    def __init__(self):
+        self._blocks = {}  # {list_id: (name, tasks, block)}
+        self.rebuilt = 0  # lists serialized by the last format() call
+
+    def format(self, store, list_names):
+        return "".join(self.blocks(store, list_names).values())
+
+    def blocks(self, store, list_names):
+        # {list_id: serialized block}; an unchanged list gets the very same
+        # string as last time
+        blocks = {}
+        self.rebuilt = 0
+        for list_id, list_name in list_names.items():
+            tasks = store.tasks(list_id)
+            cached = self._blocks.get(list_id)
+            if cached is None or cached[0] != list_name or cached[1] is not tasks:
+                cached = (list_name, tasks, format_list_block(list_name, tasks))
+                self._blocks[list_id] = cached
+                self.rebuilt += 1
+            blocks[list_id] = cached[2]
+        return blocks
+
+    def reset(self):
+        self._blocks.clear()
+
+
+class TodoParseError(ValueError):
+    def __init__(self, lineno, message, line=""):
+        super().__init__(f"line {lineno}: {message}")
+        self.lineno = lineno
+        self.line = line
+
+
+def _open_lines(source):
+    # Lazily read lines of `source`: the file text, its raw bytes, or a
+    # binary stream (e.g. an open file or a streamed HTTP body) decoded as
+    # UTF-8 as it is read. Lines are split at "\n" only and keep their
+    # endings, so a lone "\r" stays inside its line.
+    if isinstance(source, str):
+        return io.StringIO(source, newline="\n")
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return io.TextIOWrapper(source, encoding="utf-8", newline="\n")
+
+
+def iter_tasks(source, list_names, errors=None):
+    # Generator over the tasks in a ToDoList.txt file, yielding a Task per
+    # task in file order (`order` is its position in its list). Headers are
+    # looked up in a reverse name -> id index; lists that are not in
+    # `list_names` are skipped. A malformed line raises TodoParseError, or,
+    # when `errors` is a list, is recorded there and skipped.
+    ids_by_name = {name: list_id for list_id, name in list_names.items()}
+    counts = dict.fromkeys(list_names, 0)
+    occurrences = {}  # (list_id, title) -> count, for tasks without an ID
+    in_metadata = False
+    seen_header = False
+    list_id = None
+    pending = None  # [list_id, title, description lines, ID fields] until the task ends
+
+    def finish(list_id, title, desc_lines, fields):
+        if fields:
+            task_id, created, updated = fields
+        else:
+            key = (list_id, title)
+            occurrences[key] = occurrence = occurrences.get(key, 0) + 1
+            task_id, created, updated = content_task_id(list_id, title, occurrence), 0, 0
+        order = counts[list_id]
+        counts[list_id] = order + 1
+        return Task(task_id, list_id, title, "\n".join(desc_lines), created, updated, float(order))
+
+    def fail(lineno, message, line):
+        error = TodoParseError(lineno, message, line)
+        if errors is None:
+            raise error
+        errors.append(error)
+
+    for lineno, line in enumerate(_open_lines(source), 1):
+        if in_metadata:
+            if line.strip() == "--- END METADATA ---":
+                in_metadata = False
+            continue
+        line = line[:-2] if line.endswith("\r\n") else line.rstrip("\n")
+        if line.startswith("  @"):
+            if pending is None:
+                if list_id is not None or not seen_header:
+                    fail(lineno, "task id without a task", line)
+                continue
+            fields = _parse_id_line(line)
+            if fields is None:
+                fail(lineno, f"malformed task id line {line.strip()[:40]!r}", line)
+            else:
+                pending[3] = fields
+            continue
+        if line.startswith("  |"):
+            if pending is not None and pending[3] is None:
+                pending[2].append(line[3:])
+            elif pending is not None:
+                fail(lineno, "description after the task id", line)
+            elif not seen_header:
+                fail(lineno, "description outside of a list", line)
+            elif list_id is not None:
+                fail(lineno, "description without a task", line)
+            continue
+
+        if pending is not None:
+            yield finish(*pending)
+            pending = None
+
+        stripped = line.rstrip()
+        if not stripped:
+            continue
+        if stripped == "--- METADATA ---":
+            in_metadata = True
+        elif stripped.startswith("===") and stripped.endswith("==="):
+            list_id = ids_by_name.get(stripped.strip("= "))
+            seen_header = True
+        elif line.startswith("- ") or stripped == "-":
+            if list_id is not None:
+                pending = [list_id, line[2:], [], None]  # the title as written
+            elif not seen_header:
+                fail(lineno, "task outside of a list", line)
+        else:
+            fail(lineno, f"unrecognized line {stripped[:40]!r}", line)
+
+    if pending is not None:
+        yield finish(*pending)
+
+
+def _parse_id_line(line):
+    # "  @task_id [created updated]" -> (task_id, created, updated), or None
+    fields = line[3:].split()
+    if len(fields) not in (1, 3):
+        return None
+    try:
+        created, updated = (int(fields[1]), int(fields[2])) if len(fields) == 3 else (0, 0)
+    except ValueError:
+        return None
+    return fields[0], created, updated
+
+
+def parse_task_lists(source, list_names, errors=None):
+    lists = {list_id: [] for list_id in list_names}
+    for task in iter_tasks(source, list_names, errors):
+        lists[task.list_id].append(task)
+    return TaskStore.from_lists(lists)